@@ -1,13 +1,23 @@
 import numpy as np
-from brain_region_base import BrainRegion
+from brain_region_base import BrainRegion, as_float, batch_level
 
 class Amygdala(BrainRegion):
+    # Pure function of its inputs: eligible for region_cache.RegionCache
+    cacheable = True
+    neurotransmitter_keys = ('norepinephrine', 'serotonin')
+
     def process(self, input_signal, neurotransmitters, internal_state=None):
         norepinephrine = neurotransmitters.get('norepinephrine', 1.0)
         serotonin = neurotransmitters.get('serotonin', 1.0)
-        signal_strength = np.max(input_signal) * norepinephrine * serotonin
+        signal_strength = np.max(as_float(input_signal)) * norepinephrine * serotonin
         return signal_strength if signal_strength > 0.3 else 0
 
+    def process_batch(self, input_signals, neurotransmitters, internal_state=None):
+        norepinephrine = batch_level(neurotransmitters, 'norepinephrine', 1.0)
+        serotonin = batch_level(neurotransmitters, 'serotonin', 1.0)
+        signal_strength = np.max(as_float(input_signals), axis=1) * norepinephrine * serotonin
+        return np.where(signal_strength > 0.3, signal_strength, 0.0)
+
 '''
 """
 Amygdala class models the emotional processing center of the brain.
@@ -18,59 +28,40 @@ This class is designed for extensibility, allowing future integration with class
 reinforcement learning, and expanded emotion modeling.
 """
 import numpy as np
-from brain_region_base import BrainRegion
+from brain_region_base import BrainRegion, as_float
+from plasticity import PlasticityStore
+
+# 情動カテゴリ（インデックスは PlasticityStore で一度だけ固定）
+EMOTION_CATEGORIES = (
+    # 基本情動
+    'fear', 'pleasure', 'disgust', 'anger', 'surprise', 'sadness',
+
+    # 高次情動（社会的・倫理的・文化的）
+    'curiosity', 'trust', 'anticipation', 'pride', 'shame', 'guilt', 'gratitude',
+    'respect', 'envy', 'humility', 'honor', 'embarrassment', 'compassion',
+)
 
 class Amygdala(BrainRegion):
-    def __init__(self):
-        super().__init__()
-        self.emotional_weights = {...}  # 既存の情動カテゴリ
-        self.short_term_memory = {}     # STP用の一時的な重み
-        self.long_term_memory = {}      # LTP用の恒常的な重み
-        self.stp_decay_rate = 0.9       # 短期記憶の減衰率（例：毎ステップで10%減衰）
-        self.ltp_learning_rate = 0.01   # 長期記憶の学習率
-
-    def update_memory(self, emotion, signal_strength):
-        # 短期増強（STP）
-        self.short_term_memory[emotion] = signal_strength
-
-        # 長期増強（LTP）
-        prev = self.long_term_memory.get(emotion, 1.0)
-        self.long_term_memory[emotion] = prev + self.ltp_learning_rate * (signal_strength - prev)
+    def __init__(self, name="Amygdala"):
+        super().__init__(name)
+        # 重み・STP用の一時的な重み・LTP用の恒常的な重みを1本のベクトルで保持
+        self.plasticity = PlasticityStore(
+            categories=EMOTION_CATEGORIES,
+            stp_decay_rate=0.9,      # 短期記憶の減衰率（例：毎ステップで10%減衰）
+            ltp_learning_rate=0.01   # 長期記憶の学習率
+        )
+
+    def update_memory(self, emotions, signal_strengths):
+        # 短期増強（STP）と長期増強（LTP）を全カテゴリ一括で更新
+        self.plasticity.potentiate(self.plasticity.indices(tuple(emotions)), signal_strengths)
 
     def decay_stp(self):
-        for emotion in self.short_term_memory:
-            self.short_term_memory[emotion] *= self.stp_decay_rate
-        
-        # 情動カテゴリとそれぞれの重み（初期値）
-        self.emotional_weights = {
-            # 基本情動
-            'fear': 1.0,
-            'pleasure': 1.0,
-            'disgust': 1.0,
-            'anger': 1.0,
-            'surprise': 1.0,
-            'sadness': 1.0,
-            
-            # 高次情動（社会的・倫理的・文化的）
-            'curiosity': 1.0,
-            'trust': 1.0,
-            'anticipation': 1.0,
-            'pride': 1.0,
-            'shame': 1.0,
-            'guilt': 1.0,
-            'gratitude': 1.0,
-            'respect': 1.0,
-            'envy': 1.0,
-            'humility': 1.0,
-            'honor': 1.0,
-            'embarrassment': 1.0,
-            'compassion': 1.0,
-        }
+        self.plasticity.decay()
 
     def process(self, input_signal, neurotransmitters, internal_state=None):
         norepinephrine = neurotransmitters.get('norepinephrine', 1.0)
         serotonin = neurotransmitters.get('serotonin', 1.0)
-        signal_strength = np.max(input_signal) * norepinephrine * serotonin
+        signal_strength = np.max(as_float(input_signal)) * norepinephrine * serotonin
 
         # --- 信頼度の構築と更新 ---
         if internal_state is None:
@@ -87,13 +78,13 @@ class Amygdala(BrainRegion):
             trust_score = max(trust_score - 0.1, 0.0)
         # neutral の場合は変化なし
 
-        # 更新された信頼度を emotional_weights に反映
-        self.emotional_weights['trust'] = trust_score
+        # 更新された信頼度を重みベクトルに反映
+        self.plasticity.weights[..., self.plasticity.index['trust']] = trust_score
 
         # --- 情動ラベルの選定（仮） ---
         selected_emotion = 'trust' if trust_score > 0.5 and signal_strength > 0.3 else 'fear'
 
-        weighted_emotion = signal_strength * self.emotional_weights.get(selected_emotion, 1.0)
+        weighted_emotion = signal_strength * self.plasticity.weights[..., self.plasticity.index[selected_emotion]]
 
         # --- internal_state に更新された trust_score を保存 ---
         internal_state['trust_score'] = trust_score
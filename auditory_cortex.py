@@ -1,6 +1,14 @@
 import numpy as np
-from brain_region_base import BrainRegion
+from brain_region_base import BrainRegion, as_float, batch_level
 
 class AuditoryCortex(BrainRegion):
+    # Pure function of its inputs: eligible for region_cache.RegionCache
+    cacheable = True
+    neurotransmitter_keys = ('serotonin',)
+
     def process(self, auditory_input, neurotransmitters, internal_state=None):
-        return np.mean(auditory_input) * neurotransmitters.get('serotonin', 1.0)
\ No newline at end of file
+        # From raw audio (stimulus_source.AudioSource) the input is the band levels: the mean is the loudness
+        return np.mean(as_float(auditory_input)) * neurotransmitters.get('serotonin', 1.0)
+
+    def process_batch(self, auditory_inputs, neurotransmitters, internal_state=None):
+        return np.mean(as_float(auditory_inputs), axis=1) * batch_level(neurotransmitters, 'serotonin', 1.0)
\ No newline at end of file
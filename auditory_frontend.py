@@ -0,0 +1,137 @@
+# auditory_frontend.py
+
+"""
+Streaming spectral front-end for raw audio.
+
+AudioFrontEnd turns PCM sample blocks of any length into band levels as
+they arrive. Samples are cut into frames of frame_length samples every hop
+samples (25 ms and 10 ms at 16 kHz by default); each frame is windowed
+(Hann), transformed with a real FFT and its power summed into n_bands
+triangular mel bands. Only the frame_length - hop samples of overlap with
+the next frame are carried between blocks, so no sample is transformed
+twice whatever the block size, and the frame grid does not depend on how
+the stream is split into blocks. The carry buffer, window and filter bank
+are allocated once.
+
+The band powers are given in dB relative to a full-scale sine and mapped to
+levels in [0, 1] over `dynamic_range` dB (silence 0, full scale 1).
+step(block) averages the frames completed by a block into one compact
+per-step vector; a block that completes no frame repeats the previous one.
+
+Per-step views:
+
+    bands   the n_bands levels; AuditoryCortex takes their mean (loudness)
+    speech  the levels of the bands inside SPEECH_BAND (300-3400 Hz), other
+            bands 0, divided by n_bands; LanguageArea sums them, so its
+            activation is on the scale of the auditory one and the
+            auditory-language discrepancy is the share of non-speech sound
+
+At the defaults the front-end runs several hundred times faster than real
+time on one core (benchmark.py: audio.frontend). stimulus_source.AudioSource
+reads a .wav or .npy recording through it, one step of samples_per_step
+samples at a time; for live audio call step() on every block received and
+pass the vector on, e.g. through a realtime.QueueSource.
+"""
+
+import numpy as np
+
+SPEECH_BAND = (300.0, 3400.0)
+FEATURE_VIEWS = ("bands", "speech")
+
+
+def hz_to_mel(frequency):
+    return 2595.0 * np.log10(1.0 + np.asarray(frequency, dtype=float) / 700.0)
+
+
+def mel_to_hz(mel):
+    return 700.0 * (10.0 ** (np.asarray(mel, dtype=float) / 2595.0) - 1.0)
+
+
+def mel_filterbank(sample_rate, n_fft, n_bands, fmin=0.0, fmax=None):
+    """(n_bands, n_fft // 2 + 1) triangular mel filters and their (n_bands,) centre frequencies."""
+    fmax = sample_rate / 2.0 if fmax is None else fmax
+    edges = mel_to_hz(np.linspace(hz_to_mel(fmin), hz_to_mel(fmax), n_bands + 2))
+    bins = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    lower, centre, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / (centre - lower)
+    falling = (upper - bins) / (upper - centre)
+    return np.maximum(0.0, np.minimum(rising, falling)), edges[1:-1]
+
+
+def to_samples(block):
+    """1-D float samples in [-1, 1] from a float or integer PCM block (channels are averaged)."""
+    block = np.asarray(block)
+    if np.issubdtype(block.dtype, np.integer):
+        block = block / float(-np.iinfo(block.dtype).min)
+    block = np.asarray(block, dtype=float)
+    return block.mean(axis=1) if block.ndim == 2 else block.ravel()
+
+
+class AudioFrontEnd:
+    def __init__(self, sample_rate=16000, frame_length=400, hop=160, n_fft=512, n_bands=16,
+                 dynamic_range=80.0, fmin=0.0, fmax=None):
+        if not 0 < hop <= frame_length <= n_fft:
+            raise ValueError("Need 0 < hop <= frame_length <= n_fft")
+        self.sample_rate = sample_rate
+        self.frame_length = frame_length
+        self.hop = hop
+        self.n_fft = n_fft
+        self.n_bands = n_bands
+        self.dynamic_range = dynamic_range
+        self.window = np.hanning(frame_length)
+        self.filters, self.centres = mel_filterbank(sample_rate, n_fft, n_bands, fmin, fmax)
+        # A full-scale sine puts (sum(window) / 2) ** 2 of power into its bin
+        self.reference = (self.window.sum() / 2.0) ** 2
+        low, high = SPEECH_BAND
+        self.speech_weights = ((self.centres >= low) & (self.centres <= high)) / float(n_bands)
+        self._buffer = np.zeros(4 * frame_length)
+        self.reset()
+
+    def reset(self):
+        """Forget the carried samples and start a new stream."""
+        self._filled = 0
+        self.frames = 0
+        self.last = np.zeros(self.n_bands)
+
+    def _levels(self, frames):
+        spectrum = np.fft.rfft(frames * self.window, n=self.n_fft)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        db = 10.0 * np.log10(np.maximum(power @ self.filters.T / self.reference, 1e-12))
+        return np.clip(1.0 + db / self.dynamic_range, 0.0, 1.0)
+
+    def push(self, block):
+        """(frames, n_bands) levels of the frames completed by this block of samples."""
+        block = to_samples(block)
+        filled = self._filled + len(block)
+        if filled > len(self._buffer):
+            buffer = np.zeros(max(filled, 2 * len(self._buffer)))
+            buffer[:self._filled] = self._buffer[:self._filled]
+            self._buffer = buffer
+        self._buffer[self._filled:filled] = block
+        n_frames = (filled - self.frame_length) // self.hop + 1 if filled >= self.frame_length else 0
+        if not n_frames:
+            self._filled = filled
+            return np.zeros((0, self.n_bands))
+        starts = np.lib.stride_tricks.sliding_window_view(self._buffer[:filled], self.frame_length)
+        levels = self._levels(starts[:n_frames * self.hop:self.hop])
+        # Keep only what the next frames still need
+        consumed = n_frames * self.hop
+        self._buffer[:filled - consumed] = self._buffer[consumed:filled].copy()
+        self._filled = filled - consumed
+        self.frames += n_frames
+        return levels
+
+    def step(self, block):
+        """Mean band levels of the frames completed by the block (the previous vector if none)."""
+        levels = self.push(block)
+        if len(levels):
+            self.last = levels.mean(axis=0)
+        return self.last
+
+    def view(self, levels, features="bands"):
+        """Per-step vector for a region: the band levels or their speech-band share."""
+        if features == "bands":
+            return levels
+        if features == "speech":
+            return levels * self.speech_weights
+        raise ValueError(f"Unknown feature view {features!r}; expected one of {FEATURE_VIEWS}")
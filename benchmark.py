@@ -0,0 +1,270 @@
+# benchmark.py
+
+"""
+Benchmark suite for the brain model.
+
+Micro-benchmarks time every BrainRegion.process implementation across input
+sizes (and process_batch across subject counts), VisualProcessor on mono and
+stereo camera frames in frames per second and the auditory front-end as a
+multiple of real time. End-to-end benchmarks measure Simulator steps per
+second and peak traced memory as the number of steps, the input dimension,
+the region count, the length of the event schedule and the population size
+grow, at float64 and float32 precision, plus the batched simulation for
+comparison.
+
+Results are written as JSON, one entry per measurement keyed by a stable
+name, so runs from different commits can be compared:
+
+    python benchmark.py --output bench_base.json
+    python benchmark.py --output bench_new.json --compare bench_base.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+import numpy as np
+
+from connectome import DEFAULT_CONNECTOME
+from auditory_frontend import AudioFrontEnd
+from cerebellum import Cerebellum
+from simulate_brain_activity import load_config, simulate_brain_activity_batch
+from neurotransmitter_state import NeurotransmitterState
+from precision import precision
+from simulator import Simulator, build_regions
+from visual_processing import VisualProcessor
+
+INPUT_SIZES = (3, 64, 1024)
+BATCH_SIZES = (1, 100, 10000)
+STEP_COUNTS = (100, 1000, 10000)
+EXTRA_REGIONS = (0, 13, 52)
+SCHEDULE_ENTRIES = (0, 1000, 10000)
+FRAME_SIZES = ((240, 320), (480, 640))
+AUDIO_RATES = (16000, 48000)
+POPULATION_UNITS = (1000, 10000, 100000)
+
+
+def _time_call(function, min_time=0.02, repeat=5):
+    """Best per-call time in seconds; the loop count is grown until one run takes min_time."""
+    timer = timeit.Timer(function)
+    number = 1
+    elapsed = timer.timeit(number)
+    while elapsed < min_time / 10:
+        number *= 10
+        elapsed = timer.timeit(number)
+    number = max(1, int(number * min_time / elapsed))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def _region_inputs(region, size, rng):
+    if region.name == "Insula":
+        return {f"signal_{i}": float(v) for i, v in enumerate(rng.random(size))}
+    return rng.random(size)
+
+
+def micro_benchmarks(config, quick=False):
+    rng = np.random.default_rng(0)
+    neurotransmitters = dict(config["neurotransmitters"])
+    internal_state = dict(config["internal_state"])
+    results = []
+
+    for size in INPUT_SIZES[:2] if quick else INPUT_SIZES:
+        for region in build_regions():
+            signal = _region_inputs(region, size, rng)
+            if region.name == "Insula":
+                call = lambda region=region, signal=signal: region.process(signal, internal_state)
+            else:
+                call = lambda region=region, signal=signal: region.process(signal, neurotransmitters, internal_state)
+            seconds = _time_call(call)
+            results.append({"name": f"region.{region.name}.process[size={size}]", "value": seconds * 1e6, "unit": "us/call"})
+
+    for n_subjects in BATCH_SIZES[:2] if quick else BATCH_SIZES:
+        signals = rng.random((n_subjects, 3))
+        for region in build_regions():
+            if region.name == "Insula":
+                call = lambda region=region: region.process_batch({"pain": 0.6, "distress": 0.4}, internal_state)
+            else:
+                call = lambda region=region: region.process_batch(signals, neurotransmitters, internal_state)
+            seconds = _time_call(call)
+            results.append({"name": f"region.{region.name}.process_batch[subjects={n_subjects}]",
+                            "value": seconds * 1e6 / n_subjects, "unit": "us/subject"})
+
+    processor = VisualProcessor()
+    for height, width in FRAME_SIZES[:1] if quick else FRAME_SIZES:
+        # Right view is the left one shifted by 8 pixels (disparity 8), a fronto-parallel scene
+        scene = rng.random((height, width + 8))
+        frames = {"mono": scene[:, :-8], "stereo": np.stack([scene[:, :-8], scene[:, 8:]])}
+        for kind, frame in frames.items():
+            seconds = _time_call(lambda frame=frame: processor.activation(frame), min_time=0.2, repeat=3)
+            results.append({"name": f"visual.{kind}.activation[{width}x{height}]", "value": 1.0 / seconds,
+                            "unit": "frames/s"})
+
+    for sample_rate in AUDIO_RATES[:1] if quick else AUDIO_RATES:
+        # 100 ms blocks, scaled so the frame grid is the same 25 ms / 10 ms at every rate
+        frontend = AudioFrontEnd(sample_rate, frame_length=sample_rate // 40, hop=sample_rate // 100,
+                                 n_fft=1 << (sample_rate // 40 - 1).bit_length())
+        block = rng.standard_normal(sample_rate // 10) * 0.1
+        seconds = _time_call(lambda frontend=frontend, block=block: frontend.step(block))
+        results.append({"name": f"audio.frontend.step[{sample_rate}Hz]", "value": 0.1 / seconds, "unit": "x realtime"})
+    return results
+
+
+def _make_simulator(config, input_dim=3, extra_regions=0, kernel=None, schedule_entries=0, incremental=False,
+                    population_units=None, frame_size=None):
+    rng = np.random.default_rng(0)
+    external_stimuli = config["external_stimuli"] if input_dim == 3 else rng.random((5, input_dim)).tolist()
+    image_signals = config.get("image_signals")
+    if frame_size is not None:
+        # A static camera: one stereo pair with disparity 8, seen on every step
+        height, width = frame_size
+        scene = rng.random((height, width + 8))
+        image_signals = [np.stack([scene[:, :-8], scene[:, 8:]])]
+    # A diet of overlapping meal windows, one every 0.05 s
+    schedule = [{"name": f"meal {i}", "time": i * 0.05, "duration": 2.0, "neurotransmitter": "serotonin",
+                 "factor": 0.999} for i in range(schedule_entries)] or None
+    levels = NeurotransmitterState(config["neurotransmitters"]) if incremental else dict(config["neurotransmitters"])
+    if kernel is not None:
+        return Simulator(np.full(input_dim, 0.1), levels, external_stimuli,
+                         dict(config["internal_state"]), image_signals, config.get("linguistic_inputs"),
+                         config.get("auditory_inputs"), config.get("olfactory_inputs"), kernel=kernel,
+                         schedule=schedule)
+    regions = build_regions()
+    connectome = dict(DEFAULT_CONNECTOME)
+    for i in range(extra_regions):
+        regions.append(Cerebellum(f"Cerebellum {i}"))
+        connectome[f"Cerebellum {i}"] = "stimulus"
+    return Simulator(np.full(input_dim, 0.1), levels, external_stimuli,
+                     dict(config["internal_state"]), image_signals, config.get("linguistic_inputs"),
+                     config.get("auditory_inputs"), config.get("olfactory_inputs"),
+                     connectome=connectome, regions=regions, schedule=schedule, population=population_units)
+
+
+def _run_end_to_end(config, steps, precision_name="float64", **kwargs):
+    with precision(precision_name):
+        return _time_end_to_end(config, steps, **kwargs)
+
+
+def _time_end_to_end(config, steps, **kwargs):
+    simulator = _make_simulator(config, **kwargs)
+    start = time.perf_counter()
+    for _ in simulator.iter_steps(steps):
+        pass
+    elapsed = time.perf_counter() - start
+
+    # Peak memory is measured in a separate run, since tracemalloc slows the loop
+    simulator = _make_simulator(config, **kwargs)
+    tracemalloc.start()
+    for _ in simulator.iter_steps(steps):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return steps / elapsed, peak
+
+
+def end_to_end_benchmarks(config, quick=False):
+    results = []
+    cases = [("steps", {"steps": steps}) for steps in (STEP_COUNTS[:2] if quick else STEP_COUNTS)]
+    cases += [("input_dim", {"steps": 1000, "input_dim": dim}) for dim in INPUT_SIZES]
+    cases += [("regions", {"steps": 1000, "extra_regions": extra}) for extra in EXTRA_REGIONS]
+    cases += [("schedule", {"steps": 1000, "schedule_entries": entries}) for entries in SCHEDULE_ENTRIES]
+    cases += [("incremental", {"steps": 1000, "incremental": True})]
+    # Incremental mode skips the Visual Cortex while the camera frame and glutamate hold still
+    cases += [("camera", {"steps": 100, "frame_size": FRAME_SIZES[0], "incremental": incremental})
+              for incremental in (False, True)]
+    cases += [("population", {"steps": 20, "population_units": units})
+              for units in (POPULATION_UNITS[:2] if quick else POPULATION_UNITS)]
+    cases += [("precision", {"steps": 20, "population_units": POPULATION_UNITS[1 if quick else 2],
+                             "precision_name": name}) for name in ("float64", "float32")]
+    cases += [("kernel", {"steps": steps, "kernel": "fused"}) for steps in (STEP_COUNTS[:2] if quick else STEP_COUNTS)]
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for axis, params in cases:
+            steps_per_second, peak = _run_end_to_end(config, **params)
+            label = ",".join(f"{key}={'x'.join(map(str, value[::-1])) if isinstance(value, tuple) else value}"
+                             for key, value in params.items())
+            results.append({"name": f"simulator.{axis}[{label}]", "value": steps_per_second, "unit": "steps/s"})
+            results.append({"name": f"simulator.{axis}[{label}].peak_memory", "value": peak / 1024, "unit": "KiB"})
+
+        for n_subjects in BATCH_SIZES[:2] if quick else BATCH_SIZES:
+            steps = 100
+            start = time.perf_counter()
+            simulate_brain_activity_batch(np.tile([0.1, 0.2, 0.3], (n_subjects, 1)), config["neurotransmitters"],
+                                          config["external_stimuli"], config["internal_state"],
+                                          config.get("image_signals"), config.get("linguistic_inputs"),
+                                          config.get("auditory_inputs"), config.get("olfactory_inputs"), steps=steps)
+            elapsed = time.perf_counter() - start
+            results.append({"name": f"batch[subjects={n_subjects}]", "value": steps * n_subjects / elapsed,
+                            "unit": "subject-steps/s"})
+    return results
+
+
+def _metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0],
+            "numpy": np.__version__, "platform": platform.platform(), "machine": platform.machine()}
+
+
+# Units where a larger value is better; everything else (time, memory) is better smaller
+HIGHER_IS_BETTER = ("steps/s", "subject-steps/s", "frames/s", "x realtime")
+
+
+def compare(results, baseline, tolerance=0.1):
+    """Print the ratio against a baseline run and return the names that regressed beyond tolerance."""
+    previous = {entry["name"]: entry for entry in baseline["results"]}
+    regressions = []
+    for entry in results:
+        if entry["name"] not in previous or not previous[entry["name"]]["value"]:
+            continue
+        ratio = entry["value"] / previous[entry["name"]]["value"]
+        worse = ratio < 1 - tolerance if entry["unit"] in HIGHER_IS_BETTER else ratio > 1 + tolerance
+        if worse:
+            regressions.append(entry["name"])
+        print(f"{entry['name']:70s} {entry['value']:14.3f} {entry['unit']:16s} x{ratio:6.2f}{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark brain regions and end-to-end simulation speed.")
+    parser.add_argument("--config", default="config.json", help="configuration JSON")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the results")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change treated as a regression")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes for a fast smoke run")
+    parser.add_argument("--only", choices=["micro", "end-to-end"], help="run one group only")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    results = []
+    if args.only in (None, "micro"):
+        results += micro_benchmarks(config, args.quick)
+    if args.only in (None, "end-to-end"):
+        results += end_to_end_benchmarks(config, args.quick)
+
+    report = {"meta": _metadata(), "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+    else:
+        for entry in results:
+            print(f"{entry['name']:70s} {entry['value']:14.3f} {entry['unit']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,61 @@
+import numpy as np
+
+from precision import as_float, get_dtype
+
+
+def batch_level(levels, key, default):
+    """Look up `key` in a batched dict; the value is a scalar or an (N,) array."""
+    if levels is None:
+        return np.asarray(default, dtype=get_dtype())
+    return np.asarray(levels.get(key, default), dtype=get_dtype())
+
+
+def as_column(level):
+    """Reshape a scalar or (N,) level so it broadcasts against (N, D) inputs."""
+    return np.reshape(level, (-1, 1))
+
+
+def subject_view(levels, index):
+    """Slice one subject out of a batched dict of scalars and (N,) arrays."""
+    if levels is None:
+        return None
+    return {key: (value[index] if np.ndim(value) > 0 else value) for key, value in levels.items()}
+
+
 class BrainRegion:
+    # Regions whose process() depends only on its arguments set cacheable = True,
+    # see region_cache.RegionCache and neurotransmitter_state.IncrementalEvaluator.
+    # Every region lists the levels it reads (also the population gain, population.py)
+    cacheable = False
+    neurotransmitter_keys = ()
+    internal_state_keys = ()
+
     def __init__(self, name):
         self.name = name
 
     def process(self, input_signal, neurotransmitters, internal_state=None):
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    def get_state(self):
+        """Mutable state as a dict of scalars, lists and arrays (empty for stateless regions)."""
+        return {}
+
+    def set_state(self, state):
+        pass
+
+    def process_batch(self, input_signals, neurotransmitters, internal_state=None):
+        """
+        Batched counterpart of process() for N independent subjects.
+
+        input_signals has a leading subject axis (N, ...). Every entry of
+        neurotransmitters and internal_state is either a scalar shared by all
+        subjects or an (N,) array. Row i of the result equals
+        process(input_signals[i], ...) for subject i.
+
+        This fallback loops over subjects; regions override it with array ops.
+        """
+        input_signals = as_float(input_signals)
+        return np.array([
+            self.process(input_signals[i], subject_view(neurotransmitters, i), subject_view(internal_state, i))
+            for i in range(input_signals.shape[0])
+        ])
@@ -1,9 +1,20 @@
 import numpy as np
-from brain_region_base import BrainRegion
+from brain_region_base import BrainRegion, as_float, batch_level
 
 class Brainstem(BrainRegion):
+    # Pure function of its inputs: eligible for region_cache.RegionCache
+    cacheable = True
+    neurotransmitter_keys = ('serotonin', 'norepinephrine')
+    internal_state_keys = ('heart_rate',)
+
     def process(self, input_signal, neurotransmitters, internal_state):
         serotonin = neurotransmitters.get('serotonin', 1.0)
         norepinephrine = neurotransmitters.get('norepinephrine', 1.0)
         heart_rate = internal_state.get('heart_rate', 70)
-        return np.mean(input_signal) * serotonin * norepinephrine * (heart_rate / 70)
\ No newline at end of file
+        return np.mean(as_float(input_signal)) * serotonin * norepinephrine * (heart_rate / 70)
+
+    def process_batch(self, input_signals, neurotransmitters, internal_state):
+        serotonin = batch_level(neurotransmitters, 'serotonin', 1.0)
+        norepinephrine = batch_level(neurotransmitters, 'norepinephrine', 1.0)
+        heart_rate = batch_level(internal_state, 'heart_rate', 70)
+        return np.mean(as_float(input_signals), axis=1) * serotonin * norepinephrine * (heart_rate / 70)
\ No newline at end of file
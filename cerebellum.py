@@ -1,8 +1,17 @@
 import numpy as np
-from brain_region_base import BrainRegion
+from brain_region_base import BrainRegion, as_column, as_float, batch_level
 
 class Cerebellum(BrainRegion):
+    # Pure function of its inputs: eligible for region_cache.RegionCache
+    cacheable = True
+    neurotransmitter_keys = ('gaba', 'glutamate')
+
     def process(self, input_signal, neurotransmitters, internal_state=None):
         gaba = neurotransmitters.get('gaba', 1.0)
         glutamate = neurotransmitters.get('glutamate', 1.0)
-        return np.array(input_signal) * gaba * glutamate
\ No newline at end of file
+        return as_float(input_signal) * gaba * glutamate
+
+    def process_batch(self, input_signals, neurotransmitters, internal_state=None):
+        gaba = as_column(batch_level(neurotransmitters, 'gaba', 1.0))
+        glutamate = as_column(batch_level(neurotransmitters, 'glutamate', 1.0))
+        return as_float(input_signals) * gaba * glutamate
\ No newline at end of file
@@ -0,0 +1,145 @@
+# checkpoint.py
+
+"""
+Checkpoint, restore and fork of a whole Simulator.
+
+snapshot() captures Simulator.get_state() (step counter, escape counter,
+input signal, neurotransmitters, internal state, the dopamine Kalman filter,
+the event schedule and the state of every region: Hippocampus buffers and search index,
+OlfactoryCortex adaptation, Insula plasticity, population unit states)
+together with the run configuration (stimulus lists or source specs, dt,
+thresholds, connectome, population engine spec, and whether the levels are
+a NeurotransmitterState, so incremental evaluation resumes with them).
+The result is a compact binary blob: an .npz archive whose arrays are stored
+raw and whose remaining structure is one JSON document, so loading needs no
+pickle.
+
+restore() loads a snapshot into an existing Simulator, or builds a new one
+with the default regions. fork() makes many independent continuations from
+one snapshot, so what-if branches skip replaying a shared warm-up:
+
+    base = snapshot(simulator)            # after a long warm-up
+    low, high = fork(base, 2)
+    low.neurotransmitters["serotonin"] = 0.2
+    high.neurotransmitters["serotonin"] = 0.9
+"""
+
+import io
+import json
+
+import numpy as np
+
+from neurotransmitter_state import NeurotransmitterState
+from population import PopulationEngine
+from precision import get_precision
+from simulator import Simulator
+from stimulus_source import StimulusSource
+
+FORMAT_VERSION = 2
+CONFIG_FIELDS = ("external_stimuli", "image_signals", "linguistic_inputs", "auditory_inputs", "olfactory_inputs",
+                 "dt", "discrepancy_threshold", "escape_duration", "connectome", "observed_pain_signal", "population",
+                 "precision")
+
+
+def _encode(value, arrays):
+    """JSON-ready copy of value; arrays are moved to `arrays` and replaced by a reference."""
+    if isinstance(value, np.ndarray):
+        key = f"array_{len(arrays)}"
+        arrays[key] = value
+        return {"__array__": key}
+    if isinstance(value, dict):
+        return {key: _encode(item, arrays) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item, arrays) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _decode(value, arrays):
+    if isinstance(value, dict):
+        if set(value) == {"__array__"}:
+            return np.array(arrays[value["__array__"]])
+        return {key: _decode(item, arrays) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item, arrays) for item in value]
+    return value
+
+
+def snapshot(simulator, compress=False):
+    """Serialize the full state and configuration of `simulator` to bytes."""
+    config = {field: getattr(simulator, field) for field in CONFIG_FIELDS}
+    # Recorded channels and the population engine are saved as their spec and rebuilt on restore
+    config = {field: value.spec() if isinstance(value, (StimulusSource, PopulationEngine)) else value
+              for field, value in config.items()}
+    config["incremental"] = isinstance(simulator.neurotransmitters, NeurotransmitterState)
+    document = {"version": FORMAT_VERSION, "config": config, "state": simulator.get_state()}
+    arrays = {}
+    encoded = json.dumps(_encode(document, arrays)).encode("utf-8")
+    buffer = io.BytesIO()
+    save = np.savez_compressed if compress else np.savez
+    save(buffer, __document__=np.frombuffer(encoded, dtype=np.uint8), **arrays)
+    return buffer.getvalue()
+
+
+def _load(data):
+    with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+        arrays = {key: archive[key] for key in archive.files}
+    document = json.loads(arrays.pop("__document__").tobytes().decode("utf-8"))
+    if document["version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {document['version']}")
+    return document, arrays
+
+
+def _build(document, arrays, **kwargs):
+    config = _decode(document["config"], arrays)
+    state = _decode(document["state"], arrays)
+    saved = config.get("precision", "float64")
+    if saved != get_precision():
+        raise ValueError(f"The checkpoint was written at {saved} precision; call precision.set_precision({saved!r}) "
+                         f"before restoring it")
+    levels = dict(state["neurotransmitters"])
+    if config.get("incremental"):
+        levels = NeurotransmitterState(levels)
+    simulator = Simulator(state["input_signal"], levels, config["external_stimuli"],
+                          dict(state["internal_state"]), config["image_signals"], config["linguistic_inputs"],
+                          config["auditory_inputs"], config["olfactory_inputs"], dt=config["dt"],
+                          discrepancy_threshold=config["discrepancy_threshold"],
+                          escape_duration=config["escape_duration"], connectome=config["connectome"],
+                          population=config.get("population"), **kwargs)
+    simulator.observed_pain_signal = config["observed_pain_signal"]
+    simulator.set_state(state)
+    return simulator
+
+
+def restore(data, simulator=None, **kwargs):
+    """
+    Simulator continuing exactly where the snapshot was taken.
+
+    With `simulator`, only its state is replaced (its regions must carry the
+    same names; configuration and runtime options are kept). Otherwise a new
+    Simulator with the default regions is built from the saved configuration;
+    kwargs (executor, profiler, region_cache, kernel, ...) are passed on.
+    """
+    document, arrays = _load(data)
+    if simulator is None:
+        return _build(document, arrays, **kwargs)
+    simulator.set_state(_decode(document["state"], arrays))
+    return simulator
+
+
+def fork(source, count=1, **kwargs):
+    """`count` independent Simulators continuing from a snapshot or from a live Simulator."""
+    data = snapshot(source) if isinstance(source, Simulator) else source
+    document, arrays = _load(data)
+    return [_build(document, arrays, **kwargs) for _ in range(count)]
+
+
+def save_checkpoint(simulator, path, compress=True):
+    with open(path, "wb") as f:
+        f.write(snapshot(simulator, compress))
+
+
+def load_checkpoint(path, simulator=None, **kwargs):
+    with open(path, "rb") as f:
+        return restore(f.read(), simulator, **kwargs)
@@ -0,0 +1,121 @@
+# connectome.py
+
+"""
+Declarative wiring of the brain regions.
+
+A connectome maps each region name to the signal it reads: either a sensory
+stream supplied by the simulation ("stimulus", "image", "linguistic",
+"auditory", "olfactory", "observed_pain") or the name of another region,
+whose output of the same step is then passed on. An entry may also be a dict
+{"input": source, "neurotransmitters": False} for regions such as the Insula
+whose process() takes no neurotransmitter argument.
+
+compile_connectome() resolves the wiring once into a CompiledConnectome: a
+dependency-ordered list of stages with pre-bound calls, so a step performs no
+name comparisons and calls every region exactly once. Regions within a stage
+do not depend on each other and may run concurrently.
+"""
+
+SENSORY_STREAMS = ("stimulus", "image", "linguistic", "auditory", "olfactory", "observed_pain")
+
+DEFAULT_CONNECTOME = {
+    "Prefrontal Cortex": "stimulus",
+    "Striatum": "stimulus",
+    "Hippocampus": "stimulus",
+    "Amygdala": "stimulus",
+    "Hypothalamus": "stimulus",
+    "Cerebellum": "stimulus",
+    "Midbrain": "stimulus",
+    "Brainstem": "stimulus",
+    "Visual Cortex": "image",
+    "Language Area": "linguistic",
+    "Auditory Cortex": "auditory",
+    "Olfactory Cortex": "olfactory",
+    "Insula": {"input": "observed_pain", "neurotransmitters": False}
+}
+
+
+def _bind(region, source, uses_neurotransmitters, method, cache=None, incremental=None):
+    process = getattr(region, method)
+    if cache is not None and region.cacheable:
+        process = cache.bind(region, process)
+    if incremental is not None and region.cacheable:
+        process = incremental.bind(region, process)
+    if uses_neurotransmitters:
+        return lambda signals, neurotransmitters, internal_state: process(signals[source], neurotransmitters, internal_state)
+    return lambda signals, neurotransmitters, internal_state: process(signals[source], internal_state)
+
+
+class CompiledConnectome:
+    def __init__(self, stages):
+        # stages: list of lists of (region name, bound call)
+        self.stages = stages
+
+    def run(self, streams, neurotransmitters, internal_state, executor=None):
+        """
+        Evaluate every region once and return {region name: output}.
+
+        streams holds the sensory inputs of this step. With an executor
+        (e.g. concurrent.futures.ThreadPoolExecutor), regions of one stage are
+        submitted together.
+        """
+        signals = dict(streams)
+        outputs = {}
+        for stage in self.stages:
+            if executor is not None and len(stage) > 1:
+                futures = [(name, executor.submit(call, signals, neurotransmitters, internal_state)) for name, call in stage]
+                results = [(name, future.result()) for name, future in futures]
+            else:
+                results = [(name, call(signals, neurotransmitters, internal_state)) for name, call in stage]
+            for name, output in results:
+                signals[name] = outputs[name] = output
+        return outputs
+
+
+def compile_connectome(regions, connectome=None, method="process", wrap=None, cache=None, incremental=None):
+    """
+    Resolve the wiring of `regions` into a CompiledConnectome.
+
+    method selects the region entry point ("process" or "process_batch").
+    wrap(name, call) may return a replacement for each bound call, e.g. a
+    profiling wrapper. A region_cache.RegionCache given as `cache` memoizes
+    the calls of cacheable regions (single-subject "process" only). A
+    neurotransmitter_state.IncrementalEvaluator given as `incremental` skips
+    those calls when their inputs did not change (also "process" only).
+    Raises ValueError for unwired regions, unknown sources and cycles.
+    """
+    connectome = DEFAULT_CONNECTOME if connectome is None else connectome
+    if cache is not None and method != "process":
+        raise ValueError("A region cache only applies to method='process'")
+    if incremental is not None and method != "process":
+        raise ValueError("Incremental evaluation only applies to method='process'")
+    by_name = {region.name: region for region in regions}
+
+    wiring = {}
+    for name in by_name:
+        if name not in connectome:
+            raise ValueError(f"Region {name!r} has no wiring in the connectome")
+        entry = connectome[name]
+        if isinstance(entry, str):
+            entry = {"input": entry}
+        source = entry["input"]
+        if source not in SENSORY_STREAMS and source not in by_name:
+            raise ValueError(f"Region {name!r} reads unknown source {source!r}")
+        wiring[name] = (source, entry.get("neurotransmitters", True))
+
+    # Kahn's algorithm, one stage per dependency level; regions keep their list order
+    stages = []
+    done = set()
+    pending = list(by_name)
+    while pending:
+        ready = [name for name in pending if wiring[name][0] in SENSORY_STREAMS or wiring[name][0] in done]
+        if not ready:
+            raise ValueError(f"Connectome has a cycle among {pending}")
+        stage = [(name, _bind(by_name[name], *wiring[name], method, cache, incremental)) for name in ready]
+        if wrap is not None:
+            stage = [(name, wrap(name, call)) for name, call in stage]
+        stages.append(stage)
+        done.update(ready)
+        pending = [name for name in pending if name not in done]
+
+    return CompiledConnectome(stages)
@@ -0,0 +1,194 @@
+# event_schedule.py
+
+"""
+Timed effects on the neurotransmitter levels.
+
+An EventScheduler keeps schedule entries in heaps ordered by time. There
+are two kinds of entry:
+
+    window  {"name", "time", "duration", "neurotransmitter", "factor", ["start"], ["symptom"]}
+            active from `start` (default: `time`) until time + duration.
+            While active, the level is multiplied by `factor` on every step
+            that is not escaped. Windows with a symptom are reported on those
+            steps as consumption_exclusion events.
+    dose    {"name", "time", "neurotransmitter", "scale" | "add" | "set"}
+            applied once, at the start of the first step at or after `time`
+
+advance(time) moves windows in and out of the active set and returns the
+doses that fell due; each transition costs O(log n). For every
+neurotransmitter the scheduler keeps the product of the factors of its active
+windows, so applying the windows to a step costs O(1) per affected
+transmitter however long the schedule is.
+
+consumption_schedule() turns a consumption history dict such as
+simulator.CONSUMPTION_HISTORY into serotonin windows with factor 0.8. As
+with the per-step scan it replaces, an item is active from the start of the
+run until time + digest_time.
+
+load_schedule() reads entries from a JSON file (a list, or {"schedule": [...]}),
+a JSON-lines file or a CSV file with a header row.
+"""
+
+import csv
+import heapq
+import json
+import math
+
+OPEN, CLOSE = 0, 1
+NUMERIC_FIELDS = ("time", "start", "duration", "factor", "scale", "add", "set")
+
+
+def consumption_schedule(consumption_history, neurotransmitter="serotonin", factor=0.8):
+    """Windows equivalent to the consumption-history check of the step loop."""
+    return [{"name": item, "time": info["time"], "duration": info["digest_time"], "start": -math.inf,
+             "neurotransmitter": neurotransmitter, "factor": factor, "symptom": info["symptom"],
+             "organ": info.get("organ")}
+            for item, info in consumption_history.items()]
+
+
+def load_schedule(path):
+    """List of schedule entries from a .json, .jsonl or .csv file."""
+    if path.endswith(".csv"):
+        with open(path, "r", newline="") as f:
+            # Empty CSV cells are left out, so optional fields take their defaults
+            return [{key: float(value) if key in NUMERIC_FIELDS else value
+                     for key, value in row.items() if value not in (None, "")}
+                    for row in csv.DictReader(f)]
+    with open(path, "r") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        entries = json.load(f)
+    return entries["schedule"] if isinstance(entries, dict) else entries
+
+
+def open_schedule(schedule):
+    """EventScheduler for a scheduler, a list of entries or a schedule file path."""
+    if isinstance(schedule, EventScheduler):
+        return schedule
+    if isinstance(schedule, str):
+        schedule = load_schedule(schedule)
+    return EventScheduler(schedule)
+
+
+def apply_dose(neurotransmitters, entry, mask=None):
+    """Apply a dose entry to the levels; mask selects subjects of batched (N,) levels."""
+    key = entry["neurotransmitter"]
+    level = neurotransmitters.get(key, 1.0)
+    if "set" in entry:
+        updated = level * 0 + entry["set"]
+    elif "scale" in entry:
+        updated = level * entry["scale"]
+    else:
+        updated = level + entry["add"]
+    if mask is None:
+        neurotransmitters[key] = updated
+    else:
+        neurotransmitters[key][mask] = updated[mask]
+    return updated
+
+
+class EventScheduler:
+    def __init__(self, entries=()):
+        self.entries = []
+        self.windows = []  # heap of (time, sequence, OPEN | CLOSE, entry index)
+        self.doses = []    # heap of (time, sequence, entry index)
+        self.active = {}   # entry index -> window entry, in opening order
+        self.symptomatic = {}  # the active windows that carry a symptom
+        self.factors = {}  # neurotransmitter -> product of the active window factors
+        self.time = None
+        self.changes = 0   # number of window transitions so far
+        self._counts = {}
+        self._sequence = 0
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entry):
+        entry = dict(entry)
+        if "neurotransmitter" not in entry or "time" not in entry:
+            raise ValueError(f"Schedule entry {entry!r} needs a time and a neurotransmitter")
+        index = len(self.entries)
+        if "duration" in entry:
+            entry.setdefault("factor", 1.0)
+            opens = entry.get("start", entry["time"])
+            self._push(-math.inf if opens is None else opens, OPEN, index)
+        elif any(key in entry for key in ("scale", "add", "set")):
+            heapq.heappush(self.doses, (entry["time"], self._sequence, index))
+            self._sequence += 1
+        else:
+            raise ValueError(f"Schedule entry {entry!r} needs a duration (window) or scale/add/set (dose)")
+        self.entries.append(entry)
+
+    def _push(self, key, action, index):
+        heapq.heappush(self.windows, (key, self._sequence, action, index))
+        self._sequence += 1
+
+    def _due(self, time, item):
+        key, _, action, index = item
+        if action == CLOSE:
+            # Same comparison as the consumption check: expired once time - time0 >= duration
+            entry = self.entries[index]
+            return time - entry["time"] >= entry["duration"]
+        return time >= key
+
+    def next_dose(self):
+        """Time of the next pending dose (inf when there is none)."""
+        return self.doses[0][0] if self.doses else math.inf
+
+    def advance(self, time):
+        """Bring the active windows up to `time` and return the doses that fell due."""
+        self.time = time
+        windows = self.windows
+        while windows and self._due(time, windows[0]):
+            _, _, action, index = heapq.heappop(windows)
+            entry = self.entries[index]
+            if action == OPEN:
+                self.active[index] = entry
+                if "symptom" in entry:
+                    self.symptomatic[index] = entry
+                self._count(entry, 1)
+                self._push(entry["time"] + entry["duration"], CLOSE, index)
+            else:
+                del self.active[index]
+                self.symptomatic.pop(index, None)
+                self._count(entry, -1)
+            self.changes += 1
+        doses = []
+        while self.doses and time >= self.doses[0][0]:
+            doses.append(self.entries[heapq.heappop(self.doses)[2]])
+        return doses
+
+    def _count(self, entry, change):
+        # Active windows are counted per distinct factor, so the product never accumulates rounding
+        key = entry["neurotransmitter"]
+        factor = entry["factor"]
+        counts = self._counts.setdefault(key, {})
+        count = counts.get(factor, 0) + change
+        if count:
+            counts[factor] = count
+        else:
+            del counts[factor]
+        if not counts:
+            del self._counts[key], self.factors[key]
+        else:
+            product = 1.0
+            for factor, count in counts.items():
+                product *= factor ** count
+            self.factors[key] = product
+
+    def symptoms(self):
+        """Active windows that carry a symptom."""
+        return list(self.symptomatic.values())
+
+    def transmitters(self):
+        return {entry["neurotransmitter"] for entry in self.entries}
+
+    def get_state(self):
+        return {"entries": [dict(entry) for entry in self.entries], "time": self.time}
+
+    def set_state(self, state):
+        self.__init__(state["entries"])
+        if state["time"] is not None:
+            self.advance(state["time"])  # doses up to this time were already applied
@@ -1,11 +1,18 @@
 import numpy as np
-from brain_region_base import BrainRegion
+from brain_region_base import BrainRegion, as_column, as_float, batch_level
+from memory_search import MemorySearchEngine
+from memory_store import TraceMatrix, TraceRingBuffer
 
 class Hippocampus(BrainRegion):
-    def __init__(self, name):
+    neurotransmitter_keys = ('glutamate', 'acetylcholine')
+
+    def __init__(self, name, memory_capacity=1000, eviction="oldest", memory_index="exact"):
         super().__init__(name)
-        self.memory_buffer = []  # 短期記憶領域
-        self.long_term_memory = []  # 長期記憶領域（定着用）
+        # 短期記憶領域（容量固定のリングバッファ、eviction: "oldest" / "lowest_salience"）
+        self.memory_buffer = TraceRingBuffer(memory_capacity, eviction)
+        self.long_term_memory = TraceMatrix()  # 長期記憶領域（定着用、連続行列）
+        # 長期記憶の検索エンジン（index: "exact" / "ivf"、定着のたびに逐次登録）
+        self.memory_search = MemorySearchEngine(self.long_term_memory, index=memory_index)
 
     def process(self, input_signal, neurotransmitters, internal_state=None):
         # === 生理学的忠実性 ===
@@ -14,7 +21,7 @@ class Hippocampus(BrainRegion):
         acetylcholine = neurotransmitters.get('acetylcholine', 1.0)
 
         # 入力信号に対する記憶痕跡の形成（記銘）
-        memory_trace = np.array(input_signal) * glutamate * acetylcholine
+        memory_trace = as_float(input_signal) * glutamate * acetylcholine
 
         # === 将来的な拡張：神経伝達物質の追加 ===
         # - GABA（抑制性調整、反対側歯状回からの入力）
@@ -63,7 +70,45 @@ class Hippocampus(BrainRegion):
 
         return memory_trace
 
+    def process_batch(self, input_signals, neurotransmitters, internal_state=None):
+        # 被験者軸 (N, D) をまとめて記銘する。短期記憶には1ステップ分を1要素として保存
+        glutamate = batch_level(neurotransmitters, 'glutamate', 1.0)
+        acetylcholine = batch_level(neurotransmitters, 'acetylcholine', 1.0)
+
+        memory_traces = as_float(input_signals) * as_column(glutamate) * as_column(acetylcholine)
+        self.memory_buffer.append(memory_traces)
+
+        # 定着条件は被験者ごとのマスクで判定
+        if len(self.memory_buffer) > 5:
+            consolidate = np.broadcast_to(glutamate * acetylcholine > 1.5, memory_traces.shape[:1])
+            if consolidate.any():
+                self.consolidate_memory(memory_traces[consolidate])
+
+        return memory_traces
+
+    def get_state(self):
+        # 短期記憶・長期記憶・検索インデックスをまとめて保存
+        return {"memory_buffer": self.memory_buffer.get_state(),
+                "long_term_memory": self.long_term_memory.get_state(),
+                "memory_search": self.memory_search.get_state()}
+
+    def set_state(self, state):
+        self.memory_buffer.set_state(state["memory_buffer"])
+        self.long_term_memory.set_state(state["long_term_memory"])
+        self.memory_search.set_state(state["memory_search"])
+
     def consolidate_memory(self, trace):
         # === 長期記憶への保存処理（定着） ===
-        self.long_term_memory.append(trace)
-        # 将来的には記憶の再構成や検索エンジンと連携可能
\ No newline at end of file
+        self.memory_search.add(trace)
+
+    def recall(self, cue, k=5):
+        # === 記憶検索：手がかりに最も近い k 個の痕跡（インデックス, 距離） ===
+        return self.memory_search.search(cue, k)
+
+    def reconstruct(self, cue, k=5):
+        # === 類似記憶の再構成 ===
+        return self.memory_search.reconstruct(cue, k)
+
+    def prediction_error(self, observed_trace):
+        # === 予測誤差：最も近い過去の痕跡との距離 ===
+        return self.memory_search.prediction_error(observed_trace)
\ No newline at end of file
@@ -1,10 +1,21 @@
 import numpy as np
-from brain_region_base import BrainRegion
+from brain_region_base import BrainRegion, as_float, batch_level
 
 class Hypothalamus(BrainRegion):
+    # Pure function of its inputs: eligible for region_cache.RegionCache
+    cacheable = True
+    neurotransmitter_keys = ('oxytocin', 'vasopressin')
+    internal_state_keys = ('body_temperature',)
+
     def process(self, input_signal, neurotransmitters, internal_state):
         oxytocin = neurotransmitters.get('oxytocin', 1.0)
         vasopressin = neurotransmitters.get('vasopressin', 1.0)
         temp = internal_state.get('body_temperature', 36.5)
-        hormone_signal = np.mean(input_signal) * oxytocin * vasopressin * (temp / 37.0)
-        return hormone_signal
\ No newline at end of file
+        hormone_signal = np.mean(as_float(input_signal)) * oxytocin * vasopressin * (temp / 37.0)
+        return hormone_signal
+
+    def process_batch(self, input_signals, neurotransmitters, internal_state):
+        oxytocin = batch_level(neurotransmitters, 'oxytocin', 1.0)
+        vasopressin = batch_level(neurotransmitters, 'vasopressin', 1.0)
+        temp = batch_level(internal_state, 'body_temperature', 36.5)
+        return np.mean(as_float(input_signals), axis=1) * oxytocin * vasopressin * (temp / 37.0)
\ No newline at end of file
@@ -16,33 +16,89 @@ Key Features:
 """
 
 import numpy as np
-from brain_region_base import BrainRegion
+from brain_region_base import BrainRegion, batch_level, get_dtype
+from plasticity import PlasticityStore, PlasticityView
 
 class Insula(BrainRegion):
     def __init__(self, name="Insula"):
         super().__init__(name)
-        self.empathy_weights = {
-            'pain': 1.0,
-            'distress': 1.0,
-            'fear': 1.0,
-            'sadness': 1.0
-        }
-        self.short_term_empathy = {}  # STP-like temporary empathy memory
-        self.long_term_empathy = {}   # LTP-like persistent empathy memory
-        self.stp_decay_rate = 0.9     # Short-term empathy decay rate
-        self.ltp_learning_rate = 0.01 # Long-term empathy learning rate
+        # Weights, STP-like temporary and LTP-like persistent empathy memory,
+        # one vector entry per signal type
+        self.plasticity = PlasticityStore(
+            categories=('pain', 'distress', 'fear', 'sadness'),
+            stp_decay_rate=0.9,     # Short-term empathy decay rate
+            ltp_learning_rate=0.01  # Long-term empathy learning rate
+        )
+        self._modulation_keys = {}
 
-    def update_empathy_memory(self, signal_type, signal_strength):
-        # Short-term potentiation
-        self.short_term_empathy[signal_type] = signal_strength
+    # The former dict attributes, as write-through views of the plasticity store
+    @property
+    def empathy_weights(self):
+        return PlasticityView(self.plasticity, "weights")
+
+    @empathy_weights.setter
+    def empathy_weights(self, weights):
+        self._replace(self.empathy_weights, weights)
+
+    @property
+    def short_term_empathy(self):
+        return PlasticityView(self.plasticity, "stp")
+
+    @short_term_empathy.setter
+    def short_term_empathy(self, values):
+        self._replace(self.short_term_empathy, values)
+
+    @property
+    def long_term_empathy(self):
+        return PlasticityView(self.plasticity, "ltp")
+
+    @long_term_empathy.setter
+    def long_term_empathy(self, values):
+        self._replace(self.long_term_empathy, values)
 
-        # Long-term potentiation
-        prev = self.long_term_empathy.get(signal_type, 1.0)
-        self.long_term_empathy[signal_type] = prev + self.ltp_learning_rate * (signal_strength - prev)
+    @staticmethod
+    def _replace(view, values):
+        values = dict(values)
+        view.clear()
+        view.update(values)
+
+    def update_empathy_memory(self, signal_type, signal_strength):
+        # Short-term and long-term potentiation
+        self.plasticity.potentiate(self.plasticity.indices((signal_type,)), signal_strength)
 
     def decay_stp(self):
-        for signal_type in self.short_term_empathy:
-            self.short_term_empathy[signal_type] *= self.stp_decay_rate
+        self.plasticity.decay()
+
+    def get_state(self):
+        return {"plasticity": self.plasticity.get_state()}
+
+    def set_state(self, state):
+        self.plasticity.set_state(state["plasticity"])
+
+    def _signal_indices(self, signal_types):
+        idx = self.plasticity.indices(signal_types)
+        keys = self._modulation_keys.get(signal_types)
+        if keys is None:
+            keys = self._modulation_keys[signal_types] = tuple('own_' + signal_type for signal_type in signal_types)
+        return idx, keys
+
+    def _combine(self, observed_pain_signal, internal_state):
+        idx, keys = self._signal_indices(tuple(observed_pain_signal))
+        strengths = np.fromiter(observed_pain_signal.values(), dtype=get_dtype(), count=idx.size)
+        internal_modulation = np.fromiter((internal_state.get(key, 1.0) for key in keys), dtype=get_dtype(), count=idx.size)
+        return idx, self.plasticity.weighted(idx, strengths * internal_modulation)
+
+    def process_repeated(self, observed_pain_signal, internal_state=None, steps=1):
+        """
+        Equivalent of `steps` process() calls with the same inputs, as made by
+        the fused step kernel. The output does not change between the calls,
+        only the empathy memory is potentiated `steps` times.
+        """
+        if internal_state is None:
+            internal_state = {}
+        idx, combined_strength = self._combine(observed_pain_signal, internal_state)
+        self.plasticity.potentiate(idx, combined_strength, steps)
+        return np.tanh(combined_strength.sum(axis=-1))
 
     def process(self, observed_pain_signal, internal_state=None, social_context=None):
         """
@@ -58,21 +114,43 @@ class Insula(BrainRegion):
             internal_state = {}
 
         # Combine observed pain and internal state
-        empathy_signal = 0.0
-        for signal_type, strength in observed_pain_signal.items():
-            internal_modulation = internal_state.get('own_' + signal_type, 1.0)
-            weight = self.empathy_weights.get(signal_type, 1.0)
-            combined_strength = strength * internal_modulation * weight
-            empathy_signal += combined_strength
+        idx, combined_strength = self._combine(observed_pain_signal, internal_state)
+        empathy_signal = combined_strength.sum(axis=-1)
 
-            # Update memory
-            self.update_empathy_memory(signal_type, combined_strength)
+        # Update memory
+        self.plasticity.potentiate(idx, combined_strength)
 
         # Normalize output
         empathy_output = np.tanh(empathy_signal)
 
         return empathy_output
 
+    def process_batch(self, observed_pain_signals, internal_state=None, social_context=None):
+        """
+        Batched counterpart of process() for N subjects.
+        Parameters:
+            observed_pain_signals (dict): signal name -> scalar or (N,) array
+            internal_state (dict): 'own_*' entries may be scalars or (N,) arrays
+        Returns:
+            empathy_output (ndarray): (N,) empathy strength, or a scalar while
+            every input is shared; the plasticity store then holds one row
+            per subject
+        """
+        idx, keys = self._signal_indices(tuple(observed_pain_signals))
+        columns = [np.asarray(strength, dtype=get_dtype()) * batch_level(internal_state, key, 1.0)
+                   for strength, key in zip(observed_pain_signals.values(), keys)]
+        n_subjects = max((column.shape[0] for column in columns if column.ndim), default=None)
+        if n_subjects is None and self.plasticity.batch_size is None:
+            return self.process(observed_pain_signals, internal_state, social_context)
+
+        n_subjects = n_subjects or self.plasticity.batch_size
+        self.plasticity.ensure_batch(n_subjects)
+        strengths = np.stack([np.broadcast_to(column, (n_subjects,)) for column in columns], axis=1)
+        combined_strength = self.plasticity.weighted(idx, strengths)
+        self.plasticity.potentiate(idx, combined_strength)
+
+        return np.tanh(combined_strength.sum(axis=1))
+
     # Future extension points:
     # - Incorporate reinforcement learning to adjust empathy_weights
     # - Use time-series tracking of empathy responses for adaptive behavior
@@ -1,18 +1,158 @@
+import warnings
+
 import numpy as np
 
+from precision import get_dtype
+
 class KalmanFilter:
     def __init__(self, initial_state, initial_uncertainty, process_variance, observation_variance):
-        self.state_estimate = initial_state
-        self.uncertainty = initial_uncertainty
-        self.process_variance = process_variance
-        self.observation_variance = observation_variance
+        # Scalars of the configured precision (precision.py)
+        self.dtype = get_dtype()
+        self.state_estimate = self.dtype(initial_state)
+        self.uncertainty = self.dtype(initial_uncertainty)
+        self.process_variance = self.dtype(process_variance)
+        self.observation_variance = self.dtype(observation_variance)
 
     def update(self, observation):
         predicted_state = self.state_estimate
         predicted_uncertainty = self.uncertainty + self.process_variance
 
         kalman_gain = predicted_uncertainty / (predicted_uncertainty + self.observation_variance)
-        self.state_estimate = predicted_state + kalman_gain * (observation - predicted_state)
-        self.uncertainty = (1 - kalman_gain) * predicted_uncertainty
+        self.state_estimate = predicted_state + kalman_gain * (self.dtype(observation) - predicted_state)
+        # Joseph form: stays positive when rounding makes the gain slightly off
+        self.uncertainty = (1 - kalman_gain) ** 2 * predicted_uncertainty + kalman_gain ** 2 * self.observation_variance
+
+        return self.state_estimate
+
+    def get_state(self):
+        return {"state_estimate": float(self.state_estimate), "uncertainty": float(self.uncertainty),
+                "process_variance": self.process_variance, "observation_variance": self.observation_variance}
+
+    def set_state(self, state):
+        self.state_estimate = self.dtype(state["state_estimate"])
+        self.uncertainty = self.dtype(state["uncertainty"])
+        self.process_variance = self.dtype(state["process_variance"])
+        self.observation_variance = self.dtype(state["observation_variance"])
+
+class KalmanFilterBank:
+    """
+    M independent linear Kalman filters held in contiguous arrays.
+
+    Each filter has an n-dimensional state and m-dimensional observations:
+    state (M, n), covariance (M, n, n), transition (n, n) or (M, n, n),
+    observation (m, n) or (M, m, n), process_covariance (n, n) or (M, n, n),
+    observation_covariance (m, m) or (M, m, m). transition and observation
+    default to the identity, which gives the random-walk model of KalmanFilter.
+
+    With steady_state=True the covariance recursion is run once up front until
+    the gain changes by less than tol (at most max_iter steps; a
+    RuntimeWarning reports a gain that did not converge), and update() then
+    only applies the fixed gain. This needs time-invariant transition,
+    observation and noise settings.
+
+    Arrays are of the configured precision (precision.py). The covariance is
+    updated in Joseph form, (I - KH) P (I - KH)^T + K R K^T, which keeps it
+    symmetric and positive semi-definite in float32.
+    """
+
+    def __init__(self, initial_state, initial_covariance, process_covariance, observation_covariance,
+                 transition=None, observation=None, steady_state=False, tol=1e-12, max_iter=10000):
+        dtype = get_dtype()
+        self.state_estimate = np.array(initial_state, dtype=dtype)
+        n_filters, n_dim = self.state_estimate.shape
+        eye = np.eye(n_dim, dtype=dtype)
+
+        self.covariance = np.array(np.broadcast_to(initial_covariance, (n_filters, n_dim, n_dim)), dtype=dtype)
+        self.transition = eye if transition is None else np.asarray(transition, dtype=dtype)
+        self.observation = eye if observation is None else np.asarray(observation, dtype=dtype)
+        self.process_covariance = np.asarray(process_covariance, dtype=dtype)
+        self.observation_covariance = np.asarray(observation_covariance, dtype=dtype)
+        self._identity = eye
+        self._scalar = n_dim == 1 and self.observation.shape[-2] == 1
+
+        self.gain = None
+        if steady_state:
+            self.gain, self.covariance = self._steady_state_gain(tol, max_iter)
+
+    @classmethod
+    def scalar(cls, initial_state, initial_uncertainty, process_variance, observation_variance, **kwargs):
+        """Bank of scalar filters with the same model as KalmanFilter; initial_state is (M,)."""
+        initial_state = np.asarray(initial_state, dtype=get_dtype()).reshape(-1, 1)
+        return cls(initial_state,
+                   np.reshape(initial_uncertainty, (-1, 1, 1)),
+                   np.reshape(process_variance, (-1, 1, 1)),
+                   np.reshape(observation_variance, (-1, 1, 1)),
+                   **kwargs)
+
+    def _predict_covariance(self, covariance):
+        F = self.transition
+        return F @ covariance @ np.swapaxes(F, -1, -2) + self.process_covariance
+
+    def _gain(self, predicted_covariance):
+        H = self.observation
+        if self._scalar:
+            # 1x1 matrices: K = P H / (H P H + R), elementwise
+            return predicted_covariance * H / (H * predicted_covariance * H + self.observation_covariance)
+        innovation_covariance = H @ predicted_covariance @ np.swapaxes(H, -1, -2) + self.observation_covariance
+        # K = P H^T S^-1, solved rather than inverted; S and P are symmetric
+        return np.swapaxes(np.linalg.solve(innovation_covariance, H @ predicted_covariance), -1, -2)
+
+    def _corrected_covariance(self, gain, predicted_covariance):
+        if self._scalar:
+            return (1 - gain * self.observation) ** 2 * predicted_covariance + gain ** 2 * self.observation_covariance
+        # Joseph form
+        residual = self._identity - gain @ self.observation
+        return residual @ predicted_covariance @ np.swapaxes(residual, -1, -2) \
+            + gain @ self.observation_covariance @ np.swapaxes(gain, -1, -2)
+
+    def _steady_state_gain(self, tol, max_iter):
+        predicted = self._predict_covariance(self.covariance)
+        gain = self._gain(predicted)
+        covariance = self._corrected_covariance(gain, predicted)
+        change = np.inf
+        for _ in range(max_iter):
+            predicted = self._predict_covariance(covariance)
+            new_gain = self._gain(predicted)
+            covariance = self._corrected_covariance(new_gain, predicted)
+            change = np.max(np.abs(new_gain - gain))
+            gain = new_gain
+            if change < tol:
+                break
+        if not change < tol:
+            warnings.warn(f"Steady-state gain did not converge to tol={tol} in {max_iter} iterations "
+                          f"(last change {change:.3g})", RuntimeWarning, stacklevel=3)
+        return gain, covariance
+
+    def update(self, observation, mask=None):
+        """
+        Predict and correct every filter with one observation each.
+
+        observation is (M, m), or (M,) for scalar banks. Filters where mask is
+        False are left untouched. Returns the state estimates, shaped (M,) for
+        scalar banks and (M, n) otherwise.
+        """
+        observation = np.asarray(observation, dtype=self.state_estimate.dtype).reshape(self.state_estimate.shape[0], -1)
+        F, H = self.transition, self.observation
+
+        predicted_state = (F @ self.state_estimate[..., None])[..., 0]
+        if self.gain is None:
+            predicted_covariance = self._predict_covariance(self.covariance)
+            gain = self._gain(predicted_covariance)
+            covariance = self._corrected_covariance(gain, predicted_covariance)
+        else:
+            gain = self.gain
+            covariance = self.covariance
+
+        innovation = observation - (H @ predicted_state[..., None])[..., 0]
+        state = predicted_state + (gain @ innovation[..., None])[..., 0]
+
+        if mask is None:
+            self.state_estimate = state
+            self.covariance = covariance
+        else:
+            mask = np.asarray(mask, dtype=bool)
+            self.state_estimate = np.where(mask[:, None], state, self.state_estimate)
+            if self.gain is None:
+                self.covariance = np.where(mask[:, None, None], covariance, self.covariance)
 
-        return self.state_estimate
\ No newline at end of file
+        return self.state_estimate[:, 0] if self._scalar else self.state_estimate
@@ -1,6 +1,14 @@
 import numpy as np
-from brain_region_base import BrainRegion
+from brain_region_base import BrainRegion, as_float, batch_level
 
 class LanguageArea(BrainRegion):
+    # Pure function of its inputs: eligible for region_cache.RegionCache
+    cacheable = True
+    neurotransmitter_keys = ('acetylcholine',)
+
     def process(self, linguistic_input, neurotransmitters, internal_state=None):
-        return np.sum(linguistic_input) * neurotransmitters.get('acetylcholine', 1.0)
\ No newline at end of file
+        # From raw audio (AudioSource, features="speech") the input is the speech-band share of the levels
+        return np.sum(as_float(linguistic_input)) * neurotransmitters.get('acetylcholine', 1.0)
+
+    def process_batch(self, linguistic_inputs, neurotransmitters, internal_state=None):
+        return np.sum(as_float(linguistic_inputs), axis=1) * batch_level(neurotransmitters, 'acetylcholine', 1.0)
\ No newline at end of file
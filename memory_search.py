@@ -0,0 +1,351 @@
+# memory_search.py
+
+"""
+MemorySearchEngine: nearest-neighbour recall over consolidated Hippocampus traces.
+
+Traces live in a contiguous TraceMatrix. The exact index scores every trace
+with one matrix product against cached squared norms. The "ivf" index
+(coarse clustering) assigns each trace to its nearest centroid and only
+scans the traces of the n_probe closest lists at query time. The inverted
+lists share one id array, each list a slice with room to grow, so the
+candidates of a whole block of queries are gathered and scored at once.
+
+Both indexes are updated incrementally by add(). The ivf centroids are
+trained once, when train_size traces are available, and never rebuilt:
+by default (n_lists=None) there are about sqrt(len) lists, and a list that
+outgrows twice that is split in two by 2-means over its own traces. With
+n_probe=None, n_probe is calibrated after training and whenever the number
+of lists has doubled: it is the fewest lists holding target_recall of the
+10 nearest neighbours of 256 sampled traces. When that is more than a third
+of the lists the query falls back to the exact scan, which is then cheaper.
+
+Single-query latency (k=5) and recall@5 of ivf against exact, 300k traces
+built by adds of 100, one core:
+
+    D   traces                   exact     ivf       recall@5  lists/probe
+    3   gaussian                 2.3 ms    0.37 ms   0.99      382 / 3
+    64  clustered (1000 centres) 20 ms     0.53 ms   0.99      461 / 2
+    64  gaussian                 20 ms     20 ms     1.00      exact scan
+
+The exact scan reads the whole matrix on every query (150 MB at D=64), so it
+only reaches sub-millisecond latency up to some tens of thousands of traces;
+ivf meets it for low-dimensional or clustered traces such as the
+Hippocampus ones. Unstructured high-dimensional traces have no neighbourhood
+an index can exploit: reaching the recall target there needs a large share
+of the lists, and search() scans exactly instead. Training and calibration
+at 300k traces take a few hundred milliseconds inside the add() that
+triggers them.
+"""
+
+import numpy as np
+
+from memory_store import TraceMatrix
+
+INDEX_TYPES = ("exact", "ivf")
+ASSIGN_BLOCK = 8192
+CANDIDATE_BUDGET = 1 << 21
+CALIBRATION_QUERIES = 256
+CALIBRATION_K = 10
+EXACT_FRACTION = 1 / 3
+
+
+def _grow(array, needed):
+    if needed <= array.shape[0]:
+        return array
+    grown = np.zeros((max(2 * array.shape[0], needed),) + array.shape[1:], dtype=array.dtype)
+    grown[:array.shape[0]] = array
+    return grown
+
+
+def _squared_distances(queries, traces, trace_norms):
+    return np.maximum(trace_norms[None, :] - 2.0 * queries @ traces.T + np.sum(queries ** 2, axis=1)[:, None], 0.0)
+
+
+def _nearest(rows, centroids, centroid_norms):
+    """Nearest centroid of every row, in blocks so the distance matrix stays small."""
+    labels = np.empty(len(rows), dtype=np.int64)
+    for lo in range(0, len(rows), ASSIGN_BLOCK):
+        block = rows[lo:lo + ASSIGN_BLOCK]
+        # The norm of the row does not change which centroid is nearest
+        labels[lo:lo + len(block)] = np.argmin(centroid_norms[None, :] - 2.0 * block @ centroids.T, axis=1)
+    return labels
+
+
+def _ranges(starts, counts):
+    """Concatenation of arange(start, start + count) over the (start, count) pairs."""
+    starts, counts = starts.ravel(), counts.ravel()
+    ends = np.cumsum(counts)
+    return np.arange(ends[-1] if len(ends) else 0) + np.repeat(starts - (ends - counts), counts)
+
+
+def _top_k(scores, k):
+    """Column indices of the k smallest scores of every row, smallest first."""
+    top = np.argpartition(scores, k - 1, axis=1)[:, :k] if k < scores.shape[1] \
+        else np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    return np.take_along_axis(top, np.argsort(np.take_along_axis(scores, top, axis=1), axis=1, kind="stable"), axis=1)
+
+
+class MemorySearchEngine:
+    def __init__(self, store=None, index="exact", n_lists=None, n_probe=None, train_size=None, target_recall=0.95,
+                 kmeans_iterations=10, seed=0):
+        if index not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type {index!r}; expected one of {INDEX_TYPES}")
+        self.store = TraceMatrix() if store is None else store
+        self.index = index
+        # None: lists follow the store size (n_lists) and n_probe is calibrated to target_recall
+        self.auto_lists = n_lists is None
+        self.auto_probe = n_probe is None
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_size = (4096 if n_lists is None else 32 * n_lists) if train_size is None else train_size
+        self.target_recall = target_recall
+        self.kmeans_iterations = kmeans_iterations
+        self.rng = np.random.default_rng(seed)
+
+        self.norms = np.zeros(64, dtype=self.store.dtype)
+        self.centroids = None
+        self.calibrated_lists = 0
+
+        # Index traces that were already in the store
+        if len(self.store):
+            self._index_rows(0, len(self.store))
+
+    def __len__(self):
+        return len(self.store)
+
+    def get_state(self):
+        """Index state; the traces themselves belong to the store and are saved with it."""
+        lists = [] if self.centroids is None else \
+            [self.slot_ids[start:start + count].copy() for start, count in zip(self.list_start, self.list_counts)]
+        return {"index": self.index, "n_lists": self.n_lists, "n_probe": self.n_probe, "train_size": self.train_size,
+                "auto_lists": self.auto_lists, "auto_probe": self.auto_probe, "target_recall": self.target_recall,
+                "calibrated_lists": self.calibrated_lists,
+                "kmeans_iterations": self.kmeans_iterations, "rng": self.rng.bit_generator.state,
+                "norms": self.norms[:len(self.store)].copy(),
+                "centroids": None if self.centroids is None else self.centroids.copy(),
+                "list_ids": lists,
+                "list_counts": np.array([len(ids) for ids in lists], dtype=np.int64)}
+
+    def set_state(self, state):
+        self.index = state["index"]
+        self.n_lists = state["n_lists"]
+        self.n_probe = state["n_probe"]
+        self.train_size = state["train_size"]
+        self.auto_lists = state.get("auto_lists", False)
+        self.auto_probe = state.get("auto_probe", False)
+        self.target_recall = state.get("target_recall", self.target_recall)
+        self.calibrated_lists = state.get("calibrated_lists", self.n_lists or 0)
+        self.kmeans_iterations = state["kmeans_iterations"]
+        self.rng = np.random.default_rng()
+        self.rng.bit_generator.state = state["rng"]
+        self.norms = np.array(state["norms"], dtype=self.store.dtype)
+        self.centroids = None if state["centroids"] is None else np.array(state["centroids"], dtype=self.store.dtype)
+        if self.centroids is not None:
+            self.centroid_norms = np.sum(self.centroids ** 2, axis=1)
+            counts = np.array(state["list_counts"], dtype=np.int64)
+            ids = [np.array(ids, dtype=np.int64)[:count] for ids, count in zip(state["list_ids"], counts)]
+            self._layout(np.concatenate(ids), np.repeat(np.arange(self.n_lists), counts))
+
+    def add(self, traces):
+        """Append one trace (D,) or a block (k, D) to the store and the index."""
+        start = len(self.store)
+        self.store.append(traces)
+        self._index_rows(start, len(self.store))
+
+    def _index_rows(self, start, end):
+        rows = self.store.matrix[start:end]
+        self.norms = _grow(self.norms, end)
+        self.norms[start:end] = np.sum(rows ** 2, axis=1)
+
+        if self.index != "ivf":
+            return
+        if self.centroids is None:
+            if end >= max(self.train_size, self.n_lists or 1):
+                self._train(end)
+            return
+        labels = _nearest(rows, self.centroids, self.centroid_norms)
+        self._insert(np.arange(start, end), labels)
+        if self.auto_lists:
+            # Lists hold about sqrt(len) traces: one that outgrows twice that is split in two
+            for label in np.unique(labels):
+                if self.list_counts[label] > 2 * max(np.sqrt(end), 16):
+                    self._split(label)
+            if self.auto_probe and self.n_lists >= 2 * self.calibrated_lists:
+                self._calibrate(end, self._labels(end))
+
+    def _train(self, end):
+        traces = self.store.matrix[:end]
+        if self.auto_lists:
+            self.n_lists = int(min(max(np.sqrt(end), 16), end))
+        # k-means on a sample of 32 traces per list, then every trace goes to its nearest centroid
+        sample = traces if end <= 32 * self.n_lists \
+            else traces[np.sort(self.rng.choice(end, 32 * self.n_lists, replace=False))]
+        self.centroids = self._kmeans(sample, self.n_lists)
+        self.centroid_norms = np.sum(self.centroids ** 2, axis=1)
+        labels = _nearest(traces, self.centroids, self.centroid_norms)
+        self._layout(np.arange(end), labels)
+        if self.auto_probe:
+            self._calibrate(end, labels)
+
+    def _kmeans(self, points, n_clusters):
+        centroids = points[self.rng.choice(len(points), n_clusters, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            labels = _nearest(points, centroids, np.sum(centroids ** 2, axis=1))
+            counts = np.bincount(labels, minlength=n_clusters)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, points)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+        return centroids
+
+    def _split(self, label):
+        """Split one list in two by 2-means over its traces; the new half becomes the last list."""
+        start, count = self.list_start[label], self.list_counts[label]
+        ids = self.slot_ids[start:start + count].copy()
+        halves = self._kmeans(self.store.matrix[ids], 2)
+        labels = np.where(_nearest(self.store.matrix[ids], halves, np.sum(halves ** 2, axis=1)) == 1,
+                          self.n_lists, label)
+        self.centroids = np.concatenate([self.centroids, halves[1:]])
+        self.centroids[label] = halves[0]
+        self.centroid_norms = np.sum(self.centroids ** 2, axis=1)
+        self.n_lists += 1
+        self.list_counts[label] = 0
+        # The new list starts without room, so the insert lays all lists out again
+        self.list_start = np.append(self.list_start, len(self.slot_ids))
+        self.list_capacity = np.append(self.list_capacity, 0)
+        self.list_counts = np.append(self.list_counts, 0)
+        self._insert(ids, labels)
+
+    def _labels(self, end):
+        """List of every trace, read back from the inverted lists."""
+        labels = np.empty(end, dtype=np.int64)
+        labels[self.slot_ids[_ranges(self.list_start, self.list_counts)]] = np.repeat(np.arange(self.n_lists),
+                                                                                       self.list_counts)
+        return labels
+
+    def _calibrate(self, end, labels):
+        """Set n_probe to the fewest lists that hold target_recall of the nearest neighbours of sampled traces."""
+        self.calibrated_lists = self.n_lists
+        k = min(CALIBRATION_K, end - 1)
+        if k < 1:
+            self.n_probe = 1
+            return
+        traces = self.store.matrix[:end]
+        ids = self.rng.choice(end, min(CALIBRATION_QUERIES, end), replace=False)
+        queries = traces[ids]
+        neighbours = np.empty((len(ids), k), dtype=np.int64)
+        for lo in range(0, len(ids), 16):
+            scores = self.norms[None, :end] - 2.0 * queries[lo:lo + 16] @ traces.T
+            # Each sampled trace is its own nearest neighbour; leave it out
+            scores[np.arange(len(scores)), ids[lo:lo + 16]] = np.inf
+            neighbours[lo:lo + 16] = np.argpartition(scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(self.centroid_norms[None, :] - 2.0 * queries @ self.centroids.T, axis=1)
+        rank = np.empty_like(order)
+        np.put_along_axis(rank, order, np.arange(self.n_lists)[None, :], axis=1)
+        # A neighbour is found once its list is among the probed ones
+        needed = np.sort(np.take_along_axis(rank, labels[neighbours], axis=1), axis=None)
+        self.n_probe = int(needed[int(np.ceil(self.target_recall * needed.size)) - 1]) + 1
+
+    def _layout(self, ids, labels):
+        """Inverted lists of (ids, labels) in one array, each list a slice with room to grow."""
+        counts = np.bincount(labels, minlength=self.n_lists)
+        self.list_capacity = counts + counts // 2 + 16
+        self.list_start = np.cumsum(self.list_capacity) - self.list_capacity
+        self.list_counts = np.zeros(self.n_lists, dtype=np.int64)
+        self.slot_ids = np.zeros(self.list_capacity.sum(), dtype=np.int64)
+        self._insert(ids, labels)
+
+    def _insert(self, ids, labels):
+        order = np.argsort(labels, kind="stable")
+        ids, labels = ids[order], labels[order]
+        added = np.bincount(labels, minlength=self.n_lists)
+        counts = self.list_counts + added
+        if (counts > self.list_capacity).any():
+            # Lists that overflow double their room; all lists move to their new slices
+            capacity = np.where(counts > self.list_capacity, 2 * counts, self.list_capacity)
+            start = np.cumsum(capacity) - capacity
+            slot_ids = np.zeros(capacity.sum(), dtype=np.int64)
+            slot_ids[_ranges(start, self.list_counts)] = self.slot_ids[_ranges(self.list_start, self.list_counts)]
+            self.slot_ids, self.list_start, self.list_capacity = slot_ids, start, capacity
+        first = np.cumsum(added) - added
+        slots = self.list_start[labels] + self.list_counts[labels] + np.arange(len(ids)) - first[labels]
+        self.slot_ids[slots] = ids
+        self.list_counts = counts
+
+    def _search_exact(self, queries, k):
+        n_traces = len(self.store)
+        # Query norms are added after the selection; they do not change the order
+        scores = self.norms[None, :n_traces] - 2.0 * queries @ self.store.matrix[:n_traces].T
+        top = _top_k(scores, k)
+        distances = np.take_along_axis(scores, top, axis=1) + np.sum(queries ** 2, axis=1)[:, None]
+        return top, np.sqrt(np.maximum(distances, 0.0))
+
+    def _search_ivf(self, queries, k):
+        n_probe = min(self.n_probe, self.n_lists)
+        centroid_scores = self.centroid_norms[None, :] - 2.0 * queries @ self.centroids.T
+        probes = np.argpartition(centroid_scores, n_probe - 1, axis=1)[:, :n_probe] if n_probe < self.n_lists \
+            else np.tile(np.arange(self.n_lists), (len(queries), 1))
+        counts = self.list_counts[probes]
+        lengths = counts.sum(axis=1)
+
+        indices = np.zeros((len(queries), k), dtype=np.int64)
+        distances = np.zeros((len(queries), k), dtype=queries.dtype)
+        # Queries whose probed lists hold fewer than k traces are answered exactly
+        short = lengths < k
+        if short.any():
+            indices[short], distances[short] = self._search_exact(queries[short], k)
+        rows = np.flatnonzero(~short)
+        # Blocks of queries whose candidates together stay within CANDIDATE_BUDGET rows
+        block_of = np.cumsum(lengths[rows]) // CANDIDATE_BUDGET
+        for block in np.split(rows, np.flatnonzero(np.diff(block_of)) + 1):
+            if not len(block):
+                continue
+            sizes = lengths[block]
+            candidates = self.slot_ids[_ranges(self.list_start[probes[block]], counts[block])]
+            owner = np.repeat(np.arange(len(block)), sizes)
+            vectors = np.take(self.store.matrix, candidates, axis=0)
+            dots = vectors @ queries[block[0]] if len(block) == 1 \
+                else np.einsum("ij,ij->i", vectors, queries[block][owner])
+            # (queries, longest candidate list) score matrix, padded with inf
+            scores = np.full((len(block), sizes.max()), np.inf, dtype=queries.dtype)
+            ids = np.zeros(scores.shape, dtype=np.int64)
+            column = np.arange(len(candidates)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+            scores[owner, column] = np.take(self.norms, candidates) - 2.0 * dots
+            ids[owner, column] = candidates
+            top = _top_k(scores, k)
+            indices[block] = np.take_along_axis(ids, top, axis=1)
+            squared = np.take_along_axis(scores, top, axis=1) + np.sum(queries[block] ** 2, axis=1)[:, None]
+            distances[block] = np.sqrt(np.maximum(squared, 0.0))
+        return indices, distances
+
+    def search(self, query, k=5):
+        """
+        Return (indices, distances) of the k traces nearest to `query`, closest first.
+        A single query (D,) gives (k,) arrays; a block (Q, D) gives (Q, k).
+        """
+        query = np.asarray(query, dtype=self.store.dtype)
+        single = query.ndim == 1
+        queries = query[None, :] if single else query
+        k = min(k, len(self.store))
+        if k == 0:
+            empty = np.zeros((queries.shape[0], 0), dtype=queries.dtype)
+            return (empty[0].astype(np.int64), empty[0]) if single else (empty.astype(np.int64), empty)
+
+        # Probing a large share of the lists costs more than scanning every trace
+        if self.centroids is None or self.n_probe > EXACT_FRACTION * self.n_lists:
+            indices, distances = self._search_exact(queries, k)
+        else:
+            indices, distances = self._search_ivf(queries, k)
+        return (indices[0], distances[0]) if single else (indices, distances)
+
+    def reconstruct(self, query, k=5):
+        """Reconstruct a trace as the mean of its k nearest stored traces."""
+        indices, _ = self.search(query, k)
+        if indices.size == 0:
+            return None
+        return self.store.matrix[indices].mean(axis=-2)
+
+    def prediction_error(self, query):
+        """Distance from `query` to the closest stored trace (None when empty)."""
+        _, distances = self.search(query, 1)
+        return None if distances.size == 0 else distances[..., 0]
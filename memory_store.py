@@ -0,0 +1,154 @@
+# memory_store.py
+
+"""
+Array-backed trace stores for the Hippocampus.
+
+TraceRingBuffer keeps the most recent short-term traces in a preallocated
+array of fixed capacity, so memory stays flat and an append is a copy into an
+existing slot. TraceMatrix keeps consolidated traces as rows of one
+contiguous matrix that grows geometrically. Both store traces in the
+configured precision (precision.py) unless given a dtype.
+"""
+
+import numpy as np
+
+from precision import get_dtype
+
+EVICTION_POLICIES = ("oldest", "lowest_salience")
+
+
+class TraceRingBuffer:
+    def __init__(self, capacity=1000, eviction="oldest", dtype=None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy {eviction!r}; expected one of {EVICTION_POLICIES}")
+        self.capacity = capacity
+        self.eviction = eviction
+        self.dtype = get_dtype() if dtype is None else dtype
+        self.buffer = None  # allocated on the first append, once the trace shape is known
+        self.salience = np.zeros(capacity, dtype=self.dtype)
+        self.order = np.zeros(capacity, dtype=np.int64)  # insertion number of each slot
+        self.count = 0
+        self.total = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, trace, salience=None):
+        """Store one trace, evicting per the policy when full; salience defaults to its L2 norm."""
+        trace = np.asarray(trace)
+        if self.buffer is None:
+            self.buffer = np.zeros((self.capacity,) + trace.shape, dtype=self.dtype)
+
+        if self.count < self.capacity:
+            slot = self.count
+            self.count += 1
+        elif self.eviction == "oldest":
+            slot = self.total % self.capacity
+        else:
+            slot = int(np.argmin(self.salience))
+
+        self.buffer[slot] = trace
+        self.salience[slot] = np.linalg.norm(trace) if salience is None else salience
+        self.order[slot] = self.total
+        self.total += 1
+
+    def extend(self, traces):
+        """Store a block of traces (k, ...) as k consecutive append() calls would."""
+        traces = np.asarray(traces)
+        if self.eviction != "oldest":
+            for trace in traces:
+                self.append(trace)
+            return
+        if self.buffer is None:
+            self.buffer = np.zeros((self.capacity,) + traces.shape[1:], dtype=self.dtype)
+
+        # Under "oldest" eviction insertion number n always lands in slot n % capacity
+        skipped = max(0, traces.shape[0] - self.capacity)
+        numbers = np.arange(self.total + skipped, self.total + traces.shape[0])
+        slots = numbers % self.capacity
+        kept = traces[skipped:]
+        self.buffer[slots] = kept
+        self.salience[slots] = np.linalg.norm(kept.reshape(len(kept), -1), axis=1)
+        self.order[slots] = numbers
+        self.total += traces.shape[0]
+        self.count = min(self.capacity, self.count + traces.shape[0])
+
+    def get_state(self):
+        count = self.count
+        return {"capacity": self.capacity, "eviction": self.eviction, "dtype": np.dtype(self.dtype).str,
+                "buffer": None if self.buffer is None else self.buffer[:count].copy(),
+                "salience": self.salience[:count].copy(), "order": self.order[:count].copy(),
+                "count": count, "total": self.total}
+
+    def set_state(self, state):
+        self.capacity = state["capacity"]
+        self.eviction = state["eviction"]
+        self.dtype = np.dtype(state["dtype"])
+        count = self.count = state["count"]
+        self.total = state["total"]
+        self.buffer = None
+        if state["buffer"] is not None:
+            stored = np.asarray(state["buffer"])
+            self.buffer = np.zeros((self.capacity,) + stored.shape[1:], dtype=self.dtype)
+            self.buffer[:count] = stored
+        self.salience = np.zeros(self.capacity, dtype=self.dtype)
+        self.salience[:count] = state["salience"]
+        self.order = np.zeros(self.capacity, dtype=np.int64)
+        self.order[:count] = state["order"]
+
+    def latest(self):
+        if self.count == 0:
+            return None
+        return self.buffer[int(np.argmax(self.order[:self.count]))]
+
+    def traces(self):
+        """Stored traces from oldest to newest, as a new array."""
+        if self.count == 0:
+            return np.zeros((0,))
+        return self.buffer[np.argsort(self.order[:self.count], kind="stable")]
+
+
+class TraceMatrix:
+    def __init__(self, initial_capacity=64, dtype=None):
+        self.initial_capacity = initial_capacity
+        self.dtype = get_dtype() if dtype is None else dtype
+        self.data = None
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def matrix(self):
+        """View of the stored traces, one row per trace."""
+        if self.data is None:
+            return np.zeros((0, 0), dtype=self.dtype)
+        return self.data[:self.count]
+
+    def get_state(self):
+        return {"initial_capacity": self.initial_capacity, "dtype": np.dtype(self.dtype).str,
+                "matrix": None if self.data is None else self.data[:self.count].copy()}
+
+    def set_state(self, state):
+        self.initial_capacity = state["initial_capacity"]
+        self.dtype = np.dtype(state["dtype"])
+        self.data = None if state["matrix"] is None else np.array(state["matrix"], dtype=self.dtype)
+        self.count = 0 if self.data is None else self.data.shape[0]
+
+    def append(self, traces):
+        """Append one trace (D,) or a block of traces (k, D)."""
+        traces = np.asarray(traces, dtype=self.dtype)
+        traces = traces.reshape(-1, traces.shape[-1]) if traces.ndim != 1 else traces[None, :]
+        needed = self.count + traces.shape[0]
+
+        if self.data is None:
+            self.data = np.zeros((max(self.initial_capacity, needed), traces.shape[1]), dtype=self.dtype)
+        elif needed > self.data.shape[0]:
+            grown = np.zeros((max(2 * self.data.shape[0], needed), self.data.shape[1]), dtype=self.dtype)
+            grown[:self.count] = self.data[:self.count]
+            self.data = grown
+
+        self.data[self.count:needed] = traces
+        self.count = needed
@@ -1,8 +1,17 @@
 import numpy as np
-from brain_region_base import BrainRegion
+from brain_region_base import BrainRegion, as_float, batch_level
 
 class Midbrain(BrainRegion):
+    # Pure function of its inputs: eligible for region_cache.RegionCache
+    cacheable = True
+    neurotransmitter_keys = ('acetylcholine', 'dopamine')
+
     def process(self, input_signal, neurotransmitters, internal_state=None):
         ach = neurotransmitters.get('acetylcholine', 1.0)
         dopamine = neurotransmitters.get('dopamine', 1.0)
-        return np.mean(input_signal) * ach * dopamine
\ No newline at end of file
+        return np.mean(as_float(input_signal)) * ach * dopamine
+
+    def process_batch(self, input_signals, neurotransmitters, internal_state=None):
+        ach = batch_level(neurotransmitters, 'acetylcholine', 1.0)
+        dopamine = batch_level(neurotransmitters, 'dopamine', 1.0)
+        return np.mean(as_float(input_signals), axis=1) * ach * dopamine
\ No newline at end of file
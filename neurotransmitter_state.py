@@ -0,0 +1,190 @@
+# neurotransmitter_state.py
+
+"""
+Neurotransmitter levels with change tracking.
+
+NeurotransmitterState is a dict of levels, so regions keep calling
+.get("dopamine", 1.0) at dict speed, that also keeps the levels in one float
+array (`values`, NaN for an unset transmitter). Every transmitter has a fixed
+slot: those of TRANSMITTERS come first in that order, any other one gets the
+next free slot when it is first set. A slot carries a
+version that is bumped whenever its level actually changes (assigning the
+value it already holds is not a change), and the names changed since the last
+clear_changes() are collected in `changed`. Simulator.step() clears them at
+the start of every step, so afterwards `changed` lists what that step changed.
+
+IncrementalEvaluator builds on the versions. Pure regions (cacheable = True)
+already declare the transmitters and internal-state entries they read in
+neurotransmitter_keys and internal_state_keys. Bound through the evaluator,
+such a region is only called again when its input signal, one of those
+transmitters or one of those entries changed since its previous call;
+otherwise its previous output is returned. The input is only fingerprinted
+while the levels are unchanged, so a region whose levels change every step
+costs one version comparison, and the first call after its levels settle
+always runs. With a plain dict of levels the region always runs.
+
+    neurotransmitters = NeurotransmitterState(config["neurotransmitters"])
+    simulator = Simulator(input_signal, neurotransmitters, ...)  # evaluates incrementally
+"""
+
+import operator
+
+import numpy as np
+
+from region_cache import fingerprint
+
+TRANSMITTERS = ("dopamine", "serotonin", "glutamate", "acetylcholine", "norepinephrine", "dopamine_decay",
+                "oxytocin", "vasopressin", "gaba")
+
+
+class NeurotransmitterState(dict):
+    # A dict subclass so that the regions' .get() calls stay plain dict reads;
+    # every write goes through __setitem__/__delitem__, which keep the array and versions
+    def __init__(self, levels=None):
+        super().__init__()
+        self.index = {key: slot for slot, key in enumerate(TRANSMITTERS)}
+        self.names = list(TRANSMITTERS)
+        self.values = np.full(len(TRANSMITTERS), np.nan)
+        self.versions = [0] * len(TRANSMITTERS)
+        self.changed = set()
+        if levels:
+            self.update(levels)
+
+    def _slot(self, key):
+        slot = self.index.get(key)
+        if slot is None:
+            slot = self.index[key] = len(self.names)
+            self.names.append(key)
+            self.versions.append(0)
+            if slot == len(self.values):
+                self.values = np.concatenate([self.values, np.full(len(self.values), np.nan)])
+        return slot
+
+    def __setitem__(self, key, value):
+        value = float(value)
+        if dict.get(self, key) != value or key not in self:
+            slot = self._slot(key)
+            dict.__setitem__(self, key, value)
+            self.values[slot] = value
+            self.versions[slot] += 1
+            self.changed.add(key)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        slot = self.index[key]
+        self.values[slot] = np.nan
+        self.versions[slot] += 1
+        self.changed.add(key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key not in self:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        value = self[key]
+        del self[key]
+        return value
+
+    def popitem(self):
+        key = next(reversed(self))
+        return key, self.pop(key)
+
+    def clear(self):
+        for key in list(self):
+            del self[key]
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __repr__(self):
+        return f"NeurotransmitterState({dict.__repr__(self)})"
+
+    def copy(self):
+        return NeurotransmitterState(self)
+
+    def versions_of(self, keys):
+        """Tuple of the change counters of `keys` (0 for a transmitter that was never set)."""
+        return tuple(self.versions[self._slot(key)] for key in keys)
+
+    def version_getter(self, keys):
+        """Callable taking self.versions to the counters of `keys`; reserves slots for unknown keys."""
+        slots = [self._slot(key) for key in keys]
+        return (lambda versions: ()) if not slots else operator.itemgetter(*slots)
+
+    def clear_changes(self):
+        """Return the transmitters changed since the previous call and start a new record."""
+        changed, self.changed = self.changed, set()
+        return changed
+
+
+class IncrementalEvaluator:
+    # Calls a region with a changing input waits before its input is fingerprinted again (doubling, up to this)
+    MAX_BACKOFF = 8
+
+    def __init__(self):
+        # {region name: [calls, skips]}
+        self.counts = {}
+
+    def bind(self, region, process):
+        """Wrap a pure region's process(input, neurotransmitters, internal_state) to skip unchanged calls."""
+        counts = self.counts.setdefault(region.name, [0, 0])
+        nt_keys = tuple(region.neurotransmitter_keys)
+        state_keys = tuple(region.internal_state_keys)
+        max_backoff = self.MAX_BACKOFF
+        levels = getter = None
+        last_versions = last_state = last_key = last_output = None
+        wait = backoff = 0
+
+        def incremental(signal, neurotransmitters, internal_state=None):
+            nonlocal levels, getter, last_versions, last_state, last_key, last_output, wait, backoff
+            if neurotransmitters is not levels:
+                if not isinstance(neurotransmitters, NeurotransmitterState):
+                    counts[0] += 1
+                    return process(signal, neurotransmitters, internal_state)
+                levels, getter = neurotransmitters, neurotransmitters.version_getter(nt_keys)
+                last_versions = last_key = None
+            versions = getter(levels.versions)
+            state = tuple(map(internal_state.get, state_keys)) if state_keys else ()
+            key = None
+            # The input is only fingerprinted on the first call and while the levels it reads hold
+            # still, and less often while it keeps changing
+            if last_versions is None or versions == last_versions and state == last_state:
+                if wait:
+                    wait -= 1
+                else:
+                    try:
+                        key = signal.tobytes() if type(signal) is np.ndarray and signal.ndim == 1 else fingerprint(signal)
+                    except TypeError:
+                        counts[0] += 1
+                        return process(signal, neurotransmitters, internal_state)
+                    if key == last_key:
+                        counts[1] += 1
+                        backoff = 0
+                        return last_output
+                    if last_key is not None:
+                        backoff = min(2 * backoff or 1, max_backoff)
+                        wait = backoff
+
+            counts[0] += 1
+            result = process(signal, neurotransmitters, internal_state)
+            # Only an output that may be returned again is made read-only
+            if key is not None and type(result) is np.ndarray:
+                result.setflags(write=False)
+            last_versions, last_state, last_key, last_output = versions, state, key, result
+            return result
+
+        return incremental
+
+    def stats(self):
+        """{region name: {"calls", "skips"}}."""
+        return {name: {"calls": calls, "skips": skips} for name, (calls, skips) in self.counts.items()}
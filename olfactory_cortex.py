@@ -1,14 +1,26 @@
-from brain_region_base import BrainRegion
+from brain_region_base import BrainRegion, as_float, batch_level
 import numpy as np
 
 class OlfactoryCortex(BrainRegion):
+    neurotransmitter_keys = ('serotonin',)
+
     def __init__(self, name):
         super().__init__(name)
         self.previous_intensity = 0.0
         self.desensitization_rate = 0.1  # Sensitivity reduction rate
 
+    def get_state(self):
+        # previous_intensity is a float, or an (N,) array once process_batch has run
+        return {"previous_intensity": np.array(self.previous_intensity, dtype=float),
+                "desensitization_rate": self.desensitization_rate}
+
+    def set_state(self, state):
+        previous_intensity = np.array(state["previous_intensity"], dtype=float)
+        self.previous_intensity = float(previous_intensity) if previous_intensity.ndim == 0 else previous_intensity
+        self.desensitization_rate = state["desensitization_rate"]
+
     def process(self, olfactory_input, neurotransmitters, internal_state):
-        intensity = np.array(olfactory_input)[0]
+        intensity = as_float(olfactory_input)[0]
         delta = abs(intensity - self.previous_intensity)
 
         # If stimulation continues, gradually reduce sensitivity
@@ -20,4 +32,17 @@ class OlfactoryCortex(BrainRegion):
         serotonin_level = neurotransmitters.get("serotonin", 0.5)
         discomfort = intensity * (1 - serotonin_level)
 
-        return [discomfort]
\ No newline at end of file
+        return [discomfort]
+
+    def process_batch(self, olfactory_inputs, neurotransmitters, internal_state):
+        # previous_intensity becomes a per-subject (N,) array after the first call
+        intensity = as_float(olfactory_inputs)[:, 0]
+        delta = np.abs(intensity - self.previous_intensity)
+        intensity = np.where(delta < 0.05, intensity * (1 - self.desensitization_rate), intensity)
+
+        self.previous_intensity = intensity
+
+        serotonin_level = batch_level(neurotransmitters, "serotonin", 0.5)
+        discomfort = intensity * (1 - serotonin_level)
+
+        return discomfort[:, None]
\ No newline at end of file
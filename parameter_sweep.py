@@ -0,0 +1,217 @@
+# parameter_sweep.py
+
+"""
+Parallel parameter sweeps over config.json.
+
+A design is a list of points, each a dict of parameter overrides. Names are
+resolved against the simulation settings (steps, dt, discrepancy_threshold,
+escape_duration), then the neurotransmitters, then the internal state of the
+base config. grid_design() builds the full factorial grid and random_design()
+draws uniform samples from ranges (integers for integer ranges and for
+INTEGER_PARAMETERS).
+
+Besides the settings, a config may give a "schedule", "precision" and
+"population" as for simulate_brain_activity.py; run_point() applies them.
+Other top-level keys are rejected rather than silently ignored.
+
+run_sweep() runs the points across a process pool and returns one summary
+row per point. Every finished point is cached under the SHA-256 of its
+effective config, so an interrupted or extended sweep only runs new points.
+Stimulus and schedule files are hashed by path, size and modification time,
+so editing one invalidates the points that read it.
+"""
+
+import argparse
+import copy
+import csv
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from precision import precision
+from simulator import Simulator
+
+SIMULATION_SETTINGS = {"steps": 100, "dt": 0.1, "discrepancy_threshold": 0.5, "escape_duration": 3}
+INTEGER_PARAMETERS = ("steps", "escape_duration")
+STIMULUS_CHANNELS = ("external_stimuli", "image_signals", "linguistic_inputs", "auditory_inputs", "olfactory_inputs")
+CONFIG_KEYS = ("simulation", "neurotransmitters", "internal_state", "schedule", "precision", "population") \
+    + STIMULUS_CHANNELS
+SUMMARY_SERIES = ("visual_language_discrepancy", "auditory_language_discrepancy", "olfactory_discomfort", "feedback_intensity")
+
+
+def grid_design(grid):
+    """Full factorial design from {name: [values]}."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def _sample(rng, name, low, high):
+    if name in INTEGER_PARAMETERS or (isinstance(low, int) and isinstance(high, int)):
+        # Integer ranges include both bounds
+        return int(rng.integers(int(np.ceil(low)), int(np.floor(high)), endpoint=True))
+    return float(rng.uniform(low, high))
+
+
+def random_design(ranges, samples, seed=0):
+    """Uniform random design from {name: (low, high)}; integer ranges give integers in [low, high]."""
+    rng = np.random.default_rng(seed)
+    return [{name: _sample(rng, name, low, high) for name, (low, high) in ranges.items()} for _ in range(samples)]
+
+
+def effective_config(base_config, point, settings=None):
+    """Apply one point's overrides to a copy of the base config and settings."""
+    unknown = set(base_config) - set(CONFIG_KEYS)
+    if unknown:
+        raise ValueError(f"Config keys {sorted(unknown)} are not supported by sweeps; expected {CONFIG_KEYS}")
+    config = copy.deepcopy(base_config)
+    config["simulation"] = dict(SIMULATION_SETTINGS)
+    config["simulation"].update(base_config.get("simulation", {}))
+    config["simulation"].update(settings or {})
+    for name, value in point.items():
+        if name in config["simulation"]:
+            config["simulation"][name] = value
+        elif name in config["neurotransmitters"]:
+            config["neurotransmitters"][name] = value
+        elif name in config["internal_state"]:
+            config["internal_state"][name] = value
+        else:
+            raise KeyError(f"Unknown sweep parameter {name!r}")
+    return config
+
+
+def _input_files(config):
+    """Paths of the files the config reads: file-based stimulus specs and a schedule file."""
+    paths = [config[channel]["path"] for channel in STIMULUS_CHANNELS
+             if isinstance(config.get(channel), dict) and "path" in config[channel]]
+    if isinstance(config.get("schedule"), str):
+        paths.append(config["schedule"])
+    return paths
+
+
+def config_hash(config):
+    """SHA-256 of the config and of the size and modification time of every file it reads."""
+    files = {}
+    for path in _input_files(config):
+        info = os.stat(path)
+        files[path] = [info.st_size, info.st_mtime_ns]
+    document = {"config": config, "files": files} if files else config
+    return hashlib.sha256(json.dumps(document, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def run_point(config):
+    """Run one simulation from an effective config and return its summary metrics."""
+    settings = config["simulation"]
+    # Stores and filters allocate at the configured precision, so it is set before anything is built
+    with precision(config.get("precision", "float64")):
+        simulator = Simulator([0.1, 0.2, 0.3], config["neurotransmitters"], config["external_stimuli"],
+                              config["internal_state"], config.get("image_signals"), config.get("linguistic_inputs"),
+                              config.get("auditory_inputs"), config.get("olfactory_inputs"),
+                              dt=settings["dt"], discrepancy_threshold=settings["discrepancy_threshold"],
+                              escape_duration=settings["escape_duration"], on_event=lambda event: None,
+                              schedule=config.get("schedule"), population=config.get("population"))
+        homunculus_feedback = simulator.run(settings["steps"])
+
+    summary = {"recorded_steps": len(homunculus_feedback["time"]),
+               "escaped_steps": settings["steps"] - len(homunculus_feedback["time"])}
+    for key in SUMMARY_SERIES:
+        values = np.asarray(homunculus_feedback[key], dtype=float)
+        summary[key + "_mean"] = float(values.mean()) if values.size else None
+        summary[key + "_max"] = float(values.max()) if values.size else None
+    summary["final_dopamine"] = float(simulator.neurotransmitters["dopamine"])
+    summary["final_serotonin"] = float(simulator.neurotransmitters["serotonin"])
+    return summary
+
+
+def _cache_path(cache_dir, key):
+    return os.path.join(cache_dir, key + ".json")
+
+
+def run_sweep(base_config, design, settings=None, cache_dir="sweep_cache", workers=None):
+    """
+    Run every point of `design` and return one row per point: the overrides,
+    the config hash and the summary metrics. Cached points are not rerun.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    configs = [effective_config(base_config, point, settings) for point in design]
+    keys = [config_hash(config) for config in configs]
+
+    results = {}
+    pending = {}
+    for key, config in zip(keys, configs):
+        if key in results or key in pending:
+            continue
+        if os.path.exists(_cache_path(cache_dir, key)):
+            with open(_cache_path(cache_dir, key), "r") as f:
+                results[key] = json.load(f)
+        else:
+            pending[key] = config
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run_point, config): key for key, config in pending.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                results[key] = future.result()
+                # Write then rename, so an interrupted sweep never leaves a partial entry
+                tmp_path = _cache_path(cache_dir, key) + ".tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(results[key], f)
+                os.replace(tmp_path, _cache_path(cache_dir, key))
+
+    return [dict(point, config_hash=key, **results[key]) for point, key in zip(design, keys)]
+
+
+def write_table(rows, path):
+    fieldnames = list(dict.fromkeys(name for row in rows for name in row))
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _parse_assignment(text):
+    name, _, values = text.partition("=")
+    if not values:
+        raise argparse.ArgumentTypeError(f"Expected name=values, got {text!r}")
+    return name, values
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep simulation parameters across a process pool.")
+    parser.add_argument("--config", default="config.json", help="base configuration JSON")
+    parser.add_argument("--grid", type=_parse_assignment, action="append", default=[],
+                        help="grid axis as name=v1,v2,... (repeatable)")
+    parser.add_argument("--random", type=_parse_assignment, action="append", default=[],
+                        help="random axis as name=low:high (repeatable, used with --samples)")
+    parser.add_argument("--samples", type=int, default=10, help="number of random design points")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random design")
+    parser.add_argument("--steps", type=int, default=SIMULATION_SETTINGS["steps"], help="steps per simulation")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--cache-dir", default="sweep_cache", help="directory of cached point results")
+    parser.add_argument("--output", default="sweep_results.csv", help="result table (CSV)")
+    args = parser.parse_args(argv)
+
+    with open(args.config, "r") as f:
+        base_config = json.load(f)
+
+    if args.grid and args.random:
+        parser.error("use either --grid or --random, not both")
+    if args.random:
+        # JSON values, so "2:6" is an integer range and "0.5:1.5" a float one
+        ranges = {name: tuple(json.loads(v) for v in values.split(":")) for name, values in args.random}
+        design = random_design(ranges, args.samples, args.seed)
+    else:
+        grid = {name: [json.loads(v) for v in values.split(",")] for name, values in args.grid}
+        design = grid_design(grid)
+
+    rows = run_sweep(base_config, design, {"steps": args.steps}, args.cache_dir, args.workers)
+    write_table(rows, args.output)
+    print(f"{len(rows)} points written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# plasticity.py
+
+"""
+Array-backed short-term / long-term plasticity shared by emotion-category regions.
+
+PlasticityStore maps category names to fixed indices once and keeps the
+weights, STP and LTP values of every category in NumPy vectors, so weighting,
+potentiation and decay of all categories are each one vectorized operation.
+With a batch axis the vectors become (N, C) matrices, one row per subject.
+
+STP starts at 0 and LTP at 1.0, matching the defaults of the dict-based
+memories this replaces; categories that were never potentiated are left out
+of the dict views. PlasticityView gives regions the old dict attributes as
+write-through mappings over the vectors.
+"""
+
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from precision import get_dtype
+
+
+class PlasticityStore:
+    def __init__(self, categories=(), stp_decay_rate=0.9, ltp_learning_rate=0.01, initial_weights=None):
+        self.stp_decay_rate = stp_decay_rate
+        self.ltp_learning_rate = ltp_learning_rate
+        self.index = {}
+        self.dtype = get_dtype()
+        self.weights = np.zeros(0, dtype=self.dtype)
+        self.stp = np.zeros(0, dtype=self.dtype)
+        self.ltp = np.zeros(0, dtype=self.dtype)
+        self.seen = np.zeros(0, dtype=bool)
+        self._index_cache = {}
+        self.register(categories, initial_weights)
+
+    @property
+    def categories(self):
+        return tuple(self.index)
+
+    @property
+    def batch_size(self):
+        return self.stp.shape[0] if self.stp.ndim == 2 else None
+
+    def register(self, names, weights=None):
+        """Give new category names the next free indices (weight 1.0 unless given)."""
+        new = [name for name in dict.fromkeys(names) if name not in self.index]
+        if not new:
+            return
+        for name in new:
+            self.index[name] = len(self.index)
+        new_weights = np.ones(len(new), dtype=self.dtype) if weights is None \
+            else np.asarray([weights[name] for name in new], dtype=self.dtype)
+
+        def extend(values, fill):
+            pad = np.broadcast_to(np.asarray(fill, dtype=values.dtype), values.shape[:-1] + (len(new),))
+            return np.concatenate([values, pad], axis=-1)
+
+        self.weights = extend(self.weights, new_weights)
+        self.stp = extend(self.stp, 0.0)
+        self.ltp = extend(self.ltp, 1.0)
+        self.seen = extend(self.seen, False)
+        self._index_cache.clear()
+
+    def get_state(self):
+        return {"categories": list(self.index), "stp_decay_rate": self.stp_decay_rate,
+                "ltp_learning_rate": self.ltp_learning_rate, "weights": self.weights.copy(),
+                "stp": self.stp.copy(), "ltp": self.ltp.copy(), "seen": self.seen.copy()}
+
+    def set_state(self, state):
+        self.stp_decay_rate = state["stp_decay_rate"]
+        self.ltp_learning_rate = state["ltp_learning_rate"]
+        self.index = {name: i for i, name in enumerate(state["categories"])}
+        self.weights = np.array(state["weights"], dtype=self.dtype)
+        self.stp = np.array(state["stp"], dtype=self.dtype)
+        self.ltp = np.array(state["ltp"], dtype=self.dtype)
+        self.seen = np.array(state["seen"], dtype=bool)
+        self._index_cache.clear()
+
+    def indices(self, names):
+        """Index array for a tuple of names, cached so repeated signal sets cost one lookup."""
+        idx = self._index_cache.get(names)
+        if idx is None:
+            self.register(names)
+            idx = self._index_cache[names] = np.fromiter((self.index[name] for name in names), dtype=np.intp, count=len(names))
+        return idx
+
+    def ensure_batch(self, n_subjects):
+        """Give every vector a leading subject axis of n_subjects rows."""
+        if self.batch_size == n_subjects:
+            return
+        if self.batch_size is not None:
+            raise ValueError(f"Store already holds {self.batch_size} subjects, not {n_subjects}")
+        self.weights = np.tile(self.weights, (n_subjects, 1))
+        self.stp = np.tile(self.stp, (n_subjects, 1))
+        self.ltp = np.tile(self.ltp, (n_subjects, 1))
+        self.seen = np.tile(self.seen, (n_subjects, 1))
+
+    def weighted(self, idx, strengths):
+        return strengths * self.weights[..., idx]
+
+    def potentiate(self, idx, strengths, repeat=1):
+        """
+        STP is set to the new strengths and LTP moves toward them by the learning rate.
+
+        repeat > 1 applies the same potentiation that many times in closed form.
+        """
+        self.stp[..., idx] = strengths
+        if repeat == 1:
+            self.ltp[..., idx] += self.ltp_learning_rate * (strengths - self.ltp[..., idx])
+        else:
+            self.ltp[..., idx] = strengths + (self.ltp[..., idx] - strengths) * (1 - self.ltp_learning_rate) ** repeat
+        self.seen[..., idx] = True
+
+    def decay(self):
+        self.stp *= self.stp_decay_rate
+
+    def as_dict(self, values):
+        """{name: value} for the categories potentiated so far (rows for batched stores)."""
+        seen = self.seen if self.seen.ndim == 1 else self.seen.any(axis=0)
+        if values.ndim == 1:
+            return {name: float(values[i]) for name, i in self.index.items() if seen[i]}
+        return {name: values[:, i] for name, i in self.index.items() if seen[i]}
+
+
+class PlasticityView(MutableMapping):
+    """
+    Write-through {category: value} mapping over one field ("weights", "stp"
+    or "ltp") of a PlasticityStore. Assigning a new name registers it. The
+    weights view lists every category; the STP and LTP views list the
+    potentiated ones, and deleting from them resets the category to its
+    initial values and removes it from both. Batched stores give (N,) rows.
+    """
+
+    INITIAL = {"weights": 1.0, "stp": 0.0, "ltp": 1.0}
+
+    def __init__(self, store, field):
+        if field not in self.INITIAL:
+            raise ValueError(f"Unknown plasticity field {field!r}; expected one of {tuple(self.INITIAL)}")
+        self.store = store
+        self.field = field
+
+    def _listed(self):
+        if self.field == "weights":
+            return list(self.store.index)
+        seen = self.store.seen if self.store.seen.ndim == 1 else self.store.seen.any(axis=0)
+        return [name for name, i in self.store.index.items() if seen[i]]
+
+    def __getitem__(self, name):
+        if name not in self._listed():
+            raise KeyError(name)
+        values = getattr(self.store, self.field)
+        i = self.store.index[name]
+        return float(values[i]) if values.ndim == 1 else values[:, i]
+
+    def __setitem__(self, name, value):
+        self.store.register((name,))
+        i = self.store.index[name]
+        getattr(self.store, self.field)[..., i] = value
+        if self.field != "weights":
+            self.store.seen[..., i] = True
+
+    def __delitem__(self, name):
+        if name not in self._listed():
+            raise KeyError(name)
+        self._reset([self.store.index[name]])
+
+    def _reset(self, idx):
+        if self.field == "weights":
+            self.store.weights[..., idx] = self.INITIAL["weights"]
+            return
+        self.store.stp[..., idx] = self.INITIAL["stp"]
+        self.store.ltp[..., idx] = self.INITIAL["ltp"]
+        self.store.seen[..., idx] = False
+
+    def clear(self):
+        self._reset(list(self.store.index.values()))
+
+    def __iter__(self):
+        return iter(self._listed())
+
+    def __len__(self):
+        return len(self._listed())
+
+    def __repr__(self):
+        return repr(dict(self))
@@ -0,0 +1,202 @@
+# population.py
+
+"""
+Population-level engine: a population of units per brain region.
+
+Every region of a Simulator gets a population of n_units units with a
+leaky-integrator state v and a firing rate r = max(tanh(v), 0):
+
+    v += dt / tau * (-v + gain * (encoder * drive + sum of W @ r_source))
+
+drive is the region's output of the step (its mean for vector outputs),
+spread over the units by a fixed random encoder. With tau = dt the units
+follow their input directly (a pure rate population). gain is the product
+of the levels of the transmitters the region reads (its
+neurotransmitter_keys), so e.g. glutamate scales the Visual Cortex
+population and glutamate times acetylcholine the Hippocampus; the Insula
+reads no transmitter and has gain 1.
+
+Populations are connected by sparse projections. Each projection is a
+SparseMatrix in CSR form (row pointers, column indices and weights as plain
+NumPy arrays) with a fixed number of random inputs (fan_in) per target
+unit, so memory grows with the synapse count, not with n_units ** 2
+(weights and unit states use the configured precision, see precision.py). A
+step costs one sparse matrix-vector product per projection, evaluated in
+row blocks so temporaries stay small. All populations read the rates of the
+previous step, so the update does not depend on the order of the regions.
+
+DEFAULT_PROJECTIONS follows the influences hard-wired in the step loop: the
+Hippocampus output feeds back into the input of the stimulus-driven
+regions, and the sensory cortices are compared under the Prefrontal
+Cortex's threshold. Projections are dicts {"source", "target", "fan_in",
+"weight"}; a negative weight is inhibitory.
+
+    engine = PopulationEngine(build_regions(), n_units=100000)
+    simulator = Simulator(..., population=engine)  # records "population_rates"
+"""
+
+import numpy as np
+
+from precision import get_dtype
+
+STIMULUS_REGIONS = ("Prefrontal Cortex", "Striatum", "Amygdala", "Hypothalamus", "Cerebellum", "Midbrain",
+                    "Brainstem")
+DEFAULT_PROJECTIONS = (
+    [{"source": "Hippocampus", "target": name, "fan_in": 16, "weight": 0.1} for name in STIMULUS_REGIONS]
+    + [{"source": name, "target": "Prefrontal Cortex", "fan_in": 16, "weight": 0.2}
+       for name in ("Visual Cortex", "Language Area", "Auditory Cortex")]
+    + [{"source": "Amygdala", "target": "Hypothalamus", "fan_in": 16, "weight": 0.3},
+       {"source": "Insula", "target": "Amygdala", "fan_in": 16, "weight": 0.2},
+       {"source": "Prefrontal Cortex", "target": "Amygdala", "fan_in": 16, "weight": -0.2}]
+)
+ROW_BLOCK = 1 << 15
+
+
+class SparseMatrix:
+    """CSR matrix: row i holds weights data[indptr[i]:indptr[i + 1]] at columns indices[...]."""
+
+    def __init__(self, indptr, indices, data, shape):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.data = np.asarray(data, dtype=get_dtype())
+        self.shape = tuple(shape)
+        if len(self.indptr) != self.shape[0] + 1 or not len(self.indices) == len(self.data) == self.indptr[-1]:
+            raise ValueError("Inconsistent CSR arrays")
+        self._filled = np.diff(self.indptr) > 0
+
+    @classmethod
+    def from_coo(cls, rows, cols, values, shape):
+        """CSR matrix of the (row, col, value) triples; duplicates are kept and add up."""
+        rows = np.asarray(rows)
+        order = np.argsort(rows, kind="stable")
+        indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=shape[0]), out=indptr[1:])
+        return cls(indptr, np.asarray(cols)[order], np.asarray(values)[order], shape)
+
+    @classmethod
+    def random(cls, n_rows, n_cols, fan_in, weight=1.0, rng=None):
+        """fan_in random inputs per row, weights uniform in [0, 2 * weight / fan_in] (row sums about weight)."""
+        rng = np.random.default_rng(rng)
+        nnz = n_rows * fan_in
+        indices = rng.integers(0, n_cols, size=(n_rows, fan_in), dtype=np.int32)
+        # Sorted columns per row make the gather of x walk forward through memory
+        indices.sort(axis=1)
+        data = rng.random(nnz) * (2.0 * weight / fan_in)
+        return cls(np.arange(n_rows + 1, dtype=np.int64) * fan_in, indices.ravel(), data, (n_rows, n_cols))
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
+
+    def matvec(self, x, out=None):
+        """self @ x for a (n_cols,) vector, accumulated into `out` when given."""
+        indptr, indices, data = self.indptr, self.indices, self.data
+        y = np.zeros(self.shape[0], dtype=self.data.dtype) if out is None else out
+        for lo in range(0, self.shape[0], ROW_BLOCK):
+            hi = min(lo + ROW_BLOCK, self.shape[0])
+            a, b = indptr[lo], indptr[hi]
+            if a == b:
+                continue
+            filled = self._filled[lo:hi]
+            # reduceat needs in-range starts, so only rows holding weights take part
+            y[lo:hi][filled] += np.add.reduceat(data[a:b] * x[indices[a:b]], indptr[lo:hi][filled] - a)
+        return y
+
+
+class Population:
+    def __init__(self, n_units, tau=1.0, rng=None):
+        rng = np.random.default_rng(rng)
+        self.n_units = n_units
+        self.tau = tau
+        dtype = get_dtype()
+        self.encoder = rng.normal(1.0, 0.25, n_units).astype(dtype)
+        self.v = np.zeros(n_units, dtype=dtype)
+        self.rate = np.zeros(n_units, dtype=dtype)
+
+    def advance(self, current, gain, dt):
+        current *= gain
+        current -= self.v
+        self.v += (dt / self.tau) * current
+        np.tanh(self.v, out=self.rate)
+        np.maximum(self.rate, 0.0, out=self.rate)
+
+
+def _drive(output):
+    if isinstance(output, dict):
+        output = list(output.values())
+    return float(np.mean(output))
+
+
+class PopulationEngine:
+    def __init__(self, regions, n_units=1000, projections=None, tau=1.0, dt=0.1, seed=0):
+        self.n_units = n_units
+        self.tau = tau
+        self.dt = dt
+        self.seed = seed
+        self.projections = [dict(p) for p in (DEFAULT_PROJECTIONS if projections is None else projections)]
+        rng = np.random.default_rng(seed)
+        self.gain_keys = {region.name: tuple(region.neurotransmitter_keys) for region in regions}
+        self.populations = {region.name: Population(n_units, tau, rng) for region in regions}
+        self.matrices = []
+        for projection in self.projections:
+            source, target = projection["source"], projection["target"]
+            if source not in self.populations or target not in self.populations:
+                raise ValueError(f"Projection {source!r} -> {target!r} names an unknown region")
+            weights = SparseMatrix.random(n_units, n_units, projection.get("fan_in", 16),
+                                          projection.get("weight", 1.0), rng)
+            self.matrices.append((source, target, weights))
+        self._currents = {name: np.empty(n_units, dtype=get_dtype()) for name in self.populations}
+
+    def step(self, outputs, neurotransmitters):
+        """Advance every population one step from the region outputs; {region: mean rate}."""
+        currents = self._currents
+        for name, population in self.populations.items():
+            np.multiply(population.encoder, _drive(outputs[name]), out=currents[name])
+        # All projections read the rates of the previous step
+        for source, target, weights in self.matrices:
+            weights.matvec(self.populations[source].rate, out=currents[target])
+        rates = {}
+        for name, population in self.populations.items():
+            gain = 1.0
+            for key in self.gain_keys[name]:
+                # As a Python float, so the product does not depend on the scalar type of each level
+                gain *= float(neurotransmitters.get(key, 1.0))
+            population.advance(currents[name], gain, self.dt)
+            rates[name] = float(population.rate.mean())
+        return rates
+
+    @property
+    def synapses(self):
+        return sum(weights.nnz for _, _, weights in self.matrices)
+
+    @property
+    def nbytes(self):
+        """Memory of the weights and unit state in bytes."""
+        units = sum(p.encoder.nbytes + p.v.nbytes + p.rate.nbytes for p in self.populations.values())
+        return units + sum(weights.nbytes for _, _, weights in self.matrices)
+
+    def spec(self):
+        """Config dict that open_population() turns back into an engine with the same weights."""
+        return {"n_units": self.n_units, "projections": self.projections, "tau": self.tau, "dt": self.dt,
+                "seed": self.seed}
+
+    def get_state(self):
+        return {name: population.v.copy() for name, population in self.populations.items()}
+
+    def set_state(self, state):
+        for name, population in self.populations.items():
+            population.v[:] = state[name]
+            np.maximum(np.tanh(population.v), 0.0, out=population.rate)
+
+
+def open_population(spec, regions, dt=0.1):
+    """PopulationEngine for an engine, a spec dict or a unit count per region."""
+    if spec is None or isinstance(spec, PopulationEngine):
+        return spec
+    if isinstance(spec, dict):
+        return PopulationEngine(regions, **{"dt": dt, **spec})
+    return PopulationEngine(regions, n_units=int(spec), dt=dt)
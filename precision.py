@@ -0,0 +1,64 @@
+# precision.py
+
+"""
+Numeric precision of the model.
+
+The floating-point type used for region computations, memory stores, Kalman
+filters, population units and trace output is a process-wide setting:
+
+    set_precision("float32")   # or "float64", the default
+
+Code that turns inputs into arrays calls as_float() rather than np.array, so
+lists and float64 inputs enter the model at the configured precision, and
+arrays that are allocated up front use get_dtype(). Neurotransmitter levels
+stay Python floats or scalars of the configured type, which NumPy does not
+promote, so float32 arrays are never silently upcast to float64. Objects read
+the setting when they are built, so change it before building a Simulator.
+
+float32 halves memory and bandwidth for large batched or population runs.
+The numerically sensitive steps are written to tolerate it: the Prefrontal
+Cortex softmax subtracts the maximum before exponentiating, and the Kalman
+filters update their covariance in Joseph form, which keeps it symmetric and
+non-negative under rounding.
+"""
+
+import contextlib
+
+import numpy as np
+
+PRECISIONS = {"float64": np.float64, "float32": np.float32}
+
+_dtype = np.float64
+
+
+def set_precision(precision):
+    """Set the floating-point type ("float64" or "float32"); returns the previous name."""
+    global _dtype
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision!r}; expected one of {tuple(PRECISIONS)}")
+    previous = np.dtype(_dtype).name
+    _dtype = PRECISIONS[precision]
+    return previous
+
+
+def get_dtype():
+    return _dtype
+
+
+def get_precision():
+    return np.dtype(_dtype).name
+
+
+@contextlib.contextmanager
+def precision(name):
+    """Temporarily switch the precision, e.g. for a float64 reference run."""
+    previous = set_precision(name)
+    try:
+        yield
+    finally:
+        set_precision(previous)
+
+
+def as_float(values):
+    """values as an array of the configured type (no copy when it already is one)."""
+    return np.asarray(values, dtype=_dtype)
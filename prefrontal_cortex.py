@@ -1,7 +1,11 @@
 import numpy as np
-from brain_region_base import BrainRegion
+from brain_region_base import BrainRegion, as_column, as_float, batch_level
 
 class PrefrontalCortex(BrainRegion):
+    # Pure function of its inputs: eligible for region_cache.RegionCache
+    cacheable = True
+    neurotransmitter_keys = ('dopamine', 'glutamate')
+
     def process(self, input_signal, neurotransmitters, internal_state=None):
         """
         Simulates processing in the prefrontal cortex based on neurotransmitter modulation.
@@ -52,10 +56,18 @@ class PrefrontalCortex(BrainRegion):
 
         # Modulate input signal based on neurotransmitter levels
         # Dopamine and glutamate jointly influence signal strength and cortical responsiveness
-        weighted_input = np.array(input_signal) * dopamine * glutamate
+        weighted_input = as_float(input_signal) * dopamine * glutamate
 
         # Apply exponential transformation to simulate nonlinear neural activation
-        exp_input = np.exp(weighted_input)
+        # (shifted by the maximum, which cancels in the normalization, so exp cannot overflow in float32)
+        exp_input = np.exp(weighted_input - np.max(weighted_input))
 
         # Normalize to simulate competitive encoding and probabilistic output
-        return exp_input / np.sum(exp_input)
\ No newline at end of file
+        return exp_input / np.sum(exp_input)
+
+    def process_batch(self, input_signals, neurotransmitters, internal_state=None):
+        dopamine = as_column(batch_level(neurotransmitters, 'dopamine', 1.0))
+        glutamate = as_column(batch_level(neurotransmitters, 'glutamate', 1.0))
+        weighted_input = as_float(input_signals) * dopamine * glutamate
+        exp_input = np.exp(weighted_input - np.max(weighted_input, axis=1, keepdims=True))
+        return exp_input / np.sum(exp_input, axis=1, keepdims=True)
\ No newline at end of file
@@ -0,0 +1,158 @@
+# profiling.py
+
+"""
+Per-region and per-phase instrumentation for the Simulator.
+
+A Profiler wraps every region call (at plan compile time, so an unprofiled
+Simulator runs the plain calls) and times named phases of the step loop.
+For each region or phase it collects the call count, cumulative and
+percentile latencies and, with track_allocations=True, the net number of
+allocated memory blocks.
+
+summary_table() renders the statistics as text and write_trace() writes a
+Chrome trace-event JSON file that chrome://tracing, Perfetto or speedscope
+can open.
+
+Without a profiler the Simulator uses NULL_PROFILER, whose phase() returns a
+shared no-op context manager.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class NullProfiler:
+    enabled = False
+    _phase = _NullPhase()
+
+    def phase(self, name):
+        return self._phase
+
+    def wrap_region(self, name, call):
+        return call
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def _no_blocks():
+    return 0
+
+
+class _Stats:
+    __slots__ = ("count", "total", "durations", "allocations")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.durations = []
+        self.allocations = 0
+
+
+class _Phase:
+    __slots__ = ("profiler", "key")
+
+    def __init__(self, profiler, key):
+        self.profiler = profiler
+        self.key = key
+
+    def __enter__(self):
+        self.profiler._start(self.key)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler._stop(self.key)
+        return False
+
+
+class Profiler:
+    enabled = True
+
+    def __init__(self, trace=False, track_allocations=False, max_samples=100000, max_events=1000000):
+        self.trace = trace
+        # sys.getallocatedblocks() walks the allocator arenas, so it is opt-in
+        self._blocks = sys.getallocatedblocks if track_allocations else _no_blocks
+        self.max_samples = max_samples
+        self.max_events = max_events
+        self.stats = {}
+        self.events = []
+        self._origin = time.perf_counter()
+        self._open = {}
+
+    def _start(self, key):
+        self._open[key] = (time.perf_counter(), self._blocks())
+
+    def _stop(self, key):
+        end = time.perf_counter()
+        blocks = self._blocks()
+        start, start_blocks = self._open.pop(key)
+        self.record(key, start, end - start, blocks - start_blocks)
+
+    def record(self, key, start, duration, allocations=0):
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = _Stats()
+        stats.count += 1
+        stats.total += duration
+        stats.allocations += allocations
+        if len(stats.durations) < self.max_samples:
+            stats.durations.append(duration)
+        if self.trace and len(self.events) < self.max_events:
+            category, _, name = key.partition(":")
+            self.events.append({"name": name, "cat": category, "ph": "X", "pid": os.getpid(),
+                                "tid": threading.get_ident(), "ts": (start - self._origin) * 1e6,
+                                "dur": duration * 1e6})
+
+    def phase(self, name):
+        """Context manager timing one named phase of the step loop."""
+        return _Phase(self, "phase:" + name)
+
+    def wrap_region(self, name, call):
+        key = "region:" + name
+        blocks = self._blocks
+
+        def profiled(*args):
+            start = time.perf_counter()
+            start_blocks = blocks()
+            result = call(*args)
+            self.record(key, start, time.perf_counter() - start, blocks() - start_blocks)
+            return result
+
+        return profiled
+
+    def summary(self):
+        """One row per region/phase with counts, latencies in microseconds and allocations."""
+        rows = []
+        for key, stats in self.stats.items():
+            durations = np.asarray(stats.durations) * 1e6
+            p50, p90, p99 = np.percentile(durations, [50, 90, 99]) if durations.size else (0.0, 0.0, 0.0)
+            rows.append({"name": key, "calls": stats.count, "total_ms": stats.total * 1e3,
+                         "mean_us": stats.total * 1e6 / stats.count, "p50_us": p50, "p90_us": p90, "p99_us": p99,
+                         "allocations": stats.allocations})
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def summary_table(self):
+        header = f"{'name':32s} {'calls':>9s} {'total ms':>10s} {'mean us':>9s} {'p50 us':>9s} {'p90 us':>9s} {'p99 us':>9s} {'allocs':>9s}"
+        lines = [header, "-" * len(header)]
+        for row in self.summary():
+            lines.append(f"{row['name']:32s} {row['calls']:9d} {row['total_ms']:10.2f} {row['mean_us']:9.2f} "
+                         f"{row['p50_us']:9.2f} {row['p90_us']:9.2f} {row['p99_us']:9.2f} {row['allocations']:9d}")
+        return "\n".join(lines)
+
+    def write_trace(self, path):
+        """Write the collected events as Chrome trace-event JSON (needs trace=True)."""
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
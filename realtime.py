@@ -0,0 +1,291 @@
+# realtime.py
+
+"""
+Closed-loop real-time driver.
+
+RealtimeDriver advances a Simulator at a fixed tick rate on an asyncio event
+loop. Before every tick it drains the async stimulus sources without waiting
+and gives the simulator the newest sample of each modality (sample and hold:
+a modality without a new sample keeps its last value; until its first sample
+it uses the configured stimulus list). After the tick it publishes the step
+record, and the escape and consumption events of the step as structured
+dicts, to every subscriber queue. Nothing is printed in the loop.
+
+Ticks are scheduled on absolute deadlines (start + k / tick_rate), so jitter
+does not accumulate. Per tick the driver measures the latency from the
+scheduled start to the end of the step. A tick that ends after its slot is a
+deadline miss, and a slot that is already over before it could start is
+skipped instead of run late. A subscriber that does not keep up loses its
+oldest messages (counted as dropped messages), and samples replaced by newer
+ones before a tick used them are counted as stale.
+
+Sources:
+    QueueSource   in-process stand-in; producers call put_nowait(sample),
+                  from other threads via loop.call_soon_threadsafe
+    SocketSource  newline-delimited JSON arrays read from a TCP connection
+
+The step runs inline on the event loop; at about 100 us per step it leaves
+room for tick rates up to a few kHz.
+"""
+
+import argparse
+import asyncio
+import json
+from collections import deque
+
+import numpy as np
+
+from stimulus_source import StimulusSource
+
+# Sensory stream name -> Simulator attribute holding its stimuli
+MODALITIES = {
+    "stimulus": "external_stimuli",
+    "image": "image_signals",
+    "linguistic": "linguistic_inputs",
+    "auditory": "auditory_inputs",
+    "olfactory": "olfactory_inputs",
+}
+
+
+class LiveChannel(StimulusSource):
+    """Single-sample stimulus source holding the latest live value."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __len__(self):
+        return 1
+
+    def __getitem__(self, index):
+        return self.value
+
+    def spec(self):
+        return {"source": "list", "values": [self.value]}
+
+
+class AsyncSource:
+    """Buffer of received samples, drained once per tick."""
+
+    def __init__(self, buffer_size=1024):
+        self.buffer = deque(maxlen=buffer_size)
+        self.received = 0
+        self.overflow = 0
+
+    def put_nowait(self, sample):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.overflow += 1
+        self.buffer.append(sample)
+        self.received += 1
+
+    def drain(self):
+        samples = list(self.buffer)
+        self.buffer.clear()
+        return samples
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class QueueSource(AsyncSource):
+    async def put(self, sample):
+        self.put_nowait(sample)
+
+
+class SocketSource(AsyncSource):
+    def __init__(self, host="127.0.0.1", port=9000, buffer_size=1024):
+        super().__init__(buffer_size)
+        self.host = host
+        self.port = port
+        self._task = None
+        self._writer = None
+
+    async def start(self):
+        reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._task = asyncio.create_task(self._read(reader))
+
+    async def _read(self, reader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if line.strip():
+                self.put_nowait(json.loads(line))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class RealtimeDriver:
+    def __init__(self, simulator, sources=None, tick_rate=100.0, subscriber_queue_size=1024, latency_window=10000):
+        sources = dict(sources or {})
+        unknown = set(sources) - set(MODALITIES)
+        if unknown:
+            raise ValueError(f"Unknown modalities {sorted(unknown)}; expected some of {tuple(MODALITIES)}")
+        self.simulator = simulator
+        self.sources = sources
+        self.tick_rate = tick_rate
+        self.period = 1.0 / tick_rate
+        self.subscriber_queue_size = subscriber_queue_size
+        self.subscribers = []
+        self.latencies = deque(maxlen=latency_window)
+        self.ticks = 0
+        self.deadline_misses = 0
+        self.skipped_ticks = 0
+        self.stale_samples = 0
+        self.dropped_messages = 0
+        self.max_latency = 0.0
+        self._events = []
+        self._running = False
+
+    def subscribe(self, maxsize=None):
+        """asyncio.Queue receiving {"type": "step", ...} and event dicts."""
+        subscriber = asyncio.Queue(self.subscriber_queue_size if maxsize is None else maxsize)
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.remove(subscriber)
+
+    def _publish(self, message):
+        for subscriber in self.subscribers:
+            if subscriber.full():
+                subscriber.get_nowait()
+                self.dropped_messages += 1
+            subscriber.put_nowait(message)
+
+    def _poll_sources(self):
+        for modality, source in self.sources.items():
+            samples = source.drain()
+            if not samples:
+                continue
+            self.stale_samples += len(samples) - 1
+            channel = getattr(self.simulator, MODALITIES[modality])
+            if isinstance(channel, LiveChannel):
+                channel.value = samples[-1]
+            else:
+                setattr(self.simulator, MODALITIES[modality], LiveChannel(samples[-1]))
+
+    def tick(self):
+        """Advance one step with the newest samples and publish its events and record."""
+        self._poll_sources()
+        t = self.simulator.t
+        record = self.simulator.step()
+        for event in self._events:
+            self._publish(event)
+        self._events.clear()
+        if record is not None:
+            self._publish({"type": "step", "step": t, "record": record})
+        return record
+
+    async def run(self, ticks=None):
+        """Tick at tick_rate until stop() is called or `ticks` ticks have run."""
+        simulator = self.simulator
+        on_event = simulator.on_event
+        simulator.on_event = self._events.append
+        for source in self.sources.values():
+            await source.start()
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        slot = 0
+        self._running = True
+        try:
+            while self._running and (ticks is None or self.ticks < ticks):
+                scheduled = start + slot * self.period
+                now = loop.time()
+                if now - scheduled >= self.period:
+                    missed = int((now - scheduled) // self.period)
+                    self.skipped_ticks += missed
+                    slot += missed
+                    continue
+                if now < scheduled:
+                    await asyncio.sleep(scheduled - now)
+
+                self.tick()
+                latency = loop.time() - scheduled
+                self.latencies.append(latency)
+                self.max_latency = max(self.max_latency, latency)
+                if latency > self.period:
+                    self.deadline_misses += 1
+                self.ticks += 1
+                slot += 1
+        finally:
+            self._running = False
+            simulator.on_event = on_event
+            for source in self.sources.values():
+                await source.close()
+
+    def stop(self):
+        self._running = False
+
+    def stats(self):
+        """Tick counts, latency percentiles in milliseconds and backpressure counters."""
+        latencies = np.asarray(self.latencies) * 1e3
+        p50, p99 = np.percentile(latencies, [50, 99]) if latencies.size else (0.0, 0.0)
+        return {"tick_rate": self.tick_rate, "ticks": self.ticks, "deadline_misses": self.deadline_misses,
+                "skipped_ticks": self.skipped_ticks, "latency_p50_ms": float(p50), "latency_p99_ms": float(p99),
+                "latency_max_ms": self.max_latency * 1e3, "stale_samples": self.stale_samples,
+                "source_overflow": sum(source.overflow for source in self.sources.values()),
+                "dropped_messages": self.dropped_messages,
+                "subscriber_backlog": max((subscriber.qsize() for subscriber in self.subscribers), default=0)}
+
+
+async def _demo(config, tick_rate, ticks, sensor_rate):
+    from simulator import Simulator
+
+    simulator = Simulator([0.1, 0.2, 0.3], config["neurotransmitters"], config["external_stimuli"],
+                          config["internal_state"], config.get("image_signals"), config.get("linguistic_inputs"),
+                          config.get("auditory_inputs"), config.get("olfactory_inputs"))
+    auditory = QueueSource()
+    driver = RealtimeDriver(simulator, {"auditory": auditory}, tick_rate=tick_rate)
+    outputs = driver.subscribe()
+    samples = config.get("auditory_inputs") or [[0.1, 0.4]]
+
+    async def sensor():
+        # In-process stand-in for a microphone feed replaying the configured samples
+        i = 0
+        while True:
+            auditory.put_nowait(samples[i % len(samples)])
+            i += 1
+            await asyncio.sleep(1.0 / sensor_rate)
+
+    async def consumer():
+        counts = {}
+        while True:
+            message = await outputs.get()
+            counts[message["type"]] = counts.get(message["type"], 0) + 1
+
+    tasks = [asyncio.create_task(sensor()), asyncio.create_task(consumer())]
+    await driver.run(ticks)
+    for task in tasks:
+        task.cancel()
+    return driver.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the model in real time against an in-process sensor stand-in.")
+    parser.add_argument("--config", default="config.json", help="configuration JSON")
+    parser.add_argument("--rate", type=float, default=100.0, help="ticks per second")
+    parser.add_argument("--ticks", type=int, default=500, help="number of ticks to run")
+    parser.add_argument("--sensor-rate", type=float, default=250.0, help="samples per second of the stand-in sensor")
+    args = parser.parse_args(argv)
+
+    with open(args.config, "r") as f:
+        config = json.load(f)
+    print(json.dumps(asyncio.run(_demo(config, args.rate, args.ticks, args.sensor_rate)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
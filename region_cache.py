@@ -0,0 +1,111 @@
+# region_cache.py
+
+"""
+Opt-in result cache for pure brain regions.
+
+A region declares itself eligible with `cacheable = True` and lists the
+neurotransmitters and internal-state entries its process() reads in
+`neurotransmitter_keys` and `internal_state_keys`. Regions with memory
+(Hippocampus, OlfactoryCortex, Insula) keep the BrainRegion default of
+cacheable = False and are never wrapped.
+
+The cache key is a cheap fingerprint of the input signal plus only the
+declared levels, so a periodic stimulus with static transmitter levels hits
+the cache. Each region has its own bounded LRU with hit/miss counters.
+Inputs that cannot be fingerprinted bypass the cache and are counted as
+bypasses.
+Cached arrays are returned read-only so a caller cannot corrupt them.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def fingerprint(signal):
+    """
+    Hashable key for an input: arrays by shape, dtype and bytes, lists and
+    tuples by their items, dicts (e.g. stereo frames) by their items in key
+    order, and hashable scalars as they are. TypeError for any other input.
+    """
+    if isinstance(signal, np.ndarray):
+        return (signal.shape, signal.dtype.str, signal.tobytes())
+    if isinstance(signal, dict):
+        return tuple((key, fingerprint(value)) for key, value in sorted(signal.items(), key=lambda item: str(item[0])))
+    if isinstance(signal, (list, tuple)):
+        key = tuple(signal)
+        try:
+            hash(key)
+            return key
+        except TypeError:
+            # Nested lists, or lists holding arrays
+            return tuple(fingerprint(item) for item in signal)
+    try:
+        hash(signal)
+    except TypeError:
+        raise TypeError(f"Cannot fingerprint a region input of type {type(signal).__name__}") from None
+    return signal
+
+
+class RegionCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = {}
+        self.hits = {}
+        self.misses = {}
+        self.bypasses = {}
+        # Regions of one stage may run on an executor's threads
+        self._lock = threading.Lock()
+
+    def bind(self, region, process):
+        """Wrap a region's process(input, neurotransmitters, internal_state) with the cache."""
+        name = region.name
+        entries = self.entries.setdefault(name, OrderedDict())
+        self.hits.setdefault(name, 0)
+        self.misses.setdefault(name, 0)
+        self.bypasses.setdefault(name, 0)
+        nt_keys = tuple(region.neurotransmitter_keys)
+        state_keys = tuple(region.internal_state_keys)
+        maxsize = self.maxsize
+        lock = self._lock
+
+        def cached(signal, neurotransmitters, internal_state=None):
+            state = internal_state or {}
+            try:
+                key = (fingerprint(signal),
+                       tuple(neurotransmitters.get(k) for k in nt_keys),
+                       tuple(state.get(k) for k in state_keys))
+                hash(key)
+            except TypeError:
+                with lock:
+                    self.bypasses[name] += 1
+                return process(signal, neurotransmitters, internal_state)
+            with lock:
+                result = entries.get(key)
+                if result is not None:
+                    entries.move_to_end(key)
+                    self.hits[name] += 1
+                    return result
+                self.misses[name] += 1
+
+            result = process(signal, neurotransmitters, internal_state)
+            if isinstance(result, np.ndarray):
+                result.setflags(write=False)
+            with lock:
+                entries[key] = result
+                if len(entries) > maxsize:
+                    entries.popitem(last=False)
+            return result
+
+        return cached
+
+    def stats(self):
+        """{region name: {"hits", "misses", "bypasses", "size"}}."""
+        return {name: {"hits": self.hits[name], "misses": self.misses[name], "bypasses": self.bypasses[name],
+                       "size": len(entries)}
+                for name, entries in self.entries.items()}
+
+    def clear(self):
+        for entries in self.entries.values():
+            entries.clear()
@@ -1,171 +1,203 @@
 # simulate_brain_activity_fixed.py
 
-import numpy as np
+import argparse
 import json
-import matplotlib.pyplot as plt
-
-# Import all brain region modules and KalmanFilter
-from kalman_filter import KalmanFilter
-from brain_region_base import BrainRegion
-from prefrontal_cortex import PrefrontalCortex
-from striatum import Striatum
-from hippocampus import Hippocampus
-from amygdala import Amygdala
-from hypothalamus import Hypothalamus
-from cerebellum import Cerebellum
-from midbrain import Midbrain
-from brainstem import Brainstem
-from visual_cortex import VisualCortex
-from language_area import LanguageArea
-from auditory_cortex import AuditoryCortex
-from olfactory_cortex import OlfactoryCortex  # Olfactory processing
-from insula import Insula
-
-# Load configuration from config.json
-with open("config.json", "r") as f:
-    config = json.load(f)
-
-neurotransmitters = config["neurotransmitters"]
-internal_state = config["internal_state"]
-external_stimuli = config["external_stimuli"]
-image_signals = config["image_signals"]
-linguistic_inputs = config["linguistic_inputs"]
-auditory_inputs = config["auditory_inputs"]
-olfactory_inputs = config["olfactory_inputs"]
+import numpy as np
+
+from checkpoint import load_checkpoint, save_checkpoint
+from connectome import compile_connectome
+from kalman_filter import KalmanFilterBank
+from neurotransmitter_state import NeurotransmitterState
+from precision import PRECISIONS, as_float, get_dtype, set_precision
+from profiling import Profiler
+from event_schedule import EventScheduler, apply_dose, consumption_schedule, open_schedule
+from simulator import CONSUMPTION_HISTORY, Simulator, build_regions
+from stimulus_source import as_stimulus
+from trace_plot import plot_feedback, plot_in_background
+from trace_writer import ColumnarTraceWriter, load_trace
+
+# Importing this module has no side effects; the example run lives in main().
+# matplotlib is only imported when a plot is actually requested.
+
+def load_config(path="config.json"):
+    with open(path, "r") as f:
+        return json.load(f)
+
+def _json_value(value):
+    # NumPy scalars of a float32 run are not JSON serializable as they are
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def write_feedback(homunculus_feedback, path="homunculus_feedback.json", output_format="json"):
+    if output_format == "npy":
+        # Columnar trace directory, one .npy file per field
+        with ColumnarTraceWriter(path) as writer:
+            writer.extend(homunculus_feedback)
+        return
+    with open(path, "w") as f:
+        if output_format == "json":
+            json.dump(homunculus_feedback, f, indent=2, default=_json_value)
+        elif output_format == "jsonl":
+            # One record per recorded step, compact and appendable
+            series = {key: value for key, value in homunculus_feedback.items() if key != "emotion_states"}
+            for i, emotion_state in enumerate(homunculus_feedback["emotion_states"]):
+                record = {key: value[i] for key, value in series.items()}
+                record["emotion_state"] = emotion_state
+                f.write(json.dumps(record, default=_json_value) + "\n")
+        else:
+            raise ValueError(f"Unknown output format: {output_format}")
 
 def simulate_brain_activity(input_signal, neurotransmitters, external_stimuli, internal_state,
                             image_signals=None, linguistic_inputs=None, auditory_inputs=None, olfactory_inputs=None,
-                            dt=0.1, steps=10, discrepancy_threshold=0.5, escape_duration=3):
-    regions = [
-        PrefrontalCortex("Prefrontal Cortex"),
-        Striatum("Striatum"),
-        Hippocampus("Hippocampus"),
-        Amygdala("Amygdala"),
-        Hypothalamus("Hypothalamus"),
-        Cerebellum("Cerebellum"),
-        Midbrain("Midbrain"),
-        Brainstem("Brainstem"),
-        VisualCortex("Visual Cortex"),
-        LanguageArea("Language Area"),
-        AuditoryCortex("Auditory Cortex"),
-        OlfactoryCortex("Olfactory Cortex"),
-        Insula("Insula")
-    ]
-
-    kf = KalmanFilter(
+                            dt=0.1, steps=10, discrepancy_threshold=0.5, escape_duration=3,
+                            output_path="homunculus_feedback.json", output_format="json",
+                            plot_path="cognitive_discrepancies.png", schedule=None):
+    """
+    Run one brain for `steps` steps and return the homunculus feedback dict.
+    The feedback is written to output_path and plotted to plot_path; pass None
+    to skip either.
+    """
+    simulator = Simulator(input_signal, neurotransmitters, external_stimuli, internal_state,
+                          image_signals, linguistic_inputs, auditory_inputs, olfactory_inputs,
+                          dt=dt, discrepancy_threshold=discrepancy_threshold, escape_duration=escape_duration,
+                          schedule=schedule)
+    homunculus_feedback = simulator.run(steps)
+
+    if output_path is not None:
+        write_feedback(homunculus_feedback, output_path, output_format)
+    if plot_path is not None:
+        plot_feedback(homunculus_feedback, plot_path)
+
+    return homunculus_feedback
+
+def simulate_brain_activity_batch(input_signals, neurotransmitters, external_stimuli, internal_state,
+                                  image_signals=None, linguistic_inputs=None, auditory_inputs=None, olfactory_inputs=None,
+                                  dt=0.1, steps=10, discrepancy_threshold=0.5, escape_duration=3, connectome=None,
+                                  schedule=None):
+    """
+    Simulate N independent brains in one vectorized pass.
+
+    input_signals is an (N, D) array with one row per subject. Every entry of
+    neurotransmitters and internal_state may be a scalar shared by all subjects
+    or an (N,) array. Stimulus list entries may be shared (D,) vectors or
+    per-subject (N, D) arrays. The escape-mode, olfactory-escape and Kalman
+    dopamine branches of simulate_brain_activity are applied as per-subject masks.
+
+    Returns a dict of (steps, N) arrays. Steps a subject skipped because of an
+    escape are NaN, and the "recorded" mask marks the steps that were kept.
+    Nothing is printed or written to disk.
+
+    Any stimulus argument may also be a stimulus_source spec dict or source.
+    The event schedule (see Simulator) is shared: doses reach every subject,
+    windows act on the subjects that did not escape.
+    """
+    external_stimuli, image_signals, linguistic_inputs, auditory_inputs, olfactory_inputs = map(
+        as_stimulus, (external_stimuli, image_signals, linguistic_inputs, auditory_inputs, olfactory_inputs))
+    dtype = get_dtype()
+    input_signals = np.array(input_signals, dtype=dtype)
+    n_subjects = input_signals.shape[0]
+    plan = compile_connectome(build_regions(), connectome, method="process_batch")
+
+    neurotransmitters = {key: np.array(np.broadcast_to(np.asarray(value, dtype=dtype), (n_subjects,)))
+                         for key, value in neurotransmitters.items()}
+
+    kf_bank = KalmanFilterBank.scalar(
         initial_state=neurotransmitters['dopamine'],
         initial_uncertainty=0.1,
         process_variance=0.01,
         observation_variance=0.05
     )
 
-    time_series = []
-    visual_language_discrepancy = []
-    auditory_language_discrepancy = []
-    olfactory_discomfort = []
-    feedback_intensity = []
-    emotion_states = []
+    def per_subject(values):
+        return np.broadcast_to(as_float(values), (n_subjects,) + np.shape(values)[-1:])
 
-    escape_counter = 0
+    def series():
+        return np.full((steps, n_subjects), np.nan, dtype=dtype)
 
-    consumption_history = {
-        "milk": {"time": 2.0, "digest_time": 4.0, "symptom": "abdominal pain", "organ": "stomach"},
-        "shrimp": {"time": 5.0, "digest_time": 6.0, "symptom": "itch", "organ": "skin"}
-    }
+    visual_language_discrepancy = series()
+    auditory_language_discrepancy = series()
+    olfactory_discomfort = series()
+    feedback_intensity = series()
+    emotion_states = {key: series() for key in ("fear", "pleasure", "disgust", "anger", "empathy")}
+    recorded = np.zeros((steps, n_subjects), dtype=bool)
+
+    escape_counter = np.zeros(n_subjects, dtype=int)
+    schedule = EventScheduler(consumption_schedule(CONSUMPTION_HISTORY)) if schedule is None \
+        else open_schedule(schedule)
+    for key in schedule.transmitters():
+        neurotransmitters.setdefault(key, np.ones(n_subjects, dtype=dtype))
+    observed_pain_signal = {"pain": 0.6, "distress": 0.4}  # 仮の入力
 
     for t in range(steps):
         time = t * dt
-        stimulus = external_stimuli[t % len(external_stimuli)]
-        input_signal = np.array(input_signal) + np.array(stimulus)
-
-        image_input = image_signals[t % len(image_signals)] if image_signals else [0.5, 0.5, 0.5]
-        linguistic_input = linguistic_inputs[t % len(linguistic_inputs)] if linguistic_inputs else [0.2, 0.3]
-        auditory_input = auditory_inputs[t % len(auditory_inputs)] if auditory_inputs else [0.1, 0.4]
-        olfactory_input = olfactory_inputs[t % len(olfactory_inputs)] if olfactory_inputs else [0.0]
-
-        outputs = {}
-        for region in regions:
-            if region.name == "Visual Cortex":
-                outputs[region.name] = region.process(image_input, neurotransmitters, internal_state)
-            elif region.name == "Language Area":
-                outputs[region.name] = region.process(linguistic_input, neurotransmitters, internal_state)
-            elif region.name == "Auditory Cortex":
-                outputs[region.name] = region.process(auditory_input, neurotransmitters, internal_state)
-            elif region.name == "Olfactory Cortex":
-                outputs[region.name] = region.process(olfactory_input, neurotransmitters, internal_state)
-            elif region.name == "Insula":
-                observed_pain_signal = {"pain": 0.6, "distress": 0.4}  # 仮の入力
-                outputs[region.name] = region.process(observed_pain_signal, internal_state)
-            else:
-                outputs[region.name] = region.process(input_signal, neurotransmitters, internal_state)
-
-        observed_pain_signal = {"pain": 0.6, "distress": 0.4} # 仮の入力
-        insula_output = outputs["Insula"] = regions[-1].process(observed_pain_signal, internal_state)
-
-        visual_vs_language = float(np.linalg.norm(np.array(outputs["Visual Cortex"]) - np.array(outputs["Language Area"])))
-        auditory_vs_language = float(np.linalg.norm(np.array(outputs["Auditory Cortex"]) - np.array(outputs["Language Area"])))
-        olfactory_response = outputs["Olfactory Cortex"]
-        if isinstance(olfactory_response, list):
-            olfactory_response = olfactory_response[0]
-
-        prefrontal_output = outputs["Prefrontal Cortex"]
-        if isinstance(prefrontal_output, (list, np.ndarray)):
-            prefrontal_output = float(prefrontal_output[0])
-        else:
-            prefrontal_output = float(prefrontal_output)
+        for entry in schedule.advance(time):
+            apply_dose(neurotransmitters, entry)
+        input_signals = input_signals + as_float(external_stimuli[t % len(external_stimuli)])
+
+        image_input = per_subject(image_signals[t % len(image_signals)] if image_signals else [0.5, 0.5, 0.5])
+        linguistic_input = per_subject(linguistic_inputs[t % len(linguistic_inputs)] if linguistic_inputs else [0.2, 0.3])
+        auditory_input = per_subject(auditory_inputs[t % len(auditory_inputs)] if auditory_inputs else [0.1, 0.4])
+        olfactory_input = per_subject(olfactory_inputs[t % len(olfactory_inputs)] if olfactory_inputs else [0.0])
+
+        streams = {
+            "stimulus": input_signals,
+            "image": image_input,
+            "linguistic": linguistic_input,
+            "auditory": auditory_input,
+            "olfactory": olfactory_input,
+            "observed_pain": observed_pain_signal
+        }
+        outputs = plan.run(streams, neurotransmitters, internal_state)
+
+        insula_output = np.broadcast_to(outputs["Insula"], (n_subjects,))
+        visual_vs_language = np.abs(outputs["Visual Cortex"] - outputs["Language Area"])
+        auditory_vs_language = np.abs(outputs["Auditory Cortex"] - outputs["Language Area"])
+        olfactory_response = outputs["Olfactory Cortex"][:, 0]
+        prefrontal_output = outputs["Prefrontal Cortex"][:, 0]
 
         adaptive_threshold = discrepancy_threshold \
             + 0.2 * prefrontal_output \
             + 0.3 * (neurotransmitters["serotonin"] - 0.5) \
             - 0.1 * np.exp(-escape_counter)
 
-        discrepancy_value = max(visual_vs_language, auditory_vs_language)
-        if discrepancy_value > adaptive_threshold:
-            escape_counter += 1
-        else:
-            escape_counter = 0
-
-        if escape_counter >= escape_duration:
-            print(f"Step {t}: Due to a large gap in perception, escape mode is activated.")
-            input_signal = np.zeros_like(input_signal)
-            neurotransmitters['dopamine'] *= 0.5
-            escape_counter = 0
-            continue
-
-        if olfactory_response > 0.7:
-            print(f"Step {t}: Moldy smell detected. Escape mode triggered.")
-            input_signal = np.zeros_like(input_signal)
-            neurotransmitters['serotonin'] *= 0.7
-            continue
-
-        for item, info in consumption_history.items():
-            if time - info["time"] < info["digest_time"]:
-                print(f"Step {t}: {item} is excluded because it previously caused {info['symptom']}")
-                neurotransmitters['serotonin'] *= 0.8
-
-        reward = outputs["Striatum"][0] if isinstance(outputs["Striatum"], np.ndarray) else outputs["Striatum"]
-        updated_dopamine = kf.update(reward)
-        neurotransmitters['dopamine'] = updated_dopamine
-
-        input_signal = outputs["Hippocampus"] * dt + input_signal * (1 - dt)
-
-        emotion_state = {
-            "fear": outputs["Amygdala"],
-            "pleasure": neurotransmitters["dopamine"],
-            "disgust": olfactory_response,
-            "anger": max(0.0, visual_vs_language - 0.5),
-            "empathy": insula_output
-        }
+        discrepancy_value = np.maximum(visual_vs_language, auditory_vs_language)
+        escape_counter = np.where(discrepancy_value > adaptive_threshold, escape_counter + 1, 0)
+
+        escaped = escape_counter >= escape_duration
+        input_signals[escaped] = 0.0
+        neurotransmitters['dopamine'][escaped] *= 0.5
+        escape_counter[escaped] = 0
+
+        smelled = ~escaped & (olfactory_response > 0.7)
+        input_signals[smelled] = 0.0
+        neurotransmitters['serotonin'][smelled] *= 0.7
+
+        active = ~(escaped | smelled)
+
+        for key, factor in schedule.factors.items():
+            neurotransmitters[key][active] *= factor
 
-        time_series.append(time)
-        visual_language_discrepancy.append(visual_vs_language)
-        auditory_language_discrepancy.append(auditory_vs_language)
-        olfactory_discomfort.append(olfactory_response)
-        feedback_intensity.append(discrepancy_value)
-        emotion_states.append(emotion_state)
+        reward = outputs["Striatum"][:, 0]
+        updated_dopamine = kf_bank.update(reward, mask=active)
+        neurotransmitters['dopamine'][active] = updated_dopamine[active]
 
-    homunculus_feedback = {
-        "time": time_series,
+        input_signals = np.where(active[:, None], outputs["Hippocampus"] * dt + input_signals * (1 - dt), input_signals)
+
+        recorded[t] = active
+        visual_language_discrepancy[t, active] = visual_vs_language[active]
+        auditory_language_discrepancy[t, active] = auditory_vs_language[active]
+        olfactory_discomfort[t, active] = olfactory_response[active]
+        feedback_intensity[t, active] = discrepancy_value[active]
+        emotion_states["fear"][t, active] = outputs["Amygdala"][active]
+        emotion_states["pleasure"][t, active] = neurotransmitters["dopamine"][active]
+        emotion_states["disgust"][t, active] = olfactory_response[active]
+        emotion_states["anger"][t, active] = np.maximum(0.0, visual_vs_language[active] - 0.5)
+        emotion_states["empathy"][t, active] = insula_output[active]
+
+    return {
+        "time": (np.arange(steps) * dt).astype(dtype),
+        "recorded": recorded,
         "visual_language_discrepancy": visual_language_discrepancy,
         "auditory_language_discrepancy": auditory_language_discrepancy,
         "olfactory_discomfort": olfactory_discomfort,
@@ -173,22 +205,90 @@ def simulate_brain_activity(input_signal, neurotransmitters, external_stimuli, i
         "emotion_states": emotion_states
     }
 
-    with open("homunculus_feedback.json", "w") as f:
-        json.dump(homunculus_feedback, f, indent=2)
-
-    plt.figure(figsize=(10, 6))
-    plt.plot(time_series, visual_language_discrepancy, label="Visual-Language Discrepancy", color='blue')
-    plt.plot(time_series, auditory_language_discrepancy, label="Auditory-Language Discrepancy", color='red')
-    plt.plot(time_series, olfactory_discomfort, label="Olfactory Discomfort", color='green')
-    plt.xlabel("Time (s)")
-    plt.ylabel("Discrepancy / Discomfort")
-    plt.title("Cognitive Discrepancies and Olfactory Discomfort Over Time")
-    plt.legend()
-    plt.grid(True)
-    plt.savefig("cognitive_discrepancies.png")
-    plt.close()
-
-# Example usage
-initial_input = [0.1, 0.2, 0.3]
-simulate_brain_activity(initial_input, neurotransmitters, external_stimuli, internal_state,
-                        image_signals, linguistic_inputs, auditory_inputs, olfactory_inputs, steps=10)
\ No newline at end of file
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate brain activity from a config file.")
+    parser.add_argument("--config", default="config.json", help="path to the configuration JSON")
+    parser.add_argument("--steps", type=int, default=10, help="number of simulation steps")
+    parser.add_argument("--output", default="homunculus_feedback.json",
+                        help="path of the feedback output (a directory for --format npy)")
+    parser.add_argument("--format", dest="output_format", choices=["json", "jsonl", "npy"], default="json",
+                        help="feedback output format")
+    parser.add_argument("--plot", default="cognitive_discrepancies.png", help="path of the discrepancy plot")
+    parser.add_argument("--no-plot", action="store_true", help="skip plotting (matplotlib is never imported)")
+    parser.add_argument("--plot-method", choices=["minmax", "lttb", "none"], default="minmax",
+                        help="decimation of long series to the plot width")
+    parser.add_argument("--profile", action="store_true", help="print per-region and per-phase timings")
+    parser.add_argument("--profile-trace", help="also write a Chrome trace-event file to this path")
+    parser.add_argument("--kernel", choices=["step", "fused", "auto"], default="step",
+                        help="advance with Simulator.step() or the fused step kernel (step_kernel.py)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="skip pure regions whose inputs and neurotransmitters did not change (neurotransmitter_state.py)")
+    parser.add_argument("--resume", help="continue from a checkpoint written by --checkpoint instead of the config")
+    parser.add_argument("--checkpoint", help="write the simulator state to this path after the run")
+    parser.add_argument("--schedule", help="event schedule file (.json, .jsonl or .csv); overrides the config")
+    parser.add_argument("--precision", choices=list(PRECISIONS), help="floating-point type of the model (precision.py)")
+    parser.add_argument("--population", type=int, metavar="N",
+                        help="attach a population engine with N units per region (population.py)")
+    parser.add_argument("--audio", help="PCM recording (.wav or .npy) driving the auditory and linguistic inputs")
+    parser.add_argument("--samples-per-step", type=int, default=1600, help="audio samples per simulation step")
+    args = parser.parse_args(argv)
+
+    # Example usage
+    initial_input = [0.1, 0.2, 0.3]
+    profiler = Profiler(trace=args.profile_trace is not None) if args.profile or args.profile_trace else None
+    kernel = None if args.kernel == "step" else args.kernel
+    if args.resume:
+        # The checkpoint holds the configuration, including incremental mode, schedule and population
+        conflicting = [flag for flag, value in (("--incremental", args.incremental), ("--audio", args.audio),
+                                                ("--schedule", args.schedule), ("--population", args.population))
+                       if value]
+        if conflicting:
+            parser.error(f"{', '.join(conflicting)} cannot be combined with --resume; "
+                         "the run continues with the configuration saved in the checkpoint")
+        if args.precision:
+            set_precision(args.precision)
+        simulator = load_checkpoint(args.resume, profiler=profiler, kernel=kernel)
+    else:
+        config = load_config(args.config)
+        # Set before anything is built: stores and filters allocate at the configured precision
+        set_precision(args.precision or config.get("precision", "float64"))
+        neurotransmitters = config["neurotransmitters"]
+        if args.incremental:
+            neurotransmitters = NeurotransmitterState(neurotransmitters)
+        if args.audio:
+            # Band levels for the Auditory Cortex, their speech-band share for the Language Area
+            for channel, features in (("auditory_inputs", "bands"), ("linguistic_inputs", "speech")):
+                config[channel] = {"source": "audio", "path": args.audio, "samples_per_step": args.samples_per_step,
+                                   "features": features}
+        simulator = Simulator(initial_input, neurotransmitters, config["external_stimuli"],
+                              config["internal_state"], config.get("image_signals"), config.get("linguistic_inputs"),
+                              config.get("auditory_inputs"), config.get("olfactory_inputs"), profiler=profiler,
+                              kernel=kernel, schedule=args.schedule or config.get("schedule"),
+                              population=args.population or config.get("population"))
+
+    if args.output_format == "npy":
+        # Stream step records straight into the columnar trace; no history is held in memory
+        with ColumnarTraceWriter(args.output) as writer:
+            for record in simulator.iter_steps(args.steps):
+                writer.append(record)
+        homunculus_feedback = load_trace(args.output)
+    else:
+        homunculus_feedback = simulator.run(args.steps)
+        write_feedback(homunculus_feedback, args.output, args.output_format)
+
+    # The plot is rendered on a worker thread while the remaining output is written
+    plot = None if args.no_plot else plot_in_background(homunculus_feedback, args.plot, method=args.plot_method)
+
+    if args.checkpoint:
+        save_checkpoint(simulator, args.checkpoint)
+
+    if profiler is not None:
+        print(profiler.summary_table())
+        if args.profile_trace:
+            profiler.write_trace(args.profile_trace)
+
+    if plot is not None:
+        plot.result()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+# simulator.py
+
+import numpy as np
+
+# Import all brain region modules and KalmanFilter
+from kalman_filter import KalmanFilter
+from neurotransmitter_state import IncrementalEvaluator, NeurotransmitterState
+from population import open_population
+from precision import as_float, get_dtype, get_precision
+from connectome import compile_connectome
+from event_schedule import EventScheduler, apply_dose, consumption_schedule, open_schedule
+from profiling import NULL_PROFILER
+from step_kernel import FusedKernel
+from stimulus_source import as_stimulus
+from prefrontal_cortex import PrefrontalCortex
+from striatum import Striatum
+from hippocampus import Hippocampus
+from amygdala import Amygdala
+from hypothalamus import Hypothalamus
+from cerebellum import Cerebellum
+from midbrain import Midbrain
+from brainstem import Brainstem
+from visual_cortex import VisualCortex
+from language_area import LanguageArea
+from auditory_cortex import AuditoryCortex
+from olfactory_cortex import OlfactoryCortex  # Olfactory processing
+from insula import Insula
+
+CONSUMPTION_HISTORY = {
+    "milk": {"time": 2.0, "digest_time": 4.0, "symptom": "abdominal pain", "organ": "stomach"},
+    "shrimp": {"time": 5.0, "digest_time": 6.0, "symptom": "itch", "organ": "skin"}
+}
+
+def format_event(event):
+    """The console message of a structured step event."""
+    step = event["step"]
+    if event["type"] == "escape":
+        return f"Step {step}: Due to a large gap in perception, escape mode is activated."
+    if event["type"] == "olfactory_escape":
+        return f"Step {step}: Moldy smell detected. Escape mode triggered."
+    if event["type"] == "consumption_exclusion":
+        return f"Step {step}: {event['item']} is excluded because it previously caused {event['symptom']}"
+    if event["type"] == "dose":
+        return f"Step {step}: {event['item']} sets {event['neurotransmitter']} to {event['level']:.3f}"
+    return f"Step {step}: {event}"
+
+
+def print_event(event):
+    print(format_event(event))
+
+
+def build_regions():
+    return [
+        PrefrontalCortex("Prefrontal Cortex"),
+        Striatum("Striatum"),
+        Hippocampus("Hippocampus"),
+        Amygdala("Amygdala"),
+        Hypothalamus("Hypothalamus"),
+        Cerebellum("Cerebellum"),
+        Midbrain("Midbrain"),
+        Brainstem("Brainstem"),
+        VisualCortex("Visual Cortex"),
+        LanguageArea("Language Area"),
+        AuditoryCortex("Auditory Cortex"),
+        OlfactoryCortex("Olfactory Cortex"),
+        Insula("Insula")
+    ]
+
+
+class Simulator:
+    """
+    Incremental whole-brain simulation.
+
+    Owns the regions, the dopamine KalmanFilter, the neurotransmitter levels
+    and the escape counter, and advances them one step at a time. The
+    neurotransmitters dict is updated in place, as simulate_brain_activity
+    always did.
+
+    step() returns one compact record per step, or None when the step was
+    skipped by an escape. iter_steps() yields those records lazily, so
+    open-ended runs can stop early and never hold the whole history.
+    run(n) collects n steps into the homunculus feedback layout.
+
+    Region inputs follow `connectome` (see connectome.DEFAULT_CONNECTOME),
+    compiled once into an execution plan. An optional `executor` runs
+    independent regions of a stage concurrently. `regions` replaces the
+    default region set from build_regions(). A profiling.Profiler passed as
+    `profiler` times every region call and each phase of step(). A
+    region_cache.RegionCache passed as `region_cache` memoizes the pure
+    regions, which pays off for periodic stimuli.
+
+    With a neurotransmitter_state.NeurotransmitterState as `neurotransmitters`
+    the pure regions are evaluated incrementally: a region whose input,
+    transmitters and internal-state entries did not change since the previous
+    step returns its previous output. After step(), neurotransmitters.changed
+    holds the transmitters that step changed.
+
+    kernel="fused" makes iter_steps() and run() advance through the fused
+    step kernel of step_kernel.py (Numba-compiled when installed);
+    kernel="auto" does so whenever the configuration allows it and otherwise
+    keeps the step() path.
+
+    Each stimulus argument is a list cycled with t % len(...), or a
+    stimulus_source spec dict or source for recordings read from disk.
+
+    `schedule` holds the timed neurotransmitter effects (see
+    event_schedule.py): a list of entries, a schedule file path or an
+    EventScheduler. By default it is built from CONSUMPTION_HISTORY.
+
+    `population` attaches a PopulationEngine (population.py): an engine, a
+    spec dict or a unit count per region. Its populations are advanced on
+    every step from the region outputs, and step records then carry the
+    mean rate per region as "population_rates".
+
+    Escapes, consumption exclusions and doses are reported as event dicts
+    ({"type": "escape" | "olfactory_escape" | "consumption_exclusion" | "dose",
+    "step", "time", ...}) to on_event, which prints them by default.
+    """
+
+    def __init__(self, input_signal, neurotransmitters, external_stimuli, internal_state,
+                 image_signals=None, linguistic_inputs=None, auditory_inputs=None, olfactory_inputs=None,
+                 dt=0.1, discrepancy_threshold=0.5, escape_duration=3, connectome=None, executor=None,
+                 regions=None, profiler=None, region_cache=None, kernel=None, on_event=None, schedule=None,
+                 population=None):
+        self.regions = build_regions() if regions is None else regions
+        self.connectome = connectome
+        self.profiler = NULL_PROFILER if profiler is None else profiler
+        self.region_cache = region_cache
+        self.incremental = IncrementalEvaluator() if isinstance(neurotransmitters, NeurotransmitterState) else None
+        self.plan = compile_connectome(self.regions, connectome,
+                                       wrap=self.profiler.wrap_region if self.profiler.enabled else None,
+                                       cache=region_cache, incremental=self.incremental)
+        self.executor = executor
+        self.neurotransmitters = neurotransmitters
+        self.internal_state = internal_state
+        self.external_stimuli = as_stimulus(external_stimuli)
+        self.image_signals = as_stimulus(image_signals)
+        self.linguistic_inputs = as_stimulus(linguistic_inputs)
+        self.auditory_inputs = as_stimulus(auditory_inputs)
+        self.olfactory_inputs = as_stimulus(olfactory_inputs)
+        self.dt = dt
+        self.discrepancy_threshold = discrepancy_threshold
+        self.escape_duration = escape_duration
+        self.schedule = EventScheduler(consumption_schedule(CONSUMPTION_HISTORY)) if schedule is None \
+            else open_schedule(schedule)
+        self.observed_pain_signal = {"pain": 0.6, "distress": 0.4}  # 仮の入力
+        self.precision = get_precision()
+        self.population = open_population(population, self.regions, dt)
+
+        self.kf = KalmanFilter(
+            initial_state=neurotransmitters['dopamine'],
+            initial_uncertainty=0.1,
+            process_variance=0.01,
+            observation_variance=0.05
+        )
+
+        self.input_signal = input_signal
+        self.escape_counter = 0
+        self.t = 0
+        self.on_event = print_event if on_event is None else on_event
+
+        if kernel not in (None, "auto", "fused"):
+            raise ValueError(f"Unknown kernel {kernel!r}; expected None, 'auto' or 'fused'")
+        default_setup = connectome is None and regions is None and executor is None \
+            and region_cache is None and not self.profiler.enabled and self.population is None
+        if kernel == "fused" and not default_setup:
+            raise ValueError("kernel='fused' needs the default regions and connectome "
+                             "and no executor, region cache, profiler or population engine")
+        self.kernel = None
+        if kernel == "fused":
+            self.kernel = FusedKernel(self)
+        elif kernel == "auto" and default_setup:
+            try:
+                self.kernel = FusedKernel(self)
+            except ValueError:
+                pass  # stimuli the kernel cannot hold, step() handles them
+
+    def get_state(self):
+        """Everything step() mutates, including region state, as a nested dict (see checkpoint.py)."""
+        state = {
+            "t": self.t,
+            "escape_counter": self.escape_counter,
+            "input_signal": np.array(self.input_signal, dtype=get_dtype()),
+            "neurotransmitters": dict(self.neurotransmitters),
+            "internal_state": dict(self.internal_state),
+            "kalman": self.kf.get_state(),
+            "schedule": self.schedule.get_state(),
+            "regions": {region.name: region.get_state() for region in self.regions}
+        }
+        if self.population is not None:
+            state["population"] = self.population.get_state()
+        return state
+
+    def set_state(self, state):
+        """Restore a get_state() dict; neurotransmitters and internal_state are updated in place."""
+        names = {region.name for region in self.regions}
+        if set(state["regions"]) != names:
+            raise ValueError(f"State holds regions {sorted(state['regions'])}, simulator has {sorted(names)}")
+        self.t = state["t"]
+        self.escape_counter = state["escape_counter"]
+        self.input_signal = np.array(state["input_signal"], dtype=get_dtype())
+        self.neurotransmitters.clear()
+        self.neurotransmitters.update(state["neurotransmitters"])
+        self.internal_state.clear()
+        self.internal_state.update(state["internal_state"])
+        self.kf.set_state(state["kalman"])
+        self.schedule.set_state(state["schedule"])
+        for region in self.regions:
+            region.set_state(state["regions"][region.name])
+        if self.population is not None and "population" in state:
+            self.population.set_state(state["population"])
+
+    def step(self):
+        t = self.t
+        self.t += 1
+        neurotransmitters = self.neurotransmitters
+        internal_state = self.internal_state
+        phase = self.profiler.phase
+
+        with phase("inputs"):
+            if self.incremental is not None:
+                neurotransmitters.clear_changes()
+            time = t * self.dt
+            for entry in self.schedule.advance(time):
+                level = apply_dose(neurotransmitters, entry)
+                self.on_event({"type": "dose", "step": t, "time": time, "item": entry.get("name"),
+                               "neurotransmitter": entry["neurotransmitter"], "level": float(level)})
+            stimulus = self.external_stimuli[t % len(self.external_stimuli)]
+            input_signal = as_float(self.input_signal) + as_float(stimulus)
+            self.input_signal = input_signal
+
+            image_input = self.image_signals[t % len(self.image_signals)] if self.image_signals else [0.5, 0.5, 0.5]
+            linguistic_input = self.linguistic_inputs[t % len(self.linguistic_inputs)] if self.linguistic_inputs else [0.2, 0.3]
+            auditory_input = self.auditory_inputs[t % len(self.auditory_inputs)] if self.auditory_inputs else [0.1, 0.4]
+            olfactory_input = self.olfactory_inputs[t % len(self.olfactory_inputs)] if self.olfactory_inputs else [0.0]
+
+            streams = {
+                "stimulus": input_signal,
+                "image": image_input,
+                "linguistic": linguistic_input,
+                "auditory": auditory_input,
+                "olfactory": olfactory_input,
+                "observed_pain": self.observed_pain_signal
+            }
+
+        with phase("regions"):
+            outputs = self.plan.run(streams, neurotransmitters, internal_state, self.executor)
+        insula_output = outputs["Insula"]
+
+        population_rates = None
+        if self.population is not None:
+            with phase("population"):
+                population_rates = self.population.step(outputs, neurotransmitters)
+
+        with phase("discrepancy"):
+            visual_vs_language = float(np.linalg.norm(np.array(outputs["Visual Cortex"]) - np.array(outputs["Language Area"])))
+            auditory_vs_language = float(np.linalg.norm(np.array(outputs["Auditory Cortex"]) - np.array(outputs["Language Area"])))
+            olfactory_response = outputs["Olfactory Cortex"]
+            if isinstance(olfactory_response, list):
+                olfactory_response = olfactory_response[0]
+
+            prefrontal_output = outputs["Prefrontal Cortex"]
+            if isinstance(prefrontal_output, (list, np.ndarray)):
+                prefrontal_output = float(prefrontal_output[0])
+            else:
+                prefrontal_output = float(prefrontal_output)
+
+            adaptive_threshold = self.discrepancy_threshold \
+                + 0.2 * prefrontal_output \
+                + 0.3 * (neurotransmitters["serotonin"] - 0.5) \
+                - 0.1 * np.exp(-self.escape_counter)
+
+            discrepancy_value = max(visual_vs_language, auditory_vs_language)
+
+        with phase("escape"):
+            if discrepancy_value > adaptive_threshold:
+                self.escape_counter += 1
+            else:
+                self.escape_counter = 0
+
+            if self.escape_counter >= self.escape_duration:
+                self.on_event({"type": "escape", "step": t, "time": time, "feedback_intensity": discrepancy_value,
+                               "threshold": float(adaptive_threshold)})
+                self.input_signal = np.zeros_like(input_signal)
+                neurotransmitters['dopamine'] *= 0.5
+                self.escape_counter = 0
+                return None
+
+            if olfactory_response > 0.7:
+                self.on_event({"type": "olfactory_escape", "step": t, "time": time,
+                               "olfactory_discomfort": float(olfactory_response)})
+                self.input_signal = np.zeros_like(input_signal)
+                neurotransmitters['serotonin'] *= 0.7
+                return None
+
+        with phase("schedule"):
+            for entry in self.schedule.symptoms():
+                self.on_event({"type": "consumption_exclusion", "step": t, "time": time, "item": entry.get("name"),
+                               "symptom": entry["symptom"]})
+            for key, factor in self.schedule.factors.items():
+                neurotransmitters[key] = neurotransmitters.get(key, 1.0) * factor
+
+        with phase("kalman"):
+            reward = outputs["Striatum"][0] if isinstance(outputs["Striatum"], np.ndarray) else outputs["Striatum"]
+            updated_dopamine = self.kf.update(reward)
+            neurotransmitters['dopamine'] = updated_dopamine
+
+        with phase("feedback"):
+            self.input_signal = outputs["Hippocampus"] * self.dt + input_signal * (1 - self.dt)
+
+            record = {
+                "time": time,
+                "visual_language_discrepancy": visual_vs_language,
+                "auditory_language_discrepancy": auditory_vs_language,
+                "olfactory_discomfort": olfactory_response,
+                "feedback_intensity": discrepancy_value,
+                "emotion_state": {
+                    "fear": outputs["Amygdala"],
+                    "pleasure": neurotransmitters["dopamine"],
+                    "disgust": olfactory_response,
+                    "anger": max(0.0, visual_vs_language - 0.5),
+                    "empathy": insula_output
+                }
+            }
+            if population_rates is not None:
+                record["population_rates"] = population_rates
+            return record
+
+    def iter_steps(self, steps=None):
+        """Yield the record of every non-escaped step; runs forever when steps is None."""
+        if self.kernel is not None:
+            yield from self.kernel.iter_steps(steps)
+            return
+        end = None if steps is None else self.t + steps
+        while end is None or self.t < end:
+            record = self.step()
+            if record is not None:
+                yield record
+
+    def run(self, steps):
+        """Advance `steps` steps and return the homunculus feedback dict of lists."""
+        homunculus_feedback = {
+            "time": [],
+            "visual_language_discrepancy": [],
+            "auditory_language_discrepancy": [],
+            "olfactory_discomfort": [],
+            "feedback_intensity": [],
+            "emotion_states": []
+        }
+        for record in self.iter_steps(steps):
+            for key, value in record.items():
+                if key == "emotion_state":
+                    homunculus_feedback["emotion_states"].append(value)
+                else:
+                    homunculus_feedback.setdefault(key, []).append(value)
+        return homunculus_feedback
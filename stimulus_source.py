@@ -0,0 +1,310 @@
+# stimulus_source.py
+
+"""
+Stimulus sources: the per-step input vectors of one sensory channel.
+
+A source behaves like the stimulus lists of config.json: len(source) is the
+number of samples and source[t % len(source)] the sample of step t, so the
+Simulator and the batch runner cycle through a recording exactly as they
+cycle through a list.
+
+    ListSource   in-memory list (today's behaviour)
+    NpySource    (samples, D) or (samples,) .npy file, memory-mapped
+    CsvSource    one sample per CSV row, read in chunks
+    AudioSource  PCM recording (.wav or .npy) through auditory_frontend,
+                 one feature vector per samples_per_step samples
+
+NpySource and CsvSource read fixed-size blocks of rows on a background
+thread, `readahead` blocks ahead of the block in use, so the step loop does
+not wait on disk while reading forward. Memory is bounded by
+(readahead + 1) blocks whatever the recording length. Reading forward (and
+wrapping round at the end) is the fast path. Any other jump restarts the
+readahead at the requested block.
+
+In config.json a channel may name a source instead of listing samples:
+
+    "auditory_inputs": {"source": "npy", "path": "session/auditory.npy"},
+    "image_signals": {"source": "csv", "path": "session/images.csv", "skip_header": 1},
+    "linguistic_inputs": {"source": "audio", "path": "session/mic.wav", "features": "speech"}
+"""
+
+import itertools
+import queue
+import threading
+import wave
+
+import numpy as np
+
+from auditory_frontend import FEATURE_VIEWS, AudioFrontEnd
+
+
+class StimulusSource:
+    def __len__(self):
+        raise NotImplementedError
+
+    def __getitem__(self, index):
+        raise NotImplementedError
+
+    def spec(self):
+        """Config dict that open_source() turns back into an equivalent source."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+class ListSource(StimulusSource):
+    def __init__(self, values):
+        self.values = list(values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def spec(self):
+        return {"source": "list", "values": self.values}
+
+
+class _ReadaheadSource(StimulusSource):
+    """Base for sources read in blocks of block_size rows by a background thread."""
+
+    def __init__(self, n_rows, block_size, readahead):
+        if n_rows < 1:
+            raise ValueError("A stimulus source needs at least one sample")
+        self.n_rows = n_rows
+        self.block_size = block_size
+        self.readahead = readahead
+        self.n_blocks = -(-n_rows // block_size)
+        self._block_index = None
+        self._block = None
+        self._thread = None
+
+    def __len__(self):
+        return self.n_rows
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.n_rows
+        if not 0 <= index < self.n_rows:
+            raise IndexError(f"Sample {index} out of range for a source of {self.n_rows}")
+        block_index, row = divmod(index, self.block_size)
+        if block_index != self._block_index:
+            self._block = self._fetch(block_index)
+            self._block_index = block_index
+        return self._block[row]
+
+    def _read_blocks(self, start):
+        """Yield (block index, (rows, D) array) from block `start` on, wrapping round forever."""
+        raise NotImplementedError
+
+    def _fetch(self, block_index):
+        if self._thread is not None:
+            got, block = self._queue.get()
+            if got == block_index:
+                return block
+            self._stop_thread()
+            if isinstance(block, Exception):
+                raise block
+        self._start_thread(block_index)
+        got, block = self._queue.get()
+        if isinstance(block, Exception):
+            raise block
+        return block
+
+    def _start_thread(self, start):
+        self._queue = queue.Queue(maxsize=self.readahead)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._produce, args=(start, self._queue, self._stop), daemon=True)
+        self._thread.start()
+
+    def _produce(self, start, blocks, stop):
+        try:
+            for item in self._read_blocks(start):
+                while not stop.is_set():
+                    try:
+                        blocks.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+                if stop.is_set():
+                    return
+        except Exception as exc:
+            blocks.put((None, exc))
+
+    def _stop_thread(self):
+        self._stop.set()
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self._thread = None
+
+    def close(self):
+        if self._thread is not None:
+            self._stop_thread()
+        self._block_index = self._block = None
+
+
+class NpySource(_ReadaheadSource):
+    def __init__(self, path, block_size=65536, readahead=2):
+        self.path = path
+        data = np.load(path, mmap_mode="r")
+        if data.ndim not in (1, 2):
+            raise ValueError(f"{path}: expected a (samples,) or (samples, D) array, got shape {data.shape}")
+        super().__init__(data.shape[0], block_size, readahead)
+
+    def _read_blocks(self, start):
+        data = np.load(self.path, mmap_mode="r")
+        block_index = start
+        while True:
+            lo = block_index * self.block_size
+            # Copying the rows out of the map does the disk I/O here, on the readahead thread
+            block = np.array(data[lo:lo + self.block_size], dtype=float)
+            yield block_index, block.reshape(len(block), -1)
+            block_index = (block_index + 1) % self.n_blocks
+
+    def spec(self):
+        return {"source": "npy", "path": self.path, "block_size": self.block_size, "readahead": self.readahead}
+
+
+class CsvSource(_ReadaheadSource):
+    def __init__(self, path, delimiter=",", skip_header=0, columns=None, block_size=65536, readahead=2):
+        self.path = path
+        self.delimiter = delimiter
+        self.skip_header = skip_header
+        self.columns = None if columns is None else list(columns)
+        # One pass over the file to count the samples, so t % len(source) works as for lists
+        with open(path, "r") as f:
+            n_rows = sum(1 for _ in self._rows(f))
+        super().__init__(n_rows, block_size, readahead)
+
+    def _rows(self, f):
+        """The sample lines: skip_header raw lines (blank or not) are dropped, then blank lines are ignored."""
+        return (line for line in itertools.islice(f, self.skip_header, None) if line.strip())
+
+    def _read_blocks(self, start):
+        block_index = start
+        while True:
+            with open(self.path, "r") as f:
+                rows = self._rows(f)
+                for _ in range(block_index * self.block_size):
+                    next(rows)
+                while block_index < self.n_blocks:
+                    lines = [line for _, line in zip(range(self.block_size), rows)]
+                    yield block_index, np.loadtxt(lines, delimiter=self.delimiter, usecols=self.columns,
+                                                  ndmin=2, dtype=float)
+                    block_index += 1
+            block_index = 0
+
+    def spec(self):
+        return {"source": "csv", "path": self.path, "delimiter": self.delimiter, "skip_header": self.skip_header,
+                "columns": self.columns, "block_size": self.block_size, "readahead": self.readahead}
+
+
+class AudioSource(StimulusSource):
+    """
+    Step t is the audio of samples [t * samples_per_step, (t + 1) * samples_per_step).
+    Reading steps in order feeds each step's samples to the front-end once;
+    any other step re-primes it from the overlap before that step, which gives
+    the same vector.
+    """
+
+    def __init__(self, path, samples_per_step=1600, features="bands", sample_rate=None, frontend=None):
+        self.path = path
+        self.samples_per_step = samples_per_step
+        self.features = features
+        self.frontend_options = dict(frontend or {})
+        if features not in FEATURE_VIEWS:
+            raise ValueError(f"Unknown feature view {features!r}; expected one of {FEATURE_VIEWS}")
+        self._wave = self._data = None
+        if path.endswith(".wav"):
+            with wave.open(path, "rb") as f:
+                if f.getsampwidth() not in (1, 2, 4):
+                    raise ValueError(f"{path}: unsupported sample width {f.getsampwidth()}")
+                n_samples, rate = f.getnframes(), f.getframerate()
+        else:
+            self._data = np.load(path, mmap_mode="r")
+            n_samples, rate = self._data.shape[0], sample_rate or 16000
+        self.sample_rate = rate
+        self.frontend = AudioFrontEnd(rate, **self.frontend_options)
+        if samples_per_step < self.frontend.hop:
+            raise ValueError(f"samples_per_step must be at least the hop of {self.frontend.hop} samples")
+        self.n_steps = n_samples // samples_per_step
+        if self.n_steps < 1:
+            raise ValueError(f"{path}: shorter than one step of {samples_per_step} samples")
+        self._next = None
+
+    def __len__(self):
+        return self.n_steps
+
+    def _read(self, lo, hi):
+        if self._data is not None:
+            return self._data[lo:hi]
+        if self._wave is None:
+            self._wave = wave.open(self.path, "rb")
+        self._wave.setpos(lo)
+        raw = self._wave.readframes(hi - lo)
+        width, channels = self._wave.getsampwidth(), self._wave.getnchannels()
+        if width == 1:
+            # 8-bit WAV is unsigned
+            samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.int16) - 128).astype(np.int8)
+        else:
+            samples = np.frombuffer(raw, dtype=np.int16 if width == 2 else np.int32)
+        return samples.reshape(-1, channels)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.n_steps
+        if not 0 <= index < self.n_steps:
+            raise IndexError(f"Step {index} out of range for a source of {self.n_steps}")
+        frontend = self.frontend
+        lo = index * self.samples_per_step
+        if index != self._next:
+            frontend.reset()
+            # Start at the first frame that ends inside this step
+            first = (lo - frontend.frame_length) // frontend.hop + 1 if lo >= frontend.frame_length else 0
+            frontend.push(self._read(first * frontend.hop, lo))
+        levels = frontend.step(self._read(lo, lo + self.samples_per_step))
+        self._next = index + 1
+        return frontend.view(levels, self.features)
+
+    def spec(self):
+        return {"source": "audio", "path": self.path, "samples_per_step": self.samples_per_step,
+                "features": self.features, "sample_rate": self.sample_rate, "frontend": self.frontend_options}
+
+    def close(self):
+        if self._wave is not None:
+            self._wave.close()
+            self._wave = None
+        self._next = None
+
+
+SOURCE_TYPES = {"list": ListSource, "npy": NpySource, "csv": CsvSource, "audio": AudioSource}
+
+
+def open_source(spec):
+    """Source for a config entry: a spec dict {"source": type, ...}, a list or an existing source."""
+    if isinstance(spec, StimulusSource):
+        return spec
+    if not isinstance(spec, dict):
+        return ListSource(spec)
+    options = dict(spec)
+    kind = options.pop("source", None)
+    if kind not in SOURCE_TYPES:
+        raise ValueError(f"Unknown stimulus source {kind!r}; expected one of {tuple(SOURCE_TYPES)}")
+    return SOURCE_TYPES[kind](**options)
+
+
+def as_stimulus(value):
+    """Open spec dicts and leave lists, None and sources as they are."""
+    return open_source(value) if isinstance(value, dict) else value
@@ -1,7 +1,15 @@
 import numpy as np
-from brain_region_base import BrainRegion
+from brain_region_base import BrainRegion, as_column, as_float, batch_level
 
 class Striatum(BrainRegion):
+    # Pure function of its inputs: eligible for region_cache.RegionCache
+    cacheable = True
+    neurotransmitter_keys = ('dopamine_decay',)
+
     def process(self, input_signal, neurotransmitters, internal_state=None):
         lambda_ = neurotransmitters.get('dopamine_decay', 0.5)
-        return np.exp(-lambda_ * np.array(input_signal))
\ No newline at end of file
+        return np.exp(-lambda_ * as_float(input_signal))
+
+    def process_batch(self, input_signals, neurotransmitters, internal_state=None):
+        lambda_ = as_column(batch_level(neurotransmitters, 'dopamine_decay', 0.5))
+        return np.exp(-lambda_ * as_float(input_signals))
\ No newline at end of file
@@ -0,0 +1,16 @@
+# conftest.py
+
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def config():
+    with open(os.path.join(ROOT, "config.json"), "r") as f:
+        return json.load(f)
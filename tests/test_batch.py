@@ -0,0 +1,49 @@
+# test_batch.py
+
+import numpy as np
+
+from simulate_brain_activity import simulate_brain_activity_batch
+from simulator import Simulator
+
+FIELDS = ("visual_language_discrepancy", "auditory_language_discrepancy", "olfactory_discomfort",
+          "feedback_intensity")
+EMOTIONS = ("fear", "pleasure", "disgust", "anger", "empathy")
+IMAGE_GAINS = (1.0, 0.8, 1.0, 1.2)
+
+
+def test_rows_match_scalar_runs(config):
+    # Four subjects with their own input, levels and camera images; the threshold is set so that they escape
+    # at different steps (the fourth one, with the brightest images, most often)
+    input_signals = np.array([[0.1, 0.2, 0.3], [0.5, 0.1, 0.0], [0.0, 0.9, 0.4], [0.3, 0.3, 0.3]])
+    neurotransmitters = dict(config["neurotransmitters"], serotonin=np.array([0.5, 0.8, 1.0, 0.2]),
+                             glutamate=np.array([1.0, 1.2, 0.8, 1.6]), dopamine=np.array([1.0, 0.6, 1.4, 1.0]))
+    images = [np.outer(IMAGE_GAINS, image) for image in config["image_signals"]]
+    olfactory = [[0.2], [0.4]]
+    batch = simulate_brain_activity_batch(input_signals, neurotransmitters, config["external_stimuli"],
+                                          config["internal_state"], images, config["linguistic_inputs"],
+                                          config["auditory_inputs"], olfactory, steps=300, discrepancy_threshold=0.55)
+
+    escapes = []
+    for i, signal in enumerate(input_signals):
+        levels = {key: float(np.broadcast_to(value, (len(input_signals),))[i])
+                  for key, value in neurotransmitters.items()}
+        events = []
+        simulator = Simulator(signal, levels, config["external_stimuli"], dict(config["internal_state"]),
+                              [image[i] for image in images], config["linguistic_inputs"], config["auditory_inputs"],
+                              olfactory, discrepancy_threshold=0.55, on_event=events.append)
+        feedback = simulator.run(300)
+        escapes.append(sum(event["type"] == "escape" for event in events))
+
+        recorded = batch["recorded"][:, i]
+        assert recorded.sum() == len(feedback["time"])
+        np.testing.assert_allclose(batch["time"][recorded], feedback["time"], rtol=1e-12)
+        for field in FIELDS:
+            np.testing.assert_allclose(batch[field][recorded, i], np.asarray(feedback[field], dtype=float),
+                                       rtol=1e-9, atol=1e-12, err_msg=field)
+            assert np.isnan(batch[field][~recorded, i]).all()
+        for emotion in EMOTIONS:
+            np.testing.assert_allclose(batch["emotion_states"][emotion][recorded, i],
+                                       [float(state[emotion]) for state in feedback["emotion_states"]],
+                                       rtol=1e-9, atol=1e-12, err_msg=emotion)
+    assert min(escapes) > 0
+    assert escapes[3] > max(escapes[:3])
@@ -0,0 +1,41 @@
+# test_checkpoint.py
+
+from checkpoint import fork, restore, snapshot
+from neurotransmitter_state import NeurotransmitterState
+from simulator import Simulator
+
+
+def make(config, neurotransmitters, constant=False):
+    # With constant sensory inputs the incremental evaluator skips the sensory cortices
+    channels = [config[key][:1] if constant else config[key]
+                for key in ("image_signals", "linguistic_inputs", "auditory_inputs", "olfactory_inputs")]
+    return Simulator([0.1, 0.2, 0.3], neurotransmitters, config["external_stimuli"], dict(config["internal_state"]),
+                     *channels, on_event=lambda event: None)
+
+
+def test_round_trip(config):
+    simulator = make(config, dict(config["neurotransmitters"]))
+    simulator.run(300)
+    restored = restore(snapshot(simulator), on_event=lambda event: None)
+    assert type(restored.neurotransmitters) is dict
+    assert restored.incremental is None
+    assert restored.run(300) == simulator.run(300)
+
+
+def test_incremental_round_trip(config):
+    simulator = make(config, NeurotransmitterState(config["neurotransmitters"]), constant=True)
+    simulator.run(300)
+    data = snapshot(simulator)
+    restored = restore(data, on_event=lambda event: None)
+    assert isinstance(restored.neurotransmitters, NeurotransmitterState)
+    assert restored.incremental is not None
+    assert restored.neurotransmitters == simulator.neurotransmitters
+    skipped = {name: stats["skips"] for name, stats in simulator.incremental.stats().items()}
+    assert restored.run(300) == simulator.run(300)
+    # The resumed run skips the unchanged regions just as the original one does
+    original = {name: stats["skips"] - skipped[name] for name, stats in simulator.incremental.stats().items()}
+    resumed = {name: stats["skips"] for name, stats in restored.incremental.stats().items()}
+    assert sum(resumed.values()) > 0
+    assert all(abs(resumed[name] - original[name]) <= 1 for name in original)
+    for branch in fork(data, 2, on_event=lambda event: None):
+        assert isinstance(branch.neurotransmitters, NeurotransmitterState)
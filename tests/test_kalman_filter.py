@@ -0,0 +1,65 @@
+# test_kalman_filter.py
+
+import warnings
+
+import numpy as np
+import pytest
+
+from kalman_filter import KalmanFilter, KalmanFilterBank
+
+
+def observations(steps, n_filters, seed=0):
+    return np.random.default_rng(seed).normal(1.0, 0.5, size=(steps, n_filters))
+
+
+def test_scalar_bank_matches_kalman_filter():
+    initial, uncertainty = [0.0, 1.0, -2.0], [1.0, 0.5, 2.0]
+    process, observation = [0.1, 0.01, 1.0], [0.5, 2.0, 0.1]
+    filters = [KalmanFilter(*args) for args in zip(initial, uncertainty, process, observation)]
+    bank = KalmanFilterBank.scalar(initial, uncertainty, process, observation)
+    for values in observations(50, 3):
+        expected = [kf.update(value) for kf, value in zip(filters, values)]
+        np.testing.assert_allclose(bank.update(values), expected, rtol=1e-12)
+    np.testing.assert_allclose(bank.covariance[:, 0, 0], [kf.uncertainty for kf in filters], rtol=1e-12)
+
+
+def test_scalar_bank_uses_observation_matrix():
+    # P = 0.5 + 0.5 predicted, K = P H / (H P H + R) = 2 / (4 + 1)
+    bank = KalmanFilterBank.scalar([0.0], 0.5, 0.5, 1.0, observation=[[[2.0]]])
+    bank.update([1.0])
+    assert bank.gain is None
+    np.testing.assert_allclose(bank.state_estimate[0, 0], 0.4)
+    # Joseph form: (1 - K H)^2 P + K^2 R
+    np.testing.assert_allclose(bank.covariance[0, 0, 0], 0.2 ** 2 + 0.4 ** 2)
+
+
+def test_scalar_bank_matches_general_path():
+    H = np.array([[[2.0]], [[0.5]]])
+    scalar = KalmanFilterBank.scalar([0.0, 1.0], [1.0, 2.0], [0.1, 0.2], [1.0, 0.3], observation=H)
+    general = KalmanFilterBank.scalar([0.0, 1.0], [1.0, 2.0], [0.1, 0.2], [1.0, 0.3], observation=H)
+    general._scalar = False
+    for values in observations(20, 2, seed=1):
+        np.testing.assert_allclose(scalar.update(values), general.update(values)[:, 0], rtol=1e-12)
+    np.testing.assert_allclose(scalar.covariance, general.covariance, rtol=1e-12)
+
+
+def test_steady_state_gain():
+    dynamic = KalmanFilterBank.scalar([0.0, 0.0], 1.0, 0.1, 0.5)
+    steady = KalmanFilterBank.scalar([0.0, 0.0], 1.0, 0.1, 0.5, steady_state=True)
+    for value in observations(200, 2, seed=2):
+        dynamic.update(value)
+    predicted = dynamic._predict_covariance(dynamic.covariance)
+    np.testing.assert_allclose(dynamic._gain(predicted), steady.gain, rtol=1e-9)
+    # The fixed gain applies the same correction as the converged recursion
+    value = np.array([2.0, -1.0])
+    expected = dynamic.state_estimate[:, 0] + steady.gain[:, 0, 0] * (value - dynamic.state_estimate[:, 0])
+    steady.state_estimate = dynamic.state_estimate.copy()
+    np.testing.assert_allclose(steady.update(value), expected)
+
+
+def test_steady_state_warns_without_convergence():
+    with pytest.warns(RuntimeWarning, match="did not converge"):
+        KalmanFilterBank.scalar([0.0], 1.0, 0.1, 0.5, steady_state=True, max_iter=2)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        KalmanFilterBank.scalar([0.0], 1.0, 0.1, 0.5, steady_state=True)
@@ -0,0 +1,119 @@
+# test_memory_search.py
+
+import numpy as np
+
+from hippocampus import Hippocampus
+from memory_search import EXACT_FRACTION, MemorySearchEngine
+from memory_store import TraceMatrix
+
+
+def brute_force(traces, queries, k):
+    distances = np.linalg.norm(queries[:, None, :] - traces[None, :, :], axis=2)
+    indices = np.argsort(distances, axis=1, kind="stable")[:, :k]
+    return indices, np.take_along_axis(distances, indices, axis=1)
+
+
+def clustered(n, dim, centres, seed=0):
+    rng = np.random.default_rng(seed)
+    means = rng.normal(0.0, 10.0, size=(centres, dim))
+    return means[rng.integers(centres, size=n)] + rng.normal(0.0, 1.0, size=(n, dim))
+
+
+def filled(traces, block=100, **kwargs):
+    engine = MemorySearchEngine(**kwargs)
+    for start in range(0, len(traces), block):
+        engine.add(traces[start:start + block])
+    return engine
+
+
+def recall(engine, traces, queries, k):
+    indices, _ = engine.search(queries, k)
+    expected, _ = brute_force(traces, queries, k)
+    return np.mean([len(set(a) & set(b)) / k for a, b in zip(indices, expected)])
+
+
+def test_exact_matches_brute_force():
+    rng = np.random.default_rng(1)
+    traces, queries = rng.random((2000, 8)), rng.random((50, 8))
+    engine = filled(traces)
+    indices, distances = engine.search(queries, 5)
+    expected, expected_distances = brute_force(traces, queries, 5)
+    np.testing.assert_array_equal(indices, expected)
+    np.testing.assert_allclose(distances, expected_distances, atol=1e-9)
+    single, single_distances = engine.search(queries[0], 5)
+    np.testing.assert_array_equal(single, expected[0])
+    np.testing.assert_allclose(single_distances, expected_distances[0], atol=1e-9)
+    # k is capped at the number of traces
+    assert MemorySearchEngine().search(queries[0], 3)[0].shape == (0,)
+    assert filled(traces[:2]).search(queries[0], 5)[0].shape == (2,)
+
+
+def test_ivf_recall_floor():
+    # The documented defaults: lists follow the store size, n_probe is calibrated to target_recall=0.95
+    traces = clustered(20000, 8, 200)
+    engine = filled(traces, index="ivf")
+    assert engine.centroids is not None
+    assert engine.n_probe <= EXACT_FRACTION * engine.n_lists  # answered by the index, not the exact scan
+    queries = traces[np.random.default_rng(2).choice(len(traces), 300, replace=False)] + 0.1
+    assert recall(engine, traces, queries, 5) >= 0.9
+
+
+def test_state_round_trip():
+    traces = clustered(6000, 4, 50)
+    for index in ("exact", "ivf"):
+        engine = filled(traces[:5000], index=index)
+        store = TraceMatrix()
+        store.set_state(engine.store.get_state())
+        restored = MemorySearchEngine(store)
+        restored.set_state(engine.get_state())
+        queries = traces[::97] + 0.05
+        for a, b in zip(engine.search(queries, 5), restored.search(queries, 5)):
+            np.testing.assert_array_equal(a, b)
+        # Both keep indexing the same way after the restore
+        for start in range(5000, 6000, 100):
+            engine.add(traces[start:start + 100])
+            restored.add(traces[start:start + 100])
+        for a, b in zip(engine.search(queries, 5), restored.search(queries, 5)):
+            np.testing.assert_array_equal(a, b)
+
+
+def test_search_after_appends():
+    traces = clustered(15000, 4, 100, seed=3)
+    for index in ("exact", "ivf"):
+        engine = filled(traces[:5000], index=index)
+        lists = engine.n_lists
+        found = []
+        for start in range(5000, len(traces), 500):
+            engine.add(traces[start:start + 500])
+            # The traces just added are found as their own nearest neighbour
+            indices, distances = engine.search(traces[start:start + 500], 1)
+            found.append(indices[:, 0] == np.arange(start, start + 500))
+            np.testing.assert_allclose(distances[found[-1], 0], 0.0, atol=1e-6)
+        # ivf may miss a trace whose list was split after it was added
+        assert np.mean(found) >= (1.0 if index == "exact" else 0.95)
+        if index == "ivf":
+            assert engine.n_lists > lists  # lists were split as the store grew
+            assert engine.n_probe <= EXACT_FRACTION * engine.n_lists
+        queries = traces[::301] + 0.1
+        assert recall(engine, traces, queries, 5) >= (1.0 if index == "exact" else 0.9)
+
+
+def test_search_after_ring_buffer_eviction():
+    rng = np.random.default_rng(4)
+    hippocampus = Hippocampus("Hippocampus", memory_capacity=8)
+    levels = {"glutamate": 1.5, "acetylcholine": 1.2}
+    inputs = rng.random((300, 3))
+    for signal in inputs:
+        hippocampus.process(signal, levels)
+    assert len(hippocampus.memory_buffer) == 8
+    # Traces are consolidated from the sixth step on, long after they left the short-term buffer
+    consolidated = inputs[5:] * 1.5 * 1.2
+    np.testing.assert_allclose(hippocampus.long_term_memory.matrix, consolidated)
+    indices, distances = hippocampus.recall(consolidated[:20], 1)
+    np.testing.assert_array_equal(indices[:, 0], np.arange(20))
+    np.testing.assert_allclose(distances[:, 0], 0.0, atol=1e-6)
+    cues = rng.random((10, 3)) * 1.8
+    expected, expected_distances = brute_force(consolidated, cues, 5)
+    indices, distances = hippocampus.recall(cues, 5)
+    np.testing.assert_array_equal(indices, expected)
+    np.testing.assert_allclose(distances, expected_distances, atol=1e-9)
@@ -0,0 +1,102 @@
+# test_neurotransmitter_state.py
+
+import numpy as np
+
+from brain_region_base import BrainRegion
+from neurotransmitter_state import IncrementalEvaluator, NeurotransmitterState
+from simulator import Simulator
+
+
+class Scaler(BrainRegion):
+    cacheable = True
+    neurotransmitter_keys = ("dopamine",)
+    internal_state_keys = ("arousal",)
+
+    def __init__(self, name="Scaler"):
+        super().__init__(name)
+        self.calls = 0
+
+    def process(self, input_signal, neurotransmitters, internal_state=None):
+        self.calls += 1
+        return np.asarray(input_signal, dtype=float) * neurotransmitters.get("dopamine", 1.0) \
+            * internal_state.get("arousal", 1.0)
+
+
+def test_versions_and_changes():
+    levels = NeurotransmitterState({"dopamine": 1.0, "serotonin": 0.5})
+    levels.clear_changes()
+    before = levels.versions_of(("dopamine", "serotonin", "cortisol"))
+    levels["dopamine"] = 1.0
+    levels["serotonin"] = 0.6
+    levels["cortisol"] = 0.2
+    assert levels.clear_changes() == {"serotonin", "cortisol"}
+    assert levels.versions_of(("dopamine", "serotonin", "cortisol")) == (before[0], before[1] + 1, before[2] + 1)
+    assert levels.values[levels.index["cortisol"]] == 0.2
+    del levels["cortisol"]
+    assert levels.changed == {"cortisol"}
+    assert np.isnan(levels.values[levels.index["cortisol"]])
+    assert levels == {"dopamine": 1.0, "serotonin": 0.6}
+
+
+def test_unchanged_inputs_skip():
+    evaluator, region = IncrementalEvaluator(), Scaler()
+    process = evaluator.bind(region, region.process)
+    levels, state = NeurotransmitterState({"dopamine": 2.0, "serotonin": 0.5}), {"arousal": 1.0}
+    first = process(np.array([1.0, 2.0]), levels, state)
+    again = process(np.array([1.0, 2.0]), levels, state)
+    assert again is first
+    assert not again.flags.writeable
+    # A level the region does not declare does not count as a change
+    levels["serotonin"] = 0.1
+    assert process(np.array([1.0, 2.0]), levels, state) is first
+    assert region.calls == 1
+    assert evaluator.stats()["Scaler"] == {"calls": 1, "skips": 2}
+
+
+def test_changed_inputs_run():
+    evaluator, region = IncrementalEvaluator(), Scaler()
+    process = evaluator.bind(region, region.process)
+    levels, state = NeurotransmitterState({"dopamine": 2.0}), {"arousal": 1.0}
+    process([1.0, 2.0], levels, state)
+    np.testing.assert_allclose(process([1.0, 3.0], levels, state), [2.0, 6.0])
+    levels["dopamine"] = 3.0
+    np.testing.assert_allclose(process([1.0, 3.0], levels, state), [3.0, 9.0])
+    state["arousal"] = 2.0
+    np.testing.assert_allclose(process([1.0, 3.0], levels, state), [6.0, 18.0])
+    assert region.calls == 4
+
+
+def test_changing_input_is_skipped_again_once_it_holds():
+    evaluator, region = IncrementalEvaluator(), Scaler()
+    process = evaluator.bind(region, region.process)
+    levels, state = NeurotransmitterState({"dopamine": 1.0}), {}
+    for i in range(50):
+        np.testing.assert_allclose(process([float(i)], levels, state), [float(i)])
+    assert region.calls == 50
+    for _ in range(50):
+        np.testing.assert_allclose(process([7.0], levels, state), [7.0])
+    # The input is fingerprinted less often while it changes, so a held input is noticed late but is noticed
+    assert region.calls <= 50 + IncrementalEvaluator.MAX_BACKOFF + 2
+
+
+def test_plain_dict_always_runs():
+    evaluator, region = IncrementalEvaluator(), Scaler()
+    process = evaluator.bind(region, region.process)
+    for _ in range(3):
+        process([1.0], {"dopamine": 1.0}, {})
+    assert evaluator.stats()["Scaler"] == {"calls": 3, "skips": 0}
+
+
+def test_simulator_matches_plain_levels(config):
+    results = []
+    for levels in (dict(config["neurotransmitters"]), NeurotransmitterState(config["neurotransmitters"])):
+        simulator = Simulator([0.1, 0.2, 0.3], levels, config["external_stimuli"], dict(config["internal_state"]),
+                              config["image_signals"][:1], config["linguistic_inputs"][:1], config["auditory_inputs"],
+                              config["olfactory_inputs"], on_event=lambda event: None)
+        results.append((simulator, simulator.run(200)))
+    (_, expected), (simulator, feedback) = results
+    assert feedback == expected
+    stats = simulator.incremental.stats()
+    # Constant image and linguistic inputs; the Prefrontal Cortex reads dopamine, which the Kalman filter updates
+    assert stats["Visual Cortex"]["skips"] == stats["Language Area"]["skips"] == 199
+    assert stats["Prefrontal Cortex"]["skips"] == 0
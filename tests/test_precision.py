@@ -0,0 +1,71 @@
+# test_precision.py
+
+import numpy as np
+import pytest
+
+from checkpoint import restore, snapshot
+from precision import get_precision, precision
+from simulator import Simulator
+
+STEPS = 2000
+MAX_DRIFT = 1e-6
+
+
+def make(config, **kwargs):
+    return Simulator([0.1, 0.2, 0.3], dict(config["neurotransmitters"]), config["external_stimuli"],
+                     dict(config["internal_state"]), config["image_signals"], config["linguistic_inputs"],
+                     config["auditory_inputs"], config["olfactory_inputs"], on_event=lambda event: None, **kwargs)
+
+
+def fields(feedback):
+    """{field: (steps,) float64 array} of a run() result, emotions included."""
+    columns = {key: np.asarray(values, dtype=np.float64) for key, values in feedback.items()
+               if key != "emotion_states"}
+    for emotion in feedback["emotion_states"][0]:
+        columns[emotion] = np.array([float(state[emotion]) for state in feedback["emotion_states"]])
+    return columns
+
+
+def test_float32_drift(config):
+    with precision("float64"):
+        reference = fields(make(config).run(STEPS))
+    with precision("float32"):
+        simulator = make(config)
+        result = fields(simulator.run(STEPS))
+        assert simulator.input_signal.dtype == np.float32
+    assert get_precision() == "float64"
+    assert result.keys() == reference.keys()
+    for key, values in reference.items():
+        # Escapes must fall on the same steps, so both runs record the same steps
+        assert len(result[key]) == len(values), key
+        assert np.max(np.abs(result[key] - values)) < MAX_DRIFT, key
+
+
+def test_float32_population_drift(config):
+    with precision("float64"):
+        reference = make(config, population=200).run(200)["population_rates"]
+    with precision("float32"):
+        result = make(config, population=200).run(200)["population_rates"]
+    for expected, actual in zip(reference, result):
+        for name, rate in expected.items():
+            assert actual[name] == pytest.approx(rate, abs=MAX_DRIFT)
+
+
+def test_float32_checkpoint_round_trip(config):
+    with precision("float32"):
+        simulator = make(config, population=100)
+        simulator.run(300)
+        data = snapshot(simulator)
+        restored = restore(data, on_event=lambda event: None)
+        assert restored.input_signal.dtype == np.float32
+        assert restored.run(200) == simulator.run(200)
+    with pytest.raises(ValueError):
+        restore(data)
+
+
+def test_fused_kernel_needs_float64(config):
+    with precision("float32"):
+        with pytest.raises(ValueError):
+            make(config, kernel="fused")
+        assert make(config, kernel="auto").kernel is None
+    assert make(config, kernel="auto").kernel is not None
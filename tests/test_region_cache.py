@@ -0,0 +1,90 @@
+# test_region_cache.py
+
+import numpy as np
+import pytest
+
+from brain_region_base import BrainRegion
+from region_cache import RegionCache, fingerprint
+from simulator import Simulator
+
+
+class Doubler(BrainRegion):
+    cacheable = True
+    neurotransmitter_keys = ("dopamine",)
+
+    def __init__(self, name="Doubler"):
+        super().__init__(name)
+        self.calls = 0
+
+    def process(self, input_signal, neurotransmitters, internal_state=None):
+        self.calls += 1
+        return np.asarray(input_signal, dtype=float) * 2 * neurotransmitters.get("dopamine", 1.0)
+
+
+def bound(cache, region):
+    return cache.bind(region, region.process)
+
+
+def test_hits_and_misses():
+    cache, region = RegionCache(), Doubler()
+    process = bound(cache, region)
+    first = process([1.0, 2.0], {"dopamine": 1.0})
+    again = process([1.0, 2.0], {"dopamine": 1.0})
+    assert again is first
+    assert not again.flags.writeable
+    process([1.0, 2.0], {"dopamine": 2.0})
+    process([1.0, 3.0], {"dopamine": 1.0})
+    # A level the region does not declare is not part of the key
+    process([1.0, 2.0], {"dopamine": 1.0, "serotonin": 0.1})
+    assert region.calls == 3
+    assert cache.stats()["Doubler"] == {"hits": 2, "misses": 3, "bypasses": 0, "size": 3}
+
+
+def test_lru_bound():
+    cache, region = RegionCache(maxsize=2), Doubler()
+    process = bound(cache, region)
+    for value in (1.0, 2.0, 1.0, 3.0):
+        process([value], {})
+    assert cache.stats()["Doubler"]["size"] == 2
+    # 1.0 was used more recently than 2.0, so 2.0 was evicted
+    process([1.0], {})
+    process([2.0], {})
+    assert region.calls == 4
+    cache.clear()
+    assert cache.stats()["Doubler"]["size"] == 0
+
+
+def test_fingerprint_inputs():
+    frame = np.arange(6.0).reshape(2, 3)
+    assert fingerprint([0.1, 0.2]) == (0.1, 0.2)
+    assert fingerprint([[0.1], [0.2]]) == fingerprint([(0.1,), (0.2,)])
+    assert fingerprint({"right": frame, "left": frame}) == fingerprint({"left": frame.copy(), "right": frame})
+    assert fingerprint({"left": frame, "right": frame}) != fingerprint({"left": frame, "right": frame + 1})
+    assert fingerprint([frame, frame]) != fingerprint([frame, frame.T.copy()])
+    hash(fingerprint({"left": frame, "right": [frame, 1.0]}))
+    with pytest.raises(TypeError, match="Cannot fingerprint"):
+        fingerprint({1, 2})
+
+
+def test_unfingerprintable_input_bypasses():
+    cache, region = RegionCache(), Doubler()
+    process = bound(cache, region)
+    process(np.array([1.0]), {"dopamine": [1.0]})
+    process(np.array([1.0]), {"dopamine": [1.0]})
+    assert region.calls == 2
+    assert cache.stats()["Doubler"]["bypasses"] == 2
+
+
+def test_simulator_wraps_only_cacheable_regions(config):
+    cache = RegionCache()
+    simulator = Simulator([0.1, 0.2, 0.3], dict(config["neurotransmitters"]), config["external_stimuli"],
+                          dict(config["internal_state"]), config["image_signals"][:1], config["linguistic_inputs"][:1],
+                          config["auditory_inputs"][:1], config["olfactory_inputs"], region_cache=cache,
+                          on_event=lambda event: None)
+    simulator.run(50)
+    stats = cache.stats()
+    cacheable = {region.name for region in simulator.regions if region.cacheable}
+    assert set(stats) == cacheable
+    assert {"Hippocampus", "Olfactory Cortex", "Insula"}.isdisjoint(stats)
+    # Constant sensory inputs hit the cache
+    assert stats["Language Area"]["hits"] > 0
@@ -0,0 +1,162 @@
+# test_step_kernel.py
+
+import numpy as np
+import pytest
+
+import step_kernel
+from simulator import Simulator
+
+SCHEDULE = [
+    {"name": "coffee", "time": 3.0, "duration": 50.0, "neurotransmitter": "norepinephrine", "factor": 1.01},
+    {"name": "ssri", "time": 10.0, "neurotransmitter": "serotonin", "set": 0.9},
+    {"name": "sedative", "time": 25.05, "neurotransmitter": "glutamate", "scale": 0.8},
+    {"name": "boost", "time": 40.0, "neurotransmitter": "oxytocin", "add": 0.3},
+    {"name": "stress", "time": 60.0, "duration": 5.0, "neurotransmitter": "cortisol", "factor": 0.9,
+     "symptom": "stress"},
+]
+
+
+def make(config, kernel, events, **overrides):
+    args = {
+        "input_signal": [0.1, 0.2, 0.3],
+        "neurotransmitters": dict(config["neurotransmitters"]),
+        "external_stimuli": config["external_stimuli"],
+        "internal_state": dict(config["internal_state"]),
+        "image_signals": config["image_signals"],
+        "linguistic_inputs": config["linguistic_inputs"],
+        "auditory_inputs": config["auditory_inputs"],
+        "olfactory_inputs": config["olfactory_inputs"],
+    }
+    args.update(overrides)
+    args["neurotransmitters"] = dict(args["neurotransmitters"])
+    return Simulator(**args, kernel=kernel, on_event=events.append)
+
+
+def run_both(config, steps, block_size=None, **overrides):
+    """run() of the step() path and of the fused kernel: [(simulator, feedback, events)] * 2."""
+    results = []
+    for kernel in (None, "fused"):
+        events = []
+        simulator = make(config, kernel, events, **overrides)
+        if kernel is not None and block_size is not None:
+            simulator.kernel.block_size = block_size
+        results.append((simulator, simulator.run(steps), events))
+    return results
+
+
+def assert_same_feedback(expected, actual):
+    assert expected.keys() == actual.keys()
+    for key, values in expected.items():
+        if key == "emotion_states":
+            assert len(values) == len(actual[key])
+            for field in ("fear", "pleasure", "disgust", "anger", "empathy"):
+                np.testing.assert_allclose([float(e[field]) for e in actual[key]],
+                                           [float(e[field]) for e in values], rtol=1e-12, atol=1e-12)
+        else:
+            np.testing.assert_allclose(np.asarray(actual[key], dtype=float), np.asarray(values, dtype=float),
+                                       rtol=1e-12, atol=1e-12)
+
+
+def assert_same_events(expected, actual):
+    assert [(e["type"], e["step"]) for e in actual] == [(e["type"], e["step"]) for e in expected]
+    for a, b in zip(expected, actual):
+        for key, value in a.items():
+            assert b[key] == (pytest.approx(value, rel=1e-12, abs=1e-12) if isinstance(value, float) else value)
+
+
+def assert_same_state(expected, actual):
+    np.testing.assert_allclose(actual.input_signal, expected.input_signal, rtol=1e-12, atol=1e-12)
+    assert actual.neurotransmitters.keys() == expected.neurotransmitters.keys()
+    for key, value in expected.neurotransmitters.items():
+        assert actual.neurotransmitters[key] == pytest.approx(value, rel=1e-12)
+    assert actual.escape_counter == expected.escape_counter
+    assert actual.kf.state_estimate == pytest.approx(expected.kf.state_estimate, rel=1e-12)
+    np.testing.assert_allclose(actual.regions[2].memory_buffer.traces(), expected.regions[2].memory_buffer.traces(),
+                               rtol=1e-12, atol=1e-12)
+
+
+def test_default_config(config):
+    (a, fa, ea), (b, fb, eb) = run_both(config, 2000, block_size=300)
+    assert_same_feedback(fa, fb)
+    assert_same_events(ea, eb)
+    assert_same_state(a, b)
+
+
+def test_schedule_doses(config):
+    (a, fa, ea), (b, fb, eb) = run_both(config, 1500, block_size=64, schedule=SCHEDULE)
+    doses = [e for e in ea if e["type"] == "dose"]
+    assert [e["item"] for e in doses] == ["ssri", "sedative", "boost"]
+    assert any(e["type"] == "consumption_exclusion" for e in ea)
+    assert_same_feedback(fa, fb)
+    assert_same_events(ea, eb)
+    assert_same_state(a, b)
+
+
+def test_escape_episodes(config):
+    neurotransmitters = dict(config["neurotransmitters"], serotonin=0.2, glutamate=1.6, acetylcholine=1.3)
+    olfactory = [[1.2], [0.4], [1.1], [0.3]]
+    (a, fa, ea), (b, fb, eb) = run_both(config, 1000, block_size=100, neurotransmitters=neurotransmitters,
+                                        olfactory_inputs=olfactory, escape_duration=2)
+    kinds = {e["type"] for e in ea}
+    assert {"escape", "olfactory_escape"} <= kinds
+    assert len(fa["time"]) < 1000
+    assert_same_feedback(fa, fb)
+    assert_same_events(ea, eb)
+    assert_same_state(a, b)
+
+
+def test_mixed_with_step(config):
+    results = []
+    for kernel in (None, "fused"):
+        events = []
+        simulator = make(config, kernel, events, schedule=SCHEDULE)
+        first = simulator.run(500)
+        simulator.step()
+        simulator.step()
+        results.append((simulator, first, simulator.run(500), events))
+    (a, a1, a2, ea), (b, b1, b2, eb) = results
+    assert_same_feedback(a1, b1)
+    assert_same_feedback(a2, b2)
+    assert_same_events(ea, eb)
+    assert_same_state(a, b)
+
+
+def test_early_break(config):
+    neurotransmitters = dict(config["neurotransmitters"], serotonin=0.2, glutamate=1.6, acetylcholine=1.3)
+    overrides = {"neurotransmitters": neurotransmitters, "olfactory_inputs": [[1.2], [0.4], [1.1], [0.3]],
+                 "escape_duration": 2, "schedule": SCHEDULE}
+    results = []
+    for kernel in (None, "fused"):
+        events = []
+        simulator = make(config, kernel, events, **overrides)
+        received = []
+        # Open-ended iteration, stopped in the middle of the fused kernel's first block
+        for record in simulator.iter_steps():
+            received.append(record)
+            if len(received) == 250:
+                break
+        assert simulator.t == round(received[-1]["time"] / simulator.dt) + 1
+        results.append((simulator, received, list(events), simulator.run(700), events))
+    (a, ra, ea, fa, _), (b, rb, eb, fb, _) = results
+    assert b.t == a.t
+    assert len(eb) == len(ea)
+    assert [record["time"] for record in rb] == [record["time"] for record in ra]
+    assert_same_events(ea, eb)
+    assert_same_feedback(fa, fb)
+    assert_same_state(a, b)
+
+
+def test_interpreted_fallback(config, monkeypatch):
+    # Without Numba run_block is the plain Python function; with it, compare its uncompiled py_func
+    monkeypatch.setattr(step_kernel, "run_block", getattr(step_kernel.run_block, "py_func", step_kernel.run_block))
+    if not step_kernel.HAVE_NUMBA:
+        assert not hasattr(step_kernel.run_block, "py_func")
+    (a, fa, ea), (b, fb, eb) = run_both(config, 1000, block_size=128, schedule=SCHEDULE)
+    assert_same_feedback(fa, fb)
+    assert_same_events(ea, eb)
+    assert_same_state(a, b)
+
+
+def test_fused_rejects_custom_setup(config):
+    with pytest.raises(ValueError):
+        make(config, "fused", [], connectome={})
@@ -0,0 +1,96 @@
+# test_stimulus_source.py
+
+import wave
+
+import numpy as np
+import pytest
+
+from stimulus_source import AudioSource, CsvSource, ListSource, NpySource, open_source
+
+
+def samples(n=10, dim=3, seed=0):
+    return np.round(np.random.default_rng(seed).random((n, dim)), 6)
+
+
+def assert_same(source, reference, order):
+    assert len(source) == len(reference)
+    for t in order:
+        np.testing.assert_allclose(source[t % len(source)], reference[t % len(reference)], rtol=1e-12)
+
+
+def orders(n, seed=1):
+    """Forward twice round (wrapping at the end), then random jumps."""
+    return [range(2 * n + 3), np.random.default_rng(seed).integers(n, size=3 * n).tolist()]
+
+
+def write_csv(path, data, header_lines=("# recorded session", "", "x,y,z")):
+    lines = list(header_lines)
+    for i, row in enumerate(data):
+        lines.append(",".join(map(repr, row.tolist())))
+        if i % 3 == 0:
+            lines.append("")  # blank lines between samples are ignored
+    path.write_text("\n".join(lines) + "\n")
+
+
+@pytest.mark.parametrize("block_size", [3, 4, 64])
+def test_npy_matches_list(tmp_path, block_size):
+    data = samples()
+    np.save(tmp_path / "data.npy", data)
+    reference = ListSource(data.tolist())
+    with NpySource(str(tmp_path / "data.npy"), block_size=block_size, readahead=2) as source:
+        for order in orders(len(data)):
+            assert_same(source, reference, order)
+    # Reading again after close() starts a new readahead
+    assert_same(source, reference, range(len(data)))
+    source.close()
+    assert_same(open_source(source.spec()), reference, range(len(data)))
+
+
+@pytest.mark.parametrize("block_size", [3, 4, 64])
+def test_csv_matches_list(tmp_path, block_size):
+    data = samples()
+    write_csv(tmp_path / "data.csv", data)
+    reference = ListSource(data.tolist())
+    # skip_header counts raw lines, the blank one in the header included
+    with CsvSource(str(tmp_path / "data.csv"), skip_header=3, block_size=block_size) as source:
+        for order in orders(len(data)):
+            assert_same(source, reference, order)
+    assert_same(source, reference, range(len(data)))
+    source.close()
+    assert_same(open_source(source.spec()), reference, range(len(data)))
+
+
+def test_csv_columns_and_plain_file(tmp_path):
+    data = samples()
+    write_csv(tmp_path / "data.csv", data, header_lines=())
+    source = CsvSource(str(tmp_path / "data.csv"), columns=[0, 2], block_size=4)
+    assert_same(source, ListSource(data[:, [0, 2]].tolist()), range(2 * len(data)))
+    source.close()
+
+
+def write_audio(tmp_path, rate=16000, seconds=1.0):
+    t = np.arange(int(rate * seconds)) / rate
+    pcm = (8000 * np.sin(2 * np.pi * 440 * t) * np.sin(2 * np.pi * 3 * t)).astype(np.int16)
+    np.save(tmp_path / "mic.npy", pcm)
+    with wave.open(str(tmp_path / "mic.wav"), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(pcm.tobytes())
+    return str(tmp_path / "mic.npy"), str(tmp_path / "mic.wav")
+
+
+@pytest.mark.parametrize("features", ["bands", "speech"])
+def test_audio_matches_list(tmp_path, features):
+    npy_path, wav_path = write_audio(tmp_path)
+    # The reference is one pass in step order, each step's samples fed to the front-end once
+    sequential = AudioSource(npy_path, samples_per_step=1600, features=features)
+    reference = ListSource([sequential[t] for t in range(len(sequential))])
+    sequential.close()
+    for path in (npy_path, wav_path):
+        with AudioSource(path, samples_per_step=1600, features=features) as source:
+            # Random jumps re-prime the front-end from the overlap before the step
+            for order in orders(len(reference)):
+                assert_same(source, reference, order)
+        assert_same(source, reference, [3, 4, 0])
+        source.close()
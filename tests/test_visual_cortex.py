@@ -0,0 +1,44 @@
+# test_visual_cortex.py
+
+import numpy as np
+
+from neurotransmitter_state import NeurotransmitterState
+from region_cache import RegionCache
+from simulator import Simulator
+
+
+def stereo_frames(count, seed=0):
+    """Stereo pairs of random scenes with a disparity of 4 pixels."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        scene = rng.random((32, 52))
+        frames.append({"left": scene[:, :-4], "right": scene[:, 4:]})
+    return frames
+
+
+def make(config, frames, neurotransmitters=None, **kwargs):
+    levels = dict(config["neurotransmitters"]) if neurotransmitters is None else neurotransmitters
+    return Simulator([0.1, 0.2, 0.3], levels, config["external_stimuli"], dict(config["internal_state"]), frames,
+                     config["linguistic_inputs"], config["auditory_inputs"], config["olfactory_inputs"],
+                     on_event=lambda event: None, **kwargs)
+
+
+def test_stereo_with_region_cache(config):
+    frames = stereo_frames(3)
+    expected = make(config, frames).run(30)
+    cache = RegionCache()
+    assert make(config, frames, region_cache=cache).run(30) == expected
+    stats = cache.stats()["Visual Cortex"]
+    assert stats["misses"] == 3
+    assert stats["hits"] == 27
+
+
+def test_stereo_incremental(config):
+    for frames, skipped in ((stereo_frames(3), False), (stereo_frames(1), True)):
+        expected = make(config, frames).run(30)
+        simulator = make(config, frames, NeurotransmitterState(config["neurotransmitters"]))
+        assert simulator.run(30) == expected
+        skips = simulator.incremental.stats()["Visual Cortex"]["skips"]
+        # A repeated frame (glutamate is static) is not processed again; changing frames always are
+        assert (skips > 0) == skipped
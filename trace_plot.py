@@ -0,0 +1,165 @@
+# trace_plot.py
+
+"""
+Plotting of long feedback traces.
+
+A figure is only so many pixels wide, so each series is decimated to the
+pixel budget before matplotlib sees it:
+
+    minmax  keeps the minimum and maximum of every pixel-wide bucket, so
+            spikes and the envelope survive exactly
+    lttb    Largest-Triangle-Three-Buckets, keeps the point of each bucket
+            that spans the largest triangle with its neighbours
+
+Both read the input in slices. A memory-mapped columnar trace
+(trace_writer.load_trace) is therefore plotted without loading it, and a run
+of millions of steps is drawn from a few thousand points.
+
+plot_feedback() draws the discrepancy series and, in a second panel, the
+emotion channels. plot_in_background() runs it on a worker thread and
+returns a Future. The figure is built with the object-oriented matplotlib
+API on the Agg canvas, not pyplot, so it is safe off the main thread.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from trace_writer import EMOTION_FIELDS
+
+DISCREPANCY_SERIES = (
+    ("visual_language_discrepancy", "Visual-Language Discrepancy", "blue"),
+    ("auditory_language_discrepancy", "Auditory-Language Discrepancy", "red"),
+    ("olfactory_discomfort", "Olfactory Discomfort", "green"),
+)
+EMOTION_COLORS = {"fear": "purple", "pleasure": "orange", "disgust": "olive", "anger": "crimson", "empathy": "teal"}
+DECIMATION_METHODS = ("minmax", "lttb", "none")
+CHUNK_SIZE = 1 << 20
+
+
+def minmax_decimate(x, y, n_buckets, chunk_size=CHUNK_SIZE):
+    """Min and max of each of n_buckets equal slices of y, in time order (2 * n_buckets points)."""
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    size = -(-n // n_buckets)
+    step = max(1, chunk_size // size) * size
+    xs, ys = [], []
+    for lo in range(0, n, step):
+        x_chunk = np.asarray(x[lo:lo + step], dtype=float)
+        y_chunk = np.asarray(y[lo:lo + step], dtype=float)
+        # Pad the last partial bucket with its own edge values so every bucket reshapes to `size`
+        pad = -len(y_chunk) % size
+        buckets = np.pad(y_chunk, (0, pad), mode="edge").reshape(-1, size)
+        starts = np.arange(0, len(y_chunk), size)
+        picks = np.sort(np.stack([starts + buckets.argmin(axis=1), starts + buckets.argmax(axis=1)], axis=1), axis=1)
+        picks = np.minimum(picks.ravel(), len(y_chunk) - 1)
+        xs.append(x_chunk[picks])
+        ys.append(y_chunk[picks])
+    return np.concatenate(xs), np.concatenate(ys)
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets downsampling of (x, y) to n_out points."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    every = (n - 2) / (n_out - 2)
+    picks = np.empty(n_out, dtype=np.int64)
+    picks[0], picks[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = float(np.mean(x[end:next_end]))
+        avg_y = float(np.mean(y[end:next_end]))
+        bucket_x = np.asarray(x[start:end], dtype=float)
+        bucket_y = np.asarray(y[start:end], dtype=float)
+        ax, ay = float(x[a]), float(y[a])
+        area = np.abs((ax - avg_x) * (bucket_y - ay) - (ax - bucket_x) * (avg_y - ay))
+        a = start + int(np.argmax(area))
+        picks[i + 1] = a
+    return np.asarray(x[picks], dtype=float), np.asarray(y[picks], dtype=float)
+
+
+def decimate(x, y, pixels, method="minmax"):
+    """(x, y) reduced to about 2 points per pixel column."""
+    if method == "minmax":
+        return minmax_decimate(x, y, pixels)
+    if method == "lttb":
+        return lttb(x, y, 2 * pixels)
+    if method == "none":
+        return np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    raise ValueError(f"Unknown decimation method {method!r}; expected one of {DECIMATION_METHODS}")
+
+
+def feedback_columns(feedback):
+    """
+    {series: 1-D array-like} for the homunculus feedback dict of lists or a
+    columnar trace (load_trace), with the emotion channels as "emotion_<name>".
+    """
+    if "emotion_states" not in feedback:
+        return feedback
+    columns = {key: value for key, value in feedback.items() if key != "emotion_states"}
+    emotion_states = feedback["emotion_states"]
+    if isinstance(emotion_states, dict):
+        columns.update({"emotion_" + name: values for name, values in emotion_states.items()})
+    else:
+        for name in EMOTION_FIELDS:
+            columns["emotion_" + name] = np.fromiter((float(state[name]) for state in emotion_states),
+                                                     dtype=float, count=len(emotion_states))
+    return columns
+
+
+def plot_feedback(feedback, path="cognitive_discrepancies.png", method="minmax", figsize=(10, 8), dpi=100):
+    """Plot the discrepancies and emotion channels of a run, decimated to the figure width."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    columns = feedback_columns(feedback)
+    time_series = columns["time"]
+    pixels = int(figsize[0] * dpi)
+
+    figure = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(figure)
+    discrepancy_axes, emotion_axes = figure.subplots(2, 1, sharex=True)
+
+    for key, label, color in DISCREPANCY_SERIES:
+        discrepancy_axes.plot(*decimate(time_series, columns[key], pixels, method), label=label, color=color)
+    discrepancy_axes.set_ylabel("Discrepancy / Discomfort")
+    discrepancy_axes.set_title("Cognitive Discrepancies and Olfactory Discomfort Over Time")
+    discrepancy_axes.legend()
+    discrepancy_axes.grid(True)
+
+    for name in EMOTION_FIELDS:
+        if "emotion_" + name in columns:
+            emotion_axes.plot(*decimate(time_series, columns["emotion_" + name], pixels, method),
+                              label=name.capitalize(), color=EMOTION_COLORS[name])
+    emotion_axes.set_xlabel("Time (s)")
+    emotion_axes.set_ylabel("Emotion state")
+    emotion_axes.legend()
+    emotion_axes.grid(True)
+
+    figure.tight_layout()
+    figure.savefig(path)
+
+
+def plot_in_background(feedback, path="cognitive_discrepancies.png", **kwargs):
+    """Run plot_feedback on a worker thread and return its Future."""
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-plot")
+    future = executor.submit(plot_feedback, feedback, path, **kwargs)
+    executor.shutdown(wait=False)
+    return future
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from trace_writer import load_trace
+
+    parser = argparse.ArgumentParser(description="Plot a columnar trace directory.")
+    parser.add_argument("directory")
+    parser.add_argument("output", nargs="?", default="cognitive_discrepancies.png")
+    parser.add_argument("--method", choices=DECIMATION_METHODS, default="minmax")
+    args = parser.parse_args()
+    plot_feedback(load_trace(args.directory), args.output, args.method)
@@ -0,0 +1,126 @@
+# trace_writer.py
+
+"""
+Columnar, chunked binary output for simulation traces.
+
+ColumnarTraceWriter keeps one preallocated typed array per field (each
+emotion channel is its own column) and flushes full chunks to one .npy file
+per field. The .npy headers are rewritten with the final length on close(),
+so load_trace() can memory-map every column for analysis. Columns are of
+the configured precision (precision.py) unless a dtype is given. trace_to_json()
+converts a trace directory back into the homunculus feedback JSON layout.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from precision import get_dtype
+
+SERIES_FIELDS = (
+    "time",
+    "visual_language_discrepancy",
+    "auditory_language_discrepancy",
+    "olfactory_discomfort",
+    "feedback_intensity",
+)
+EMOTION_FIELDS = ("fear", "pleasure", "disgust", "anger", "empathy")
+MANIFEST = "trace.json"
+
+
+def _write_header(f, dtype, length):
+    # The header is padded to a fixed size, so rewriting it with the final
+    # length on close never shifts the data that follows it
+    header = {"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False, "shape": (length,)}
+    np.lib.format.write_array_header_1_0(f, header)
+
+
+class ColumnarTraceWriter:
+    def __init__(self, directory, chunk_size=65536, dtype=None):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.dtype = np.dtype(get_dtype() if dtype is None else dtype)
+        self.fields = SERIES_FIELDS + tuple("emotion_" + name for name in EMOTION_FIELDS)
+        self.chunks = {field: np.zeros(chunk_size, dtype=self.dtype) for field in self.fields}
+        self.fill = 0
+        self.count = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.files = {}
+        for field in self.fields:
+            f = open(os.path.join(directory, field + ".npy"), "wb")
+            _write_header(f, self.dtype, 0)
+            self.header_size = f.tell()
+            self.files[field] = f
+
+    def append(self, record):
+        """Add one Simulator step record."""
+        i = self.fill
+        for field in SERIES_FIELDS:
+            self.chunks[field][i] = record[field]
+        emotion_state = record["emotion_state"]
+        for name in EMOTION_FIELDS:
+            self.chunks["emotion_" + name][i] = emotion_state[name]
+        self.fill += 1
+        if self.fill == self.chunk_size:
+            self.flush()
+
+    def extend(self, homunculus_feedback):
+        """Add every step of a homunculus feedback dict of lists."""
+        for i, emotion_state in enumerate(homunculus_feedback["emotion_states"]):
+            record = {field: homunculus_feedback[field][i] for field in SERIES_FIELDS}
+            record["emotion_state"] = emotion_state
+            self.append(record)
+
+    def flush(self):
+        for field, f in self.files.items():
+            f.write(self.chunks[field][:self.fill].tobytes())
+        self.count += self.fill
+        self.fill = 0
+
+    def close(self):
+        self.flush()
+        for f in self.files.values():
+            f.seek(0)
+            _write_header(f, self.dtype, self.count)
+            if f.tell() != self.header_size:
+                raise RuntimeError("Trace header size changed; column files are corrupt")
+            f.close()
+        with open(os.path.join(self.directory, MANIFEST), "w") as f:
+            json.dump({"fields": list(self.fields), "length": self.count, "dtype": self.dtype.str}, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_trace(directory, mmap=True):
+    """Return {field: array} for a trace directory; columns are memory-mapped by default."""
+    with open(os.path.join(directory, MANIFEST), "r") as f:
+        manifest = json.load(f)
+    mmap_mode = "r" if mmap else None
+    return {field: np.load(os.path.join(directory, field + ".npy"), mmap_mode=mmap_mode)
+            for field in manifest["fields"]}
+
+
+def trace_to_json(directory, path):
+    """Convert a columnar trace to the homunculus feedback JSON layout."""
+    columns = load_trace(directory)
+    homunculus_feedback = {field: columns[field].tolist() for field in SERIES_FIELDS}
+    emotions = {name: columns["emotion_" + name].tolist() for name in EMOTION_FIELDS}
+    homunculus_feedback["emotion_states"] = [dict(zip(EMOTION_FIELDS, values)) for values in zip(*emotions.values())]
+    with open(path, "w") as f:
+        json.dump(homunculus_feedback, f, indent=2)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a columnar trace directory to feedback JSON.")
+    parser.add_argument("directory")
+    parser.add_argument("output", nargs="?", default="homunculus_feedback.json")
+    args = parser.parse_args()
+    trace_to_json(args.directory, args.output)
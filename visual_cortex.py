@@ -1,18 +1,30 @@
 import numpy as np
-from brain_region_base import BrainRegion
+from brain_region_base import BrainRegion, as_float, batch_level
+from visual_processing import VisualProcessor
 
 class VisualCortex(BrainRegion):
+    # Pure function of its inputs: eligible for region_cache.RegionCache
+    cacheable = True
+    neurotransmitter_keys = ('glutamate',)
+
+    def __init__(self, name, processor=None):
+        super().__init__(name)
+        # Stereo depth, segmentation and region statistics of camera frames (visual_processing.py)
+        self.processor = VisualProcessor() if processor is None else processor
+
     def process(self, image_signal, neurotransmitters, internal_state=None):
-        # Current implementation: simple activation based on average visual signal
-        return np.mean(image_signal) * neurotransmitters.get('glutamate', 1.0)
+        glutamate = neurotransmitters.get('glutamate', 1.0)
+        if isinstance(image_signal, dict) or np.ndim(image_signal) >= 2:
+            # Camera frame or stereo pair:
+            #     depth_map = self.processor.estimate_depth(left_image, right_image)
+            #     regions = self.processor.segment_by_boundary(left_image, depth_map)
+            #     activation from the segment statistics
+            return self.processor.activation(image_signal) * glutamate
+
+        # Feature vector: simple activation based on average visual signal
+        return np.mean(as_float(image_signal)) * glutamate
 
         # --- Planned extensions for future development ---
-        # - Binocular depth estimation using stereo vision:
-        #     depth_map = self.processor.estimate_depth(left_image, right_image)
-        #
-        # - Boundary-based segmentation using edge detection:
-        #     regions = self.processor.segment_by_boundary(left_image, depth_map)
-        #
         # - Semantic labeling of segmented regions (e.g., "food", "object"):
         #     labeled = self.processor.label_segments(left_image, regions)
         #
@@ -22,4 +34,10 @@ class VisualCortex(BrainRegion):
         #
         # - Hierarchical visual processing (e.g., V1, V2, V4)
         # - Integration with attention mechanisms and internal state
-        # - Connection to homunculus and world model modules
\ No newline at end of file
+        # - Connection to homunculus and world model modules
+
+    def process_batch(self, image_signals, neurotransmitters, internal_state=None):
+        if np.ndim(image_signals) > 2:
+            # One frame per subject: the per-subject fallback of BrainRegion
+            return super().process_batch(image_signals, neurotransmitters, internal_state)
+        return np.mean(as_float(image_signals), axis=1) * batch_level(neurotransmitters, 'glutamate', 1.0)
\ No newline at end of file